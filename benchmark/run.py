@@ -0,0 +1,360 @@
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+
+import dspy
+
+from replay import ROOT, ReplayEmbedder, ReplayLanguageModel, ReplayLM, load_recorded_outputs
+
+from models import EXTRACTION_MODES, FANDOM_TRIPLES, OptimizedRelationExtractor
+from dataset import DialogueDataset
+from helper import save_triplet_store
+from aliases import AliasIndex
+from telemetry import Telemetry
+from main import MAX_CONCURRENCY, REQUESTS_PER_MINUTE, SPLITS, TOKENS_PER_MINUTE, process_episodes
+from graphdb.inject import ensure_name_constraint, ingest, iter_triples, save_snapshot, triple_text
+from graphdb.embedding_cache import EmbeddingCache
+from graphdb.local_store import LocalGraphStore
+from graphdb.query import QueryEngine
+from graphdb.vector_index import build_vector_index
+
+RESULTS_DIR = os.path.join(ROOT, "benchmark", "results")
+# Synthetic provider latencies, in seconds
+LLM_LATENCY = 0.2
+LLM_JITTER = 0.1
+EMBED_LATENCY = 0.05
+QUERY_LATENCY = 0.1
+# Episodes sent through the synchronous forward() path per split
+FORWARD_EPISODES = 50
+PARSE_ROUNDS = 20
+QUERY_PAIRS = 200
+
+
+def timed(call):
+    started = time.perf_counter()
+    result = call()
+    return result, time.perf_counter() - started
+
+
+async def timed_async(coroutine):
+    started = time.perf_counter()
+    result = await coroutine
+    return result, time.perf_counter() - started
+
+
+def rate(count, seconds):
+    return count / seconds if seconds else 0.0
+
+
+def timing(summary, name):
+    """Count, mean and tail of one timing from a Telemetry summary, merged over labels"""
+    rows = [t for t in summary["timings"] if t["name"] == name]
+    if not rows:
+        return None
+    count = sum(t["count"] for t in rows)
+    return {
+        "count": count,
+        "mean": sum(t["sum"] for t in rows) / count,
+        "p95": max(t["p95"] for t in rows),
+        "max": max(t["max"] for t in rows),
+    }
+
+
+def counter(summary, name, **labels):
+    return sum(
+        c["value"] for c in summary["counters"]
+        if c["name"] == name and all(c["labels"].get(k) == v for k, v in labels.items())
+    )
+
+
+def bench_dataset(path, work_dir):
+    """Cold index build, cached index load and a full sequential read of one split"""
+    index_path = work_dir / (Path(path).name + ".idx")
+    dataset, build = timed(lambda: DialogueDataset(path, index_path))
+    dataset.close()
+    dataset, load = timed(lambda: DialogueDataset(path, index_path))
+    with dataset:
+        episodes, read = timed(lambda: list(dataset))
+    return episodes, {
+        "episodes": len(episodes),
+        "index_build_s": build,
+        "index_load_s": load,
+        "read_s": read,
+        "episodes_per_s": rate(len(episodes), read),
+    }
+
+
+def bench_parsing(outputs, rounds=PARSE_ROUNDS):
+    """_parse_triplets over every recorded output, without any LLM call"""
+    extractor = OptimizedRelationExtractor(telemetry=Telemetry())
+
+    def parse_all():
+        return sum(len(extractor._parse_triplets(output)) for _ in range(rounds) for output in outputs)
+
+    kept, seconds = timed(parse_all)
+    parsed = rounds * len(outputs)
+    return {
+        "outputs": parsed,
+        "triplets_kept": kept,
+        "seconds": seconds,
+        "outputs_per_s": rate(parsed, seconds),
+        "us_per_output": 1e6 * seconds / parsed if parsed else 0.0,
+    }
+
+
+def bench_forward(dialogues, outputs, count=FORWARD_EPISODES):
+    """OptimizedRelationExtractor.forward with a zero-latency replay LM: dspy prompt/adapter overhead plus parsing"""
+    dialogues = dialogues[:count]
+    extractor = OptimizedRelationExtractor()
+    with dspy.context(lm=ReplayLM(outputs)):
+        _, seconds = timed(lambda: [extractor("\n".join(dialogue)) for dialogue in dialogues])
+    return {
+        "episodes": len(dialogues),
+        "seconds": seconds,
+        "ms_per_episode": 1e3 * seconds / len(dialogues) if dialogues else 0.0,
+    }
+
+
+async def bench_extraction(dialogues, outputs, args):
+    """process_episodes through the scheduler against a replay LM with synthetic latency"""
+    telemetry = Telemetry(stage="extraction")
+    lm = ReplayLM(outputs, latency=args.llm_latency, jitter=args.llm_jitter)
+    extractor = OptimizedRelationExtractor(telemetry=telemetry, mode=args.mode)
+    aliases = AliasIndex.from_fandom(FANDOM_TRIPLES)
+    limits = {}
+    if not args.rate_limits:
+        limits = dict(requests_per_minute=None, tokens_per_minute=None)
+    with dspy.context(lm=lm):
+        triplets, seconds = await timed_async(process_episodes(
+            dialogues, extractor, aliases=aliases, telemetry=telemetry,
+            max_concurrency=args.concurrency, **limits,
+        ))
+    summary = telemetry.summary()
+    return triplets, {
+        "episodes": len(dialogues),
+        "mode": args.mode,
+        "seconds": seconds,
+        "episodes_per_s": rate(len(dialogues), seconds),
+        "concurrency": args.concurrency,
+        "rate_limits": bool(args.rate_limits),
+        "llm_calls": lm.calls,
+        "prompt_tokens": counter(summary, "prompt_tokens"),
+        "completion_tokens": counter(summary, "completion_tokens"),
+        "triplets": len(triplets),
+        "failed": counter(summary, "jobs", status="failed"),
+        "job": timing(summary, "job"),
+        "llm": timing(summary, "llm"),
+        "rate_limit_wait": timing(summary, "rate_limit_wait"),
+    }
+
+
+async def bench_inject(triplets_path, work_dir, args):
+    """
+    The steps of inject.start against a LocalGraphStore and a replay embedder:
+    a full ingest, the graph and snapshot saves and the vector index build, then
+    a second ingest with the snapshot, where nothing has changed.
+    """
+    telemetry = Telemetry(stage="inject")
+    embedder = ReplayEmbedder(latency=args.embed_latency)
+    embedding_cache = EmbeddingCache(work_dir / "embeddings.sqlite", "replay")
+    store = LocalGraphStore(work_dir / "graph.pickle")
+    snapshot_path = work_dir / "ingested.txt"
+    try:
+        await ensure_name_constraint(store)
+        stats, full = await timed_async(ingest(
+            store, embedder, iter_triples(triplets_path),
+            embedding_cache=embedding_cache, progress=None, telemetry=telemetry,
+        ))
+        _, save = timed(lambda: (store.save(), save_snapshot(snapshot_path, stats.snapshot())))
+        _, vector_index = await timed_async(build_vector_index(
+            work_dir / "edges", stats.triples, embedder, embedding_cache, triple_text,
+        ))
+        _, unchanged = await timed_async(ingest(
+            store, embedder, iter_triples(triplets_path),
+            embedding_cache=embedding_cache, snapshot=set(stats.triples), progress=None,
+        ))
+    finally:
+        embedding_cache.close()
+    summary = telemetry.summary()
+    return store, snapshot_path, stats.triples, {
+        "triples": len(stats.triples),
+        "nodes": stats.nodes_written,
+        "ingest_s": full,
+        "triples_per_s": rate(len(stats.triples), full),
+        "save_s": save,
+        "vector_index_s": vector_index,
+        "unchanged_ingest_s": unchanged,
+        "embed_calls": embedder.calls,
+        "embed_batch": timing(summary, "embed_batch"),
+        "write": timing(summary, "write"),
+    }
+
+
+def query_pairs(triples, count=QUERY_PAIRS, seed=0):
+    """Half connected pairs (an edge between them), half random entity pairs"""
+    rng = random.Random(seed)
+    triples = sorted(triples)
+    entities = sorted({name for source, target, _ in triples for name in (source, target)})
+    if len(entities) < 2:
+        return []
+    pairs = [(source, target) for source, target, _ in rng.sample(triples, min(count // 2, len(triples)))]
+    while len(pairs) < count:
+        source, target = rng.sample(entities, 2)
+        pairs.append((source, target))
+    return pairs
+
+
+async def bench_query(store, snapshot_path, triples, args):
+    """QueryEngine.relate_many over entity pairs, first uncached and then again from its caches"""
+    pairs = query_pairs(triples, args.queries)
+    store, load = timed(lambda: LocalGraphStore.load(store.path))
+    telemetry = Telemetry(stage="query")
+    language_model = ReplayLanguageModel(latency=args.query_latency)
+    engine = QueryEngine(store, language_model, backend="local", telemetry=telemetry)
+    # Read names and neighborhoods from this run's snapshot, not graphdb/cache
+    engine.snapshot_path = snapshot_path
+    async with engine:
+        _, cold = await timed_async(engine.relate_many(pairs))
+        _, warm = await timed_async(engine.relate_many(pairs))
+    summary = telemetry.summary()
+    return {
+        "pairs": len(pairs),
+        "store_load_s": load,
+        "cold_s": cold,
+        "cold_queries_per_s": rate(len(pairs), cold),
+        "warm_s": warm,
+        "warm_queries_per_s": rate(len(pairs), warm),
+        "llm_calls": language_model.calls,
+        "lookup": timing(summary, "lookup"),
+        "paths": timing(summary, "paths"),
+    }
+
+
+async def bench_split(split, outputs, args):
+    print(f"🏁 {split}")
+    with tempfile.TemporaryDirectory(prefix=f"bench-{split}-") as tmp:
+        work_dir = Path(tmp)
+        dialogues, dataset = bench_dataset(SPLITS[split], work_dir)
+        dialogues = [episode.dialogue for episode in dialogues[:args.count]]
+        result = {"dataset": dataset, "parsing": bench_parsing(outputs)}
+        result["forward"] = bench_forward(dialogues, outputs)
+        triplets, result["extraction"] = await bench_extraction(dialogues, outputs, args)
+        triplets_path = work_dir / f"{split}.triplets"
+        save_triplet_store(triplets, triplets_path)
+        store, snapshot_path, triples, result["inject"] = await bench_inject(triplets_path, work_dir, args)
+        result["query"] = await bench_query(store, snapshot_path, triples, args)
+    report(split, result)
+    return result
+
+
+def report(split, result):
+    dataset, extraction, inject, query = result["dataset"], result["extraction"], result["inject"], result["query"]
+    print(f"   dataset: {dataset['episodes']} episodes, index build {dataset['index_build_s']:.3f}s, read {dataset['episodes_per_s']:.0f} episodes/s")
+    print(f"   parsing: {result['parsing']['us_per_output']:.1f}µs per output, forward {result['forward']['ms_per_episode']:.2f}ms per episode")
+    print(
+        f"   extraction: {extraction['episodes_per_s']:.1f} episodes/s at concurrency {extraction['concurrency']} ({extraction['mode']}), "
+        f"{extraction['triplets']} triplets, {extraction['prompt_tokens']}+{extraction['completion_tokens']} tokens"
+    )
+    print(f"   inject: {inject['triples']} triples in {inject['ingest_s']:.2f}s, vector index {inject['vector_index_s']:.2f}s, unchanged re-ingest {inject['unchanged_ingest_s']:.2f}s")
+    print(f"   query: {query['cold_queries_per_s']:.1f} queries/s cold, {query['warm_queries_per_s']:.0f} queries/s cached")
+
+
+def git_commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "HEAD"], cwd=ROOT, capture_output=True, text=True, check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def flatten(result, prefix=""):
+    """{'dev.extraction.seconds': 1.2, ...} of every number in a result"""
+    flat = {}
+    for key, value in result.items():
+        name = f"{prefix}{key}"
+        if isinstance(value, dict):
+            flat.update(flatten(value, name + "."))
+        elif isinstance(value, (int, float)) and not isinstance(value, bool):
+            flat[name] = value
+    return flat
+
+
+def compare(baseline_path, results):
+    """Print the relative change of every timing and rate against an earlier results file"""
+    with open(baseline_path, "r", encoding="utf-8") as f:
+        baseline = json.load(f)
+    before = flatten(baseline["splits"])
+    after = flatten(results["splits"])
+    print(f"📈 Against {baseline.get('commit') or baseline_path}:")
+    for name in sorted(before.keys() & after.keys()):
+        if not (name.endswith("_s") or name.endswith("_per_s")) or not before[name]:
+            continue
+        change = after[name] / before[name] - 1
+        print(f"   {name}: {before[name]:.4g} -> {after[name]:.4g} ({change:+.1%})")
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Offline benchmark of extraction, ingest and query with replayed model outputs")
+    parser.add_argument("--splits", nargs="+", choices=SPLITS, default=["dev", "test", "train"])
+    parser.add_argument("--count", type=int, default=None, help="only the first N dialogues of each split")
+    parser.add_argument("--outputs", default=None, help="main.py output log to replay (default: schema_extraction/result/dev.output)")
+    parser.add_argument("--llm-latency", type=float, default=LLM_LATENCY, help="seconds per extraction call")
+    parser.add_argument("--llm-jitter", type=float, default=LLM_JITTER)
+    parser.add_argument("--embed-latency", type=float, default=EMBED_LATENCY, help="seconds per embedding batch")
+    parser.add_argument("--query-latency", type=float, default=QUERY_LATENCY, help="seconds per query answer")
+    parser.add_argument("--concurrency", type=int, default=MAX_CONCURRENCY)
+    parser.add_argument("--mode", choices=EXTRACTION_MODES, default="cot", help="extraction decoding mode (main.py --mode)")
+    parser.add_argument("--rate-limits", action="store_true", help="apply main.py's requests/tokens per minute limits")
+    parser.add_argument("--queries", type=int, default=QUERY_PAIRS, help="entity pairs asked per split")
+    parser.add_argument("--output", default=None, help="results JSON (default: benchmark/results/<commit>.json)")
+    parser.add_argument("--compare", default=None, help="earlier results JSON to compare against")
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    outputs = load_recorded_outputs(args.outputs) if args.outputs else load_recorded_outputs()
+    print(f"Replaying {len(outputs)} recorded outputs")
+    commit = git_commit()
+    results = {
+        "commit": commit,
+        "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "settings": {
+            "count": args.count,
+            "recorded_outputs": len(outputs),
+            "llm_latency": args.llm_latency,
+            "llm_jitter": args.llm_jitter,
+            "embed_latency": args.embed_latency,
+            "query_latency": args.query_latency,
+            "concurrency": args.concurrency,
+            "mode": args.mode,
+            "rate_limits": args.rate_limits,
+            "requests_per_minute": REQUESTS_PER_MINUTE if args.rate_limits else None,
+            "tokens_per_minute": TOKENS_PER_MINUTE if args.rate_limits else None,
+        },
+        "splits": {},
+    }
+    for split in args.splits:
+        results["splits"][split] = asyncio.run(bench_split(split, outputs, args))
+
+    output = Path(args.output or os.path.join(RESULTS_DIR, f"{(commit or 'local')[:12]}.json"))
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps(results, indent=2), encoding="utf-8")
+    print(f"✅ Results written to {output}")
+    if args.compare:
+        compare(args.compare, results)
+
+
+if __name__ == "__main__":
+    main()
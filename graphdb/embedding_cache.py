@@ -0,0 +1,70 @@
+import os
+import sys
+from array import array
+
+# Add parent folder to sys.path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from schema_extraction.cache import ResponseCache, make_key
+
+# Shared by ingest, question retrieval and predicate normalization
+EMBEDDING_MODEL = "text-embedding-3-small"
+
+
+def open_embedder():
+    # Imported here, so the cache and the model name load without memmachine
+    from memmachine.common.embedder.openai_embedder import OpenAIEmbedder
+
+    return OpenAIEmbedder(
+        {
+            "model": EMBEDDING_MODEL,
+            "api_key": os.getenv("OPENAI_API_KEY"),
+        }
+    )
+
+
+class EmbeddingCache:
+    """
+    Persistent embedding cache keyed on model name plus the embedded text.
+    Vectors are stored as packed float32 arrays; eviction is by age and LRU size.
+    With `search=True` texts are embedded as queries (`search_embed`) and keyed
+    apart from documents, so questions never mix with ingested triples.
+    """
+
+    def __init__(self, path, model, max_entries=1_000_000, max_age=None, search=False):
+        self.model = model
+        self.search = search
+        self._cache = ResponseCache(path, max_entries=max_entries, max_age=max_age)
+
+    def _key(self, text):
+        if self.search:
+            return make_key(self.model, "search", text)
+        return make_key(self.model, text)
+
+    def get_many(self, texts):
+        values = self._cache.get_many([self._key(text) for text in texts])
+        return [array("f", value).tolist() if value is not None else None for value in values]
+
+    def set_many(self, texts, embeddings):
+        self._cache.set_many(
+            (self._key(text), array("f", embedding).tobytes())
+            for text, embedding in zip(texts, embeddings)
+        )
+
+    async def embed(self, embedder, texts):
+        """Embeddings for `texts`, calling the embedder only for cache misses"""
+        embeddings = self.get_many(texts)
+        missing = [i for i, embedding in enumerate(embeddings) if embedding is None]
+        if missing:
+            embed = embedder.search_embed if self.search else embedder.ingest_embed
+            fresh = await embed([texts[i] for i in missing])
+            self.set_many([texts[i] for i in missing], fresh)
+            for i, embedding in zip(missing, fresh):
+                embeddings[i] = embedding
+        return embeddings
+
+    def stats(self):
+        return self._cache.stats()
+
+    def close(self):
+        self._cache.close()
@@ -1,79 +1,418 @@
+import argparse
 import asyncio
 import os
-from uuid import uuid4
+import sys
+import time
+from pathlib import Path
+from uuid import NAMESPACE_URL, uuid5
 
 from dotenv import load_dotenv
+from neo4j import AsyncGraphDatabase
 
 from memmachine.common.vector_graph_store import Node, Edge
 from memmachine.common.vector_graph_store.neo4j_vector_graph_store import Neo4jVectorGraphStore
-from memmachine.common.embedder.openai_embedder import OpenAIEmbedder
-
-async def start():
-    store = Neo4jVectorGraphStore(
-        {
-            "uri": "bolt://localhost:7687",
-            "username": "neo4j",
-            "password": "password",
-        }
-    )
 
-    embedder = OpenAIEmbedder(
-        {
-            "model": "text-embedding-3-small",
-            "api_key": os.getenv("OPENAI_API_KEY"),
-        }
-    )
+# Add parent folder to sys.path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from schema_extraction.telemetry import Telemetry
+from schema_extraction.triplet_store import TripletStoreReader
+from graphdb.embedding_cache import EMBEDDING_MODEL, EmbeddingCache, open_embedder
+from graphdb.local_store import LocalGraphStore
+from graphdb.vector_index import build_vector_index
+
+TRIPLETS_PATH = "../schema_extraction/result/dev.triplets"
+CACHE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "cache")
+# Shared with question_agent and the benchmark, so it must not depend on the working directory
+EMBEDDING_CACHE_PATH = os.path.join(CACHE_DIR, "embeddings.sqlite")
+# Question (search) embeddings, kept apart from the triple embeddings above
+QUESTION_EMBEDDING_CACHE_PATH = os.path.join(CACHE_DIR, "questions.sqlite")
+# "neo4j", or "local" for the in-process LocalGraphStore persisted to LOCAL_GRAPH_PATH
+GRAPH_BACKEND = os.getenv("GRAPH_BACKEND", "neo4j")
+LOCAL_GRAPH_PATH = os.path.join(CACHE_DIR, "graph.pickle")
+# Triples written by the last successful ingest, used to compute the next delta
+SNAPSHOT_PATH = os.path.join(CACHE_DIR, "ingested.txt")
+LOCAL_SNAPSHOT_PATH = os.path.join(CACHE_DIR, "ingested.local.txt")
+TELEMETRY_LOG_PATH = os.path.join(CACHE_DIR, "inject.telemetry.jsonl")
+METRICS_PATH = os.path.join(CACHE_DIR, "inject.metrics.json")
+# Normalized edge embedding matrix for question retrieval, rebuilt after every ingest
+VECTOR_INDEX_PATH = os.path.join(CACHE_DIR, "edges")
+LOCAL_VECTOR_INDEX_PATH = os.path.join(CACHE_DIR, "edges.local")
+
+# Deterministic ids: re-ingesting the same entity or triple yields the same uuid
+ENTITY_NAMESPACE = uuid5(NAMESPACE_URL, "knowledge-extraction/entity")
+TRIPLE_NAMESPACE = uuid5(NAMESPACE_URL, "knowledge-extraction/triple")
+
+NEO4J_CONFIG = {
+    "uri": "bolt://localhost:7687",
+    "username": "neo4j",
+    "password": "password",
+}
+# Node ids are derived from names, so names are unique; the constraint also indexes them
+NAME_CONSTRAINT = "CREATE CONSTRAINT entity_name IF NOT EXISTS FOR (n:Entity) REQUIRE n.name IS UNIQUE"
+# For stores without delete_edges: edges between surviving nodes, by their uuid property
+DELETE_EDGES = "MATCH ()-[r]->() WHERE r.uuid IN $uuids DELETE r"
+
+EMBED_BATCH_SIZE = 100
+MAX_CONCURRENT_EMBEDS = 4
+WRITE_CHUNK_SIZE = 500
+MAX_RETRIES = 3
+RETRY_BACKOFF = 2.0
+
+
+def iter_triples(path):
+    """Stream (source, target, relation) triples from a columnar triplet store"""
+    with TripletStoreReader(path) as triplets:
+        yield from triplets.triples()
+
+
+def triple_text(source, target, relation):
+    return f"({source})-[{relation}]->({target})"
+
+
+def node_uuid(name):
+    return uuid5(ENTITY_NAMESPACE, name)
+
+
+def edge_uuid(source, target, relation):
+    return uuid5(TRIPLE_NAMESPACE, f"{source}||{target}||{relation}")
+
+
+def load_snapshot(path):
+    """Triples of the last successful ingest ('x||y||r' lines); empty if there was none"""
+    snapshot = set()
+    if os.path.exists(path):
+        with open(path, "r", encoding="utf-8") as f:
+            for line in f:
+                parts = line.rstrip("\n").split("||")
+                if len(parts) == 3:
+                    snapshot.add(tuple(parts))
+    return snapshot
+
+
+def save_snapshot(path, triples):
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_name(path.name + ".tmp")
+    with tmp.open("w", encoding="utf-8") as f:
+        for source, target, relation in sorted(triples):
+            f.write(f"{source}||{target}||{relation}\n")
+    os.replace(tmp, path)
+
+
+def open_graph_store(backend=GRAPH_BACKEND):
+    if backend == "local":
+        return LocalGraphStore.load(LOCAL_GRAPH_PATH)
+    if backend != "neo4j":
+        raise ValueError(f"unknown graph backend {backend!r}")
+    return Neo4jVectorGraphStore(dict(NEO4J_CONFIG))
+
+
+def open_neo4j_driver(config=NEO4J_CONFIG):
+    """Async driver on the same database as open_graph_store, for the Cypher the store has no method for"""
+    return AsyncGraphDatabase.driver(config["uri"], auth=(config["username"], config["password"]))
 
-    node_map = {}
-    nodes = []
-    edges = []
-    embedded_triple_texts = []
-    with open("../schema_extraction/result/dev.txt") as triples:
-        for triple in triples:
-            source, target, relation = triple.strip().split("||")
-            embedded_triple_text = f"({source})-[{relation}]->({target})"
-            embedded_triple_texts.append(embedded_triple_text)
-
-            if source not in node_map:
-                node = Node(
-                    uuid=uuid4(),
-                    labels={"Entity"},
-                    properties={"name": source}
-                )
-                nodes.append(node)
-                node_map[source] = node.uuid
-
-            if target not in node_map:
-                node = Node(
-                    uuid=uuid4(),
-                    labels={"Entity"},
-                    properties={"name": target}
-                )
-                nodes.append(node)
-                node_map[target] = node.uuid
 
+def snapshot_path(backend=GRAPH_BACKEND):
+    """Each backend holds its own graph, so each has its own ingest snapshot"""
+    return LOCAL_SNAPSHOT_PATH if backend == "local" else SNAPSHOT_PATH
+
+
+def vector_index_path(backend=GRAPH_BACKEND):
+    return LOCAL_VECTOR_INDEX_PATH if backend == "local" else VECTOR_INDEX_PATH
+
+
+async def ensure_name_constraint(store, driver=None):
+    """
+    Index Entity.name: through the store's create_property_index when it has one,
+    otherwise with the NAME_CONSTRAINT Cypher through the neo4j `driver`.
+    Returns whether the index exists; name lookups scan the graph when it does not.
+    """
+    create_index = getattr(store, "create_property_index", None)
+    if create_index is not None:
+        await create_index("Entity", "name")
+        return True
+    if driver is None:
+        print(f"⚠️ No neo4j driver for {type(store).__name__}, Entity.name is not indexed")
+        return False
+    try:
+        await driver.execute_query(NAME_CONSTRAINT)
+    except Exception as e:
+        print(f"⚠️ Could not create the Entity.name constraint, names are not indexed: {e!r}")
+        return False
+    return True
+
+
+async def with_retries(call, label, retries=MAX_RETRIES, backoff=RETRY_BACKOFF):
+    for attempt in range(1, retries + 2):
+        try:
+            return await call()
+        except Exception as e:
+            if attempt > retries:
+                raise
+            delay = backoff * 2 ** (attempt - 1)
+            print(f"🔁 {label} failed (attempt {attempt}): {type(e).__name__}: {e}; retrying in {delay:.0f}s")
+            await asyncio.sleep(delay)
+
+
+class IngestStats:
+    def __init__(self):
+        self.started = time.monotonic()
+        self.read = 0
+        self.duplicates = 0
+        self.unchanged = 0
+        self.embedded = 0
+        self.nodes_written = 0
+        self.edges_written = 0
+        self.nodes_removed = 0
+        self.edges_removed = 0
+        # Every distinct triple of this ingest
+        self.triples = set()
+        # Removed triples whose edges could not be deleted; kept in the snapshot so the next run retries
+        self.undeleted = set()
+
+    def snapshot(self):
+        """The triples in the store after this ingest, to be saved as the next snapshot"""
+        return self.triples | self.undeleted
+
+    def report(self):
+        elapsed = time.monotonic() - self.started
+        rate = self.edges_written / elapsed if elapsed else 0.0
+        print(
+            f"📈 read {self.read} ({self.duplicates} duplicates, {self.unchanged} unchanged), "
+            f"embedded {self.embedded}, wrote {self.nodes_written} nodes / {self.edges_written} edges, "
+            f"removed {self.nodes_removed} nodes / {self.edges_removed} edges "
+            f"in {elapsed:.1f}s ({rate:.0f} edges/s)"
+        )
+
+
+async def ingest(
+    store,
+    embedder,
+    triples,
+    batch_size=EMBED_BATCH_SIZE,
+    max_concurrent_embeds=MAX_CONCURRENT_EMBEDS,
+    chunk_size=WRITE_CHUNK_SIZE,
+    retries=MAX_RETRIES,
+    progress=IngestStats.report,
+    embedding_cache=None,
+    snapshot=None,
+    name_index=None,
+    telemetry=None,
+    driver=None,
+):
+    """
+    Streaming ingest: triples are read incrementally, embedded in batches with up
+    to `max_concurrent_embeds` requests in flight, and written to the store in
+    chunks of `chunk_size` edges (new nodes first) while embedding continues.
+    Memory stays bounded by the in-flight batches plus one write chunk.
+    Duplicate triples are dropped before embedding, and with `embedding_cache`
+    only triple texts missing from the cache are sent to the embedder.
+
+    With `snapshot` (the triples already in the store), only the delta is
+    written: new triples are added, and edges and nodes that no longer appear
+    are deleted afterwards. Node and edge ids are deterministic, so the graph
+    never accumulates duplicates across runs. A `name_index` is kept in step
+    with the nodes written and removed. Embed and write times go to `telemetry`.
+    Stale edges are deleted with the store's delete_edges, or with Cypher
+    through the neo4j `driver` when the store has none.
+    """
+    stats = IngestStats()
+    telemetry = telemetry if telemetry is not None else Telemetry(stage="inject")
+    snapshot = snapshot or set()
+    embedded = asyncio.Queue(maxsize=max_concurrent_embeds)
+    slots = asyncio.Semaphore(max_concurrent_embeds)
+    embed_tasks = []
+
+    async def embed(batch):
+        try:
+            texts = [text for text, _, _, _ in batch]
+            if embedding_cache is not None:
+                call = lambda: embedding_cache.embed(embedder, texts)
+            else:
+                call = lambda: embedder.ingest_embed(texts)
+            with telemetry.timer("embed_batch"):
+                embeddings = await with_retries(call, f"embedding {len(texts)} triples", retries)
+            stats.embedded += len(batch)
+            await embedded.put(list(zip(batch, embeddings)))
+        finally:
+            slots.release()
+
+    async def produce():
+        try:
+            batch = []
+            seen = stats.triples
+            for source, target, relation in triples:
+                stats.read += 1
+                if (source, target, relation) in seen:
+                    stats.duplicates += 1
+                    continue
+                seen.add((source, target, relation))
+                if (source, target, relation) in snapshot:
+                    stats.unchanged += 1
+                    continue
+                batch.append((triple_text(source, target, relation), source, target, relation))
+                if len(batch) == batch_size:
+                    await slots.acquire()
+                    embed_tasks.append(asyncio.create_task(embed(batch)))
+                    batch = []
+            if batch:
+                await slots.acquire()
+                embed_tasks.append(asyncio.create_task(embed(batch)))
+            await asyncio.gather(*embed_tasks)
+        except asyncio.CancelledError:
+            # consume failed and is gone; nobody is waiting for the end marker
+            raise
+        except BaseException:
+            # Let consume write what it has; the error surfaces when the producer is awaited
+            await embedded.put(None)
+            raise
+        await embedded.put(None)
+
+    written_nodes = {name for source, target, _ in snapshot for name in (source, target)}
+
+    async def write_chunk(chunk):
+        nodes = []
+        edges = []
+        for (text, source, target, relation), embedding in chunk:
+            for name in (source, target):
+                if name not in written_nodes:
+                    written_nodes.add(name)
+                    nodes.append(Node(uuid=node_uuid(name), labels={"Entity"}, properties={"name": name}))
             edges.append(
                 Edge(
-                    uuid=uuid4(),
-                    source_uuid=node_map[source],
-                    target_uuid=node_map[target],
+                    uuid=edge_uuid(source, target, relation),
+                    source_uuid=node_uuid(source),
+                    target_uuid=node_uuid(target),
                     relation="RELATED_TO",
-                    properties={"relation": relation, "triple_text": embedded_triple_text},
+                    properties={"relation": relation, "triple_text": text, "embedding": embedding},
                 )
             )
+        # Nodes go first so every edge endpoint exists
+        if nodes:
+            with telemetry.timer("write", kind="nodes"):
+                await with_retries(lambda: store.add_nodes(nodes), f"writing {len(nodes)} nodes", retries)
+            stats.nodes_written += len(nodes)
+            if name_index is not None:
+                for node in nodes:
+                    name_index.add(node.properties["name"], node.uuid)
+        with telemetry.timer("write", kind="edges"):
+            await with_retries(lambda: store.add_edges(edges), f"writing {len(edges)} edges", retries)
+        stats.edges_written += len(edges)
+        if progress is not None:
+            progress(stats)
+
+    async def consume():
+        chunk = []
+        while (items := await embedded.get()) is not None:
+            chunk.extend(items)
+            if len(chunk) >= chunk_size:
+                await write_chunk(chunk)
+                chunk = []
+        if chunk:
+            await write_chunk(chunk)
+
+    producer = asyncio.create_task(produce())
+    try:
+        await consume()
+        await producer
+    finally:
+        # After a failure on either side, stop the producer and the embeds blocked on the full queue
+        for task in (producer, *embed_tasks):
+            task.cancel()
+        await asyncio.gather(producer, *embed_tasks, return_exceptions=True)
+    with telemetry.timer("remove_stale"):
+        await remove_stale(store, snapshot, stats, retries, name_index, driver)
+    for name in ("read", "duplicates", "unchanged", "embedded"):
+        telemetry.count(f"triples_{name}", getattr(stats, name))
+    for name in ("nodes_written", "edges_written", "nodes_removed", "edges_removed"):
+        telemetry.count(name, getattr(stats, name))
+    return stats
 
-    embeddings = []
-    for i in range(0, len(embedded_triple_texts), 100):
-        batch = embedded_triple_texts[i:i+100]
-        batch_embeddings = await embedder.ingest_embed(batch)
-        embeddings.extend(batch_embeddings)
 
-    for edge, embedding in zip(edges, embeddings):
-        edge.properties["embedding"] = embedding
+async def remove_stale(store, snapshot, stats, retries=MAX_RETRIES, name_index=None, driver=None):
+    """Delete edges of snapshot triples that are gone, then nodes no triple mentions any more"""
+    removed = snapshot - stats.triples
+    if not removed:
+        return
+    current_names = {name for source, target, _ in stats.triples for name in (source, target)}
+    stale_names = {
+        name for source, target, _ in removed for name in (source, target)
+    } - current_names
+
+    # Edges between surviving nodes need an explicit delete; deleting a node drops its edges
+    stale_edges = [
+        (source, target, relation)
+        for source, target, relation in removed
+        if source in current_names and target in current_names
+    ]
+    edge_uuids = [edge_uuid(*triple) for triple in stale_edges]
+    if edge_uuids:
+        label = f"deleting {len(edge_uuids)} edges"
+        if hasattr(store, "delete_edges"):
+            await with_retries(lambda: store.delete_edges(edge_uuids), label, retries)
+            stats.edges_removed += len(edge_uuids)
+        elif driver is not None:
+            uuids = [str(uuid) for uuid in edge_uuids]
+            await with_retries(lambda: driver.execute_query(DELETE_EDGES, uuids=uuids), label, retries)
+            stats.edges_removed += len(edge_uuids)
+        else:
+            stats.undeleted.update(stale_edges)
+            print(f"⚠️ {type(store).__name__} cannot delete edges, {len(edge_uuids)} stale edges kept for the next run")
+    if stale_names:
+        node_uuids = [node_uuid(name) for name in stale_names]
+        await with_retries(lambda: store.delete_nodes(node_uuids), f"deleting {len(node_uuids)} nodes", retries)
+        stats.nodes_removed += len(node_uuids)
+        stats.edges_removed += len(removed) - len(edge_uuids)
+        if name_index is not None:
+            for name in stale_names:
+                name_index.remove(name)
+
+
+async def start(triplets_path=TRIPLETS_PATH, full=False, backend=GRAPH_BACKEND):
+    store = open_graph_store(backend)
+    driver = open_neo4j_driver() if backend == "neo4j" else None
+
+    embedder = open_embedder()
+    embedding_cache = EmbeddingCache(EMBEDDING_CACHE_PATH, EMBEDDING_MODEL)
+    telemetry = Telemetry(TELEMETRY_LOG_PATH, stage="inject")
+    await ensure_name_constraint(store, driver)
+
+    # Without a snapshot (first run or --full) every triple is written
+    snapshot = set() if full else load_snapshot(snapshot_path(backend))
+    stats = await ingest(
+        store, embedder, iter_triples(triplets_path),
+        embedding_cache=embedding_cache, snapshot=snapshot, telemetry=telemetry, driver=driver,
+    )
+    if backend == "local":
+        store.save()
+    if driver is not None:
+        await driver.close()
+    save_snapshot(snapshot_path(backend), stats.snapshot())
+    # Every vector is in the embedding cache by now, so this is a local rebuild
+    with telemetry.timer("build_vector_index"):
+        await build_vector_index(vector_index_path(backend), stats.triples, embedder, embedding_cache, triple_text)
+    print("✅ Ingest complete")
+    stats.report()
+    cache_stats = embedding_cache.stats()
+    print(f"Embedding cache: {cache_stats}")
+    telemetry.count("embedding_cache_hits", cache_stats["hits"])
+    telemetry.count("embedding_cache_misses", cache_stats["misses"])
+    telemetry.event("ingest", **{k: v for k, v in vars(stats).items() if isinstance(v, int)})
+    telemetry.report()
+    telemetry.write_summary(METRICS_PATH)
+    telemetry.write_summary(METRICS_PATH.replace(".json", ".prom"))
+    telemetry.close()
+    embedding_cache.close()
 
-    await store.add_nodes(nodes)
-    await store.add_edges(edges)
+def parse_args():
+    parser = argparse.ArgumentParser(description="Ingest extracted triplets into the graph store")
+    parser.add_argument("--triplets", default=TRIPLETS_PATH, help="columnar triplet store to ingest")
+    parser.add_argument("--full", action="store_true", help="ignore the last snapshot and write every triple")
+    parser.add_argument("--backend", choices=["neo4j", "local"], default=GRAPH_BACKEND, help="graph store to ingest into")
+    return parser.parse_args()
 
 if __name__ == "__main__":
+    args = parse_args()
     load_dotenv()
-    asyncio.run(start())
\ No newline at end of file
+    asyncio.run(start(args.triplets, args.full, args.backend))
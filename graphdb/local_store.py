@@ -0,0 +1,231 @@
+import os
+import pickle
+from array import array
+from pathlib import Path as FilePath
+
+from memmachine.common.vector_graph_store import Node, Edge, Path
+
+SNAPSHOT_VERSION = 1
+
+
+class LocalGraphStore:
+    """
+    In-process stand-in for Neo4jVectorGraphStore with the operations inject.py
+    and query.py use. Nodes and edges live in dicts; for traversal they are
+    compacted into CSR adjacency arrays (rebuilt lazily after a write), and
+    find_paths joins a forward and a backward BFS that meet in the middle.
+    """
+
+    def __init__(self, path=None):
+        self.path = path
+        self.nodes = {}
+        self.edges = {}
+        # property -> value -> set of node uuids, see create_property_index
+        self.property_indexes = {}
+        self._dirty = True
+
+    # Writes
+
+    async def add_nodes(self, nodes):
+        for node in nodes:
+            old = self.nodes.get(node.uuid)
+            if old is not None:
+                self._unindex(old)
+            self.nodes[node.uuid] = node
+            self._index(node)
+        self._dirty = True
+
+    async def add_edges(self, edges):
+        for edge in edges:
+            if edge.source_uuid not in self.nodes or edge.target_uuid not in self.nodes:
+                raise KeyError(f"edge {edge.uuid} references a missing node")
+            self.edges[edge.uuid] = edge
+        self._dirty = True
+
+    async def delete_nodes(self, node_uuids):
+        node_uuids = set(node_uuids)
+        for uuid in node_uuids:
+            node = self.nodes.pop(uuid, None)
+            if node is not None:
+                self._unindex(node)
+        # Like DETACH DELETE, a deleted node takes its edges with it
+        self.edges = {
+            uuid: edge for uuid, edge in self.edges.items()
+            if edge.source_uuid not in node_uuids and edge.target_uuid not in node_uuids
+        }
+        self._dirty = True
+
+    async def delete_edges(self, edge_uuids):
+        for uuid in edge_uuids:
+            self.edges.pop(uuid, None)
+        self._dirty = True
+
+    # Property index
+
+    async def create_property_index(self, label, property_name):
+        index = self.property_indexes.setdefault(property_name, {})
+        for node in self.nodes.values():
+            if property_name in node.properties:
+                index.setdefault(node.properties[property_name], set()).add(node.uuid)
+
+    def _index(self, node):
+        for property_name, index in self.property_indexes.items():
+            if property_name in node.properties:
+                index.setdefault(node.properties[property_name], set()).add(node.uuid)
+
+    def _unindex(self, node):
+        for property_name, index in self.property_indexes.items():
+            uuids = index.get(node.properties.get(property_name))
+            if uuids is not None:
+                uuids.discard(node.uuid)
+
+    # Reads
+
+    async def search_matching_nodes(self, limit=None, required_labels=None, required_properties=None):
+        required_labels = set(required_labels or ())
+        required_properties = required_properties or {}
+
+        candidates = None
+        for property_name, value in required_properties.items():
+            index = self.property_indexes.get(property_name)
+            if index is not None:
+                candidates = index.get(value, set())
+                break
+        nodes = (self.nodes[uuid] for uuid in candidates) if candidates is not None else self.nodes.values()
+
+        matches = []
+        for node in nodes:
+            if not required_labels <= set(node.labels):
+                continue
+            if any(node.properties.get(k) != v for k, v in required_properties.items()):
+                continue
+            matches.append(node)
+            if limit is not None and len(matches) >= limit:
+                break
+        return matches
+
+    def _compact(self):
+        """CSR adjacency over both edge directions: neighbors of node i are targets[offsets[i]:offsets[i + 1]]"""
+        self._node_uuids = list(self.nodes)
+        self._node_ids = {uuid: i for i, uuid in enumerate(self._node_uuids)}
+        self._edge_list = list(self.edges.values())
+
+        degree = [0] * (len(self._node_uuids) + 1)
+        for edge in self._edge_list:
+            degree[self._node_ids[edge.source_uuid] + 1] += 1
+            degree[self._node_ids[edge.target_uuid] + 1] += 1
+        for i in range(1, len(degree)):
+            degree[i] += degree[i - 1]
+        self._offsets = array("I", degree)
+
+        fill = list(degree[:-1])
+        self._targets = array("I", bytes(4 * degree[-1]))
+        self._edge_ids = array("I", bytes(4 * degree[-1]))
+        for e, edge in enumerate(self._edge_list):
+            s, t = self._node_ids[edge.source_uuid], self._node_ids[edge.target_uuid]
+            for a, b in ((s, t), (t, s)):
+                self._targets[fill[a]] = b
+                self._edge_ids[fill[a]] = e
+                fill[a] += 1
+        self._dirty = False
+
+    def _walks(self, start, hops):
+        """walks[h]: simple walks of exactly h hops from `start` as (node ids, edge ids)"""
+        offsets, targets, edge_ids = self._offsets, self._targets, self._edge_ids
+        walks = [[((start,), ())]]
+        for _ in range(hops):
+            longer = []
+            for nodes, edges in walks[-1]:
+                last = nodes[-1]
+                for k in range(offsets[last], offsets[last + 1]):
+                    if targets[k] not in nodes:
+                        longer.append((nodes + (targets[k],), edges + (edge_ids[k],)))
+            walks.append(longer)
+        return walks
+
+    async def find_paths(self, source_node_uuid, target_node_uuid, max_hops):
+        """
+        Every simple path of 1..max_hops edges between the two nodes, ignoring
+        edge direction. A path of length L is found exactly once, as a forward
+        walk of min(L, ceil(max_hops / 2)) hops joined with a backward walk of
+        the remaining hops.
+        """
+        if self._dirty:
+            self._compact()
+        source = self._node_ids.get(source_node_uuid)
+        target = self._node_ids.get(target_node_uuid)
+        if source is None or target is None or source == target:
+            return []
+
+        forward_hops = (max_hops + 1) // 2
+        forward = self._walks(source, forward_hops)
+        backward = self._walks(target, max_hops - forward_hops)
+        backward_by_end = []
+        for walks in backward:
+            by_end = {}
+            for nodes, edges in walks:
+                by_end.setdefault(nodes[-1], []).append((nodes, edges))
+            backward_by_end.append(by_end)
+
+        paths = []
+        for length in range(1, max_hops + 1):
+            f = min(length, forward_hops)
+            b = length - f
+            for nodes, edges in forward[f]:
+                for back_nodes, back_edges in backward_by_end[b].get(nodes[-1], ()):
+                    if set(nodes[:-1]) & set(back_nodes):
+                        continue
+                    paths.append(self._path(nodes + back_nodes[-2::-1], edges + back_edges[::-1]))
+        return paths
+
+    def _path(self, node_ids, edge_ids):
+        return Path(
+            nodes=[self.nodes[self._node_uuids[i]] for i in node_ids],
+            edges=[self._edge_list[e] for e in edge_ids],
+        )
+
+    async def close(self):
+        pass
+
+    # Snapshots
+
+    def save(self, path=None):
+        """Write the graph to a pickle snapshot (atomically replaced)"""
+        path = FilePath(path or self.path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        data = {
+            "version": SNAPSHOT_VERSION,
+            "nodes": [(n.uuid, set(n.labels), n.properties) for n in self.nodes.values()],
+            "edges": [
+                (e.uuid, e.source_uuid, e.target_uuid, e.relation, e.properties)
+                for e in self.edges.values()
+            ],
+            "property_indexes": list(self.property_indexes),
+        }
+        tmp = path.with_name(path.name + ".tmp")
+        with tmp.open("wb") as f:
+            pickle.dump(data, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp, path)
+
+    @classmethod
+    def load(cls, path):
+        """Graph from a snapshot written by save(); an empty graph when there is none yet"""
+        store = cls(path)
+        if not os.path.exists(path):
+            return store
+        with open(path, "rb") as f:
+            data = pickle.load(f)
+        if data["version"] != SNAPSHOT_VERSION:
+            raise ValueError(f"{path} is a version {data['version']} snapshot")
+        for property_name in data["property_indexes"]:
+            store.property_indexes[property_name] = {}
+        for uuid, labels, properties in data["nodes"]:
+            node = Node(uuid=uuid, labels=labels, properties=properties)
+            store.nodes[uuid] = node
+            store._index(node)
+        for uuid, source_uuid, target_uuid, relation, properties in data["edges"]:
+            store.edges[uuid] = Edge(
+                uuid=uuid, source_uuid=source_uuid, target_uuid=target_uuid,
+                relation=relation, properties=properties,
+            )
+        return store
@@ -0,0 +1,112 @@
+import bisect
+import difflib
+from typing import NamedTuple, Optional, Tuple
+
+FOUND = "found"
+AMBIGUOUS = "ambiguous"
+MISSING = "missing"
+
+
+class Resolution(NamedTuple):
+    query: str
+    status: str
+    name: Optional[str] = None
+    uuid: Optional[object] = None
+    # Competing names when ambiguous
+    candidates: Tuple[str, ...] = ()
+
+    @property
+    def found(self):
+        return self.status == FOUND
+
+
+class UnresolvedEntityError(LookupError):
+    """Raised by queries whose endpoints do not resolve to exactly one node"""
+
+    def __init__(self, resolutions):
+        self.resolutions = [r for r in resolutions if not r.found]
+        super().__init__(", ".join(
+            f"{r.query!r} is {r.status}" + (f" ({', '.join(r.candidates)})" if r.candidates else "")
+            for r in self.resolutions
+        ))
+
+
+class NameIndex:
+    """
+    In-process entity name -> node uuid index. Lookups try the exact name, its
+    case-folded form, a unique prefix and finally a fuzzy match; results are
+    memoized until the index changes.
+    """
+
+    def __init__(self, cutoff=0.85, max_candidates=5):
+        self.cutoff = cutoff
+        self.max_candidates = max_candidates
+        self.uuids = {}
+        self.folded = {}
+        self._sorted = []
+        self._memo = {}
+
+    def __len__(self):
+        return len(self.uuids)
+
+    def __contains__(self, name):
+        return name in self.uuids
+
+    def add(self, name, uuid):
+        if name in self.uuids:
+            return
+        self.uuids[name] = uuid
+        key = name.casefold()
+        names = self.folded.setdefault(key, [])
+        if not names:
+            bisect.insort(self._sorted, key)
+        names.append(name)
+        self._memo = {}
+
+    def remove(self, name):
+        if self.uuids.pop(name, None) is None:
+            return
+        key = name.casefold()
+        names = self.folded[key]
+        names.remove(name)
+        if not names:
+            del self.folded[key]
+            del self._sorted[bisect.bisect_left(self._sorted, key)]
+        self._memo = {}
+
+    def _result(self, query, names):
+        if len(names) == 1:
+            return Resolution(query, FOUND, names[0], self.uuids[names[0]])
+        return Resolution(query, AMBIGUOUS, candidates=tuple(sorted(names)[: self.max_candidates]))
+
+    def _prefixed(self, key):
+        start = bisect.bisect_left(self._sorted, key)
+        names = []
+        for folded in self._sorted[start:]:
+            if not folded.startswith(key):
+                break
+            names.extend(self.folded[folded])
+        return names
+
+    def resolve(self, query):
+        """Resolution of `query`: exact, case-folded, unique prefix, then fuzzy"""
+        uuid = self.uuids.get(query)
+        if uuid is not None:
+            return Resolution(query, FOUND, query, uuid)
+        if query in self._memo:
+            return self._memo[query]
+
+        key = query.casefold()
+        if key in self.folded:
+            result = self._result(query, self.folded[key])
+        elif names := self._prefixed(key):
+            result = self._result(query, names)
+        else:
+            matches = difflib.get_close_matches(key, self.folded.keys(), n=2, cutoff=self.cutoff)
+            names = [name for match in matches for name in self.folded[match]]
+            result = self._result(query, names) if names else Resolution(query, MISSING)
+        self._memo[query] = result
+        return result
+
+    def resolve_pair(self, source, target):
+        return self.resolve(source), self.resolve(target)
@@ -0,0 +1,121 @@
+from collections import Counter, OrderedDict, defaultdict
+from typing import NamedTuple, Tuple
+
+HUB_COUNT = 20
+NEIGHBORHOOD_HOPS = 2
+MAX_PROMPT_PATHS = 20
+
+
+class HopPath(NamedTuple):
+    """A path as entity names plus (relation, forward) per edge; forward means names[i] -> names[i + 1]"""
+    names: Tuple[str, ...]
+    hops: Tuple[Tuple[str, bool], ...]
+
+    def __str__(self):
+        text = self.names[0]
+        for (relation, forward), name in zip(self.hops, self.names[1:]):
+            text += (f"-[{relation}]->" if forward else f"<-[{relation}]-") + name
+        return text
+
+    def reversed(self):
+        return HopPath(self.names[::-1], tuple((r, not forward) for r, forward in self.hops[::-1]))
+
+    @classmethod
+    def from_graph_path(cls, path):
+        names = tuple(node.properties["name"] for node in path.nodes)
+        hops = tuple(
+            (edge.properties["relation"], edge.source_uuid != node.uuid)
+            for edge, node in zip(path.edges, path.nodes[1:])
+        )
+        return cls(names, hops)
+
+
+def rank_paths(paths, degree, cap=MAX_PROMPT_PATHS):
+    """
+    Shortest paths first; among equally long ones, paths through low-degree
+    entities first, since a hop through a hub says little about the pair.
+    """
+    def key(path):
+        return len(path.hops), sum(degree.get(name, 0) for name in path.names[1:-1]), str(path)
+
+    return sorted(paths, key=key)[:cap]
+
+
+class LRUCache:
+    def __init__(self, max_entries=10_000):
+        self.max_entries = max_entries
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        value = self.entries.get(key)
+        if value is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self.entries.move_to_end(key)
+        return value
+
+    def put(self, key, value):
+        self.entries[key] = value
+        self.entries.move_to_end(key)
+        if len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+
+    def clear(self):
+        self.entries.clear()
+
+    def stats(self):
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total else 0.0,
+            "entries": len(self.entries),
+        }
+
+
+class Neighborhoods:
+    """
+    Entity degrees plus the precomputed 2-hop neighborhoods of the `hub_count`
+    highest-degree entities, built from the ingested (source, target, relation)
+    triples. Paths touching a hub are then answered without the graph store.
+    """
+
+    def __init__(self, triples, hub_count=HUB_COUNT):
+        adjacency = defaultdict(list)
+        for source, target, relation in triples:
+            if source == target:
+                continue
+            adjacency[source].append((target, relation, True))
+            adjacency[target].append((source, relation, False))
+        self.degree = Counter({name: len(edges) for name, edges in adjacency.items()})
+        self.hubs = {}
+        for hub, _ in self.degree.most_common(hub_count):
+            self.hubs[hub] = self._neighborhood(hub, adjacency)
+
+    @staticmethod
+    def _neighborhood(hub, adjacency):
+        paths = defaultdict(list)
+        for middle, relation, forward in adjacency[hub]:
+            paths[middle].append(HopPath((hub, middle), ((relation, forward),)))
+            for target, relation2, forward2 in adjacency[middle]:
+                if target == hub:
+                    continue
+                paths[target].append(
+                    HopPath((hub, middle, target), ((relation, forward), (relation2, forward2)))
+                )
+        return dict(paths)
+
+    def paths(self, source, target, max_hops):
+        """Paths of at most `max_hops` between the pair, or None when neither end is a hub"""
+        if max_hops > NEIGHBORHOOD_HOPS:
+            return None
+        if source in self.hubs:
+            found = self.hubs[source].get(target, [])
+        elif target in self.hubs:
+            found = [path.reversed() for path in self.hubs[target].get(source, [])]
+        else:
+            return None
+        return [path for path in found if len(path.hops) <= max_hops]
@@ -1,78 +1,297 @@
 import asyncio
 import os
-from uuid import uuid4
+import sys
+import threading
+import time
 
 from dotenv import load_dotenv
 
 from memmachine.common.vector_graph_store import Node, Edge, Path
-from memmachine.common.vector_graph_store.neo4j_vector_graph_store import Neo4jVectorGraphStore
-from memmachine.common.embedder.openai_embedder import OpenAIEmbedder
 from memmachine.common.language_model.openai_language_model import OpenAILanguageModel
 
-async def start(source, target):
-    store = Neo4jVectorGraphStore(
-        {
-            "uri": "bolt://localhost:7687",
-            "username": "neo4j",
-            "password": "password",
-        }
-    )
+# Add parent folder to sys.path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
 
-    embedder = OpenAIEmbedder(
-        {
-            "model": "text-embedding-3-small",
-            "api_key": os.getenv("OPENAI_API_KEY"),
-        }
-    )
+from graphdb.inject import GRAPH_BACKEND, load_snapshot, node_uuid, open_graph_store, snapshot_path
+from graphdb.name_index import FOUND, MISSING, NameIndex, Resolution, UnresolvedEntityError
+from schema_extraction.telemetry import Telemetry
+from graphdb.path_cache import HUB_COUNT, MAX_PROMPT_PATHS, HopPath, LRUCache, Neighborhoods, rank_paths
 
-    language_model = OpenAILanguageModel(
-        {
-            "model": "gpt-5-nano",
-            "api_key": os.getenv("OPENAI_API_KEY"),
-        }
-    )
-
-    source_node = (await store.search_matching_nodes(
-        required_properties={"name": source},
-    ))[0]
-
-    target_node = (await store.search_matching_nodes(
-        required_properties={"name": target},
-    ))[0]
-
-    paths = await store.find_paths(
-        source_node_uuid=source_node.uuid,
-        target_node_uuid=target_node.uuid,
-        max_hops=2,
-    )
-
-    path_representations = []
-    for path in paths:
-        path_representation = path.nodes[0].properties["name"]
-        for i in range(len(path.edges)):
-            edge = path.edges[i]
-            node = path.nodes[i + 1]
-
-            edge_representation = f"-[{edge.properties["relation"]}]-"
-            if edge.source_uuid == node.uuid:
-                edge_representation = f"<{edge_representation}"
+LANGUAGE_MODEL = "gpt-5-nano"
+MAX_HOPS = 2
+MAX_CONCURRENT_QUERIES = 8
+QUERY_CACHE_ENTRIES = 10_000
+# Seconds between checks for a new ingest snapshot
+REFRESH_INTERVAL = 1.0
+
+SYSTEM_PROMPT = "Given the following paths between the two entities, determine if there is a meaningful connection between them. If so, explain the connection. If not, state that there is no meaningful connection."
+
+
+def format_path(path):
+    """'Emma<-[per:children]-Rachel-[per:spouse]->Joshua' style rendering of a graph path"""
+    return str(HopPath.from_graph_path(path))
+
+
+def build_name_index(triples):
+    """Name index of every node in the ingested triples; node ids are derived from names, so no graph scan is needed"""
+    index = NameIndex()
+    for source, target, _ in triples:
+        index.add(source, node_uuid(source))
+        index.add(target, node_uuid(target))
+    return index
+
+
+class QueryEngine:
+    """
+    Holds one graph store and one language model for the life of the process, so
+    their connection pools are set up once instead of on every question.
+
+    Use it from a single event loop (`async with QueryEngine() as engine`), or
+    through the *_sync and *_threadsafe methods, which run on a private
+    background loop so the pooled connections survive between calls and
+    callers on any other loop. Do not mix the two uses on one engine: its
+    semaphore, store and pending answers belong to the loop that opened it.
+
+    Entity names are resolved through an in-process NameIndex loaded from the
+    ingest snapshot and reloaded when a new ingest replaces it. The snapshot
+    version is the graph version: path sets and answers are cached per
+    (version, source, target), and paths touching a hub entity come from
+    precomputed neighborhoods instead of the store. At most `max_paths` ranked
+    paths are sent to the language model. The snapshot is checked at most once
+    every `refresh_interval` seconds, and reloaded off the event loop.
+    """
+
+    def __init__(
+        self,
+        store=None,
+        language_model=None,
+        max_hops=MAX_HOPS,
+        max_concurrency=MAX_CONCURRENT_QUERIES,
+        name_index=None,
+        backend=GRAPH_BACKEND,
+        max_paths=MAX_PROMPT_PATHS,
+        hub_count=HUB_COUNT,
+        cache_entries=QUERY_CACHE_ENTRIES,
+        telemetry=None,
+        refresh_interval=REFRESH_INTERVAL,
+    ):
+        self.store = store
+        # Lookup, path and LLM timings plus cache outcomes
+        self.telemetry = telemetry if telemetry is not None else Telemetry(stage="query")
+        self.language_model = language_model
+        self.name_index = name_index
+        self.backend = backend
+        self.snapshot_path = snapshot_path(backend)
+        self.graph_version = None
+        self.refresh_interval = refresh_interval
+        self._checked_at = None
+        self.neighborhoods = None
+        self.max_paths = max_paths
+        self.hub_count = hub_count
+        self.path_cache = LRUCache(cache_entries)
+        self.answer_cache = LRUCache(cache_entries)
+        self._pending = {}
+        self.max_hops = max_hops
+        self.max_concurrency = max_concurrency
+        self._slots = None
+        self._loop = None
+        self._thread = None
+
+    async def open(self):
+        if self.store is None:
+            if self.backend == "local":
+                # Unpickling the local graph is blocking work
+                self.store = await asyncio.to_thread(open_graph_store, self.backend)
             else:
-                edge_representation = f"{edge_representation}>"
+                self.store = open_graph_store(self.backend)
+        if self.language_model is None:
+            self.language_model = OpenAILanguageModel(
+                {
+                    "model": LANGUAGE_MODEL,
+                    "api_key": os.getenv("OPENAI_API_KEY"),
+                }
+            )
+        self._slots = asyncio.Semaphore(self.max_concurrency)
+        await self.refresh(force=True)
+        return self
+
+    async def refresh(self, force=False):
+        """Reload names and neighborhoods and drop cached results when an ingest has rewritten the snapshot"""
+        now = time.monotonic()
+        if not force and self._checked_at is not None and now - self._checked_at < self.refresh_interval:
+            return
+        self._checked_at = now
+        if self.snapshot_path is None or not os.path.exists(self.snapshot_path):
+            return
+        version = os.stat(self.snapshot_path).st_mtime_ns
+        if version == self.graph_version:
+            return
+        reload_store = self.graph_version is not None and self.backend == "local"
+        store, name_index, neighborhoods = await asyncio.to_thread(self._load_snapshot, reload_store)
+        if store is not None:
+            self.store = store
+        self.name_index = name_index
+        self.neighborhoods = neighborhoods
+        self.path_cache.clear()
+        self.answer_cache.clear()
+        self.graph_version = version
+
+    def _load_snapshot(self, reload_store):
+        """(store or None, name index, neighborhoods) of the current snapshot; runs in a worker thread"""
+        # The local graph lives in this process, pick up what the ingest wrote
+        store = open_graph_store(self.backend) if reload_store else None
+        triples = load_snapshot(self.snapshot_path)
+        return store, build_name_index(triples), Neighborhoods(triples, self.hub_count)
+
+    async def close(self):
+        close = getattr(self.store, "close", None)
+        if close is not None:
+            await close()
+
+    async def __aenter__(self):
+        return await self.open()
 
-            path_representation += edge_representation + node.properties["name"]
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.close()
 
-        path_representations.append(path_representation)
+    async def resolve(self, name):
+        """Resolution of an entity name; falls back to an exact store lookup without an index"""
+        if self.name_index is not None:
+            return self.name_index.resolve(name)
+        nodes = await self.store.search_matching_nodes(required_properties={"name": name})
+        if not nodes:
+            return Resolution(name, MISSING)
+        return Resolution(name, FOUND, name, nodes[0].uuid)
 
-    for path_representation in path_representations:
-        print(path_representation)
+    async def resolve_pair(self, source, target):
+        resolutions = await asyncio.gather(self.resolve(source), self.resolve(target))
+        if not all(resolution.found for resolution in resolutions):
+            raise UnresolvedEntityError(resolutions)
+        return resolutions
 
-    response_text, _ = await language_model.generate_response(
-        system_prompt="Given the following paths between the two entities, determine if there is a meaningful connection between them. If so, explain the connection. If not, state that there is no meaningful connection.",
-        user_prompt=f"Entity 1: {source}, Entity 2: {target}\n{'\n'.join(path_representations)}"
-    )
+    async def paths(self, source, target):
+        """Ranked and capped HopPaths between two resolved entities"""
+        key = (self.graph_version, source.name, target.name)
+        started = time.perf_counter()
+        paths = self.path_cache.get(key)
+        if paths is not None:
+            self.telemetry.observe("paths", time.perf_counter() - started, source="cache")
+            return paths
+        paths = None
+        origin = "neighborhood"
+        if self.neighborhoods is not None:
+            paths = self.neighborhoods.paths(source.name, target.name, self.max_hops)
+        if paths is None:
+            origin = "store"
+            graph_paths = await self.store.find_paths(
+                source_node_uuid=source.uuid,
+                target_node_uuid=target.uuid,
+                max_hops=self.max_hops,
+            )
+            paths = [HopPath.from_graph_path(path) for path in graph_paths]
+        degree = self.neighborhoods.degree if self.neighborhoods is not None else {}
+        found = len(paths)
+        paths = rank_paths(paths, degree, self.max_paths)
+        self.path_cache.put(key, paths)
+        self.telemetry.observe("paths", time.perf_counter() - started, source=origin)
+        self.telemetry.count("paths_found", found)
+        self.telemetry.count("paths_prompted", len(paths))
+        return paths
 
-    return response_text
+    async def relate(self, source, target):
+        """Explain how `source` and `target` are connected; UnresolvedEntityError lists ambiguous or missing names"""
+        if self._slots is None:
+            await self.open()
+        await self.refresh()
+        with self.telemetry.timer("lookup"):
+            source, target = await self.resolve_pair(source, target)
+        key = (self.graph_version, source.name, target.name)
+        response_text = self.answer_cache.get(key)
+        if response_text is not None:
+            self.telemetry.count("queries", answer="cache")
+            return response_text
+        # Concurrent questions about the same pair share one LLM call
+        pending = self._pending.get(key)
+        if pending is None:
+            pending = self._pending[key] = asyncio.ensure_future(self._answer(key, source, target))
+            # Dropped when the answer is done, not when its first caller leaves
+            pending.add_done_callback(lambda _: self._pending.pop(key, None))
+        # Shielded, so a cancelled caller does not cancel the answer for the other waiters
+        return await asyncio.shield(pending)
+
+    async def _answer(self, key, source, target):
+        async with self._slots:
+            path_representations = [str(path) for path in await self.paths(source, target)]
+            self.telemetry.event("paths", source=source.name, target=target.name, paths=path_representations)
+
+            with self.telemetry.timer("llm"):
+                response_text, _ = await self.language_model.generate_response(
+                    system_prompt=SYSTEM_PROMPT,
+                    user_prompt=f"Entity 1: {source.name}, Entity 2: {target.name}\n{'\n'.join(path_representations)}"
+                )
+        self.telemetry.count("queries", answer="llm")
+        self.answer_cache.put(key, response_text)
+        return response_text
+
+    def stats(self):
+        return {
+            "paths": self.path_cache.stats(),
+            "answers": self.answer_cache.stats(),
+            "telemetry": self.telemetry.summary(),
+        }
+
+    async def relate_many(self, pairs):
+        """relate() for many (source, target) pairs concurrently, at most `max_concurrency` at a time"""
+        return await asyncio.gather(*(self.relate(source, target) for source, target in pairs))
+
+    def _submit(self, coroutine):
+        """Schedule `coroutine` on the private loop; returns a concurrent.futures.Future"""
+        if self._loop is None:
+            self._loop = asyncio.new_event_loop()
+            self._thread = threading.Thread(target=self._loop.run_forever, daemon=True)
+            self._thread.start()
+        return asyncio.run_coroutine_threadsafe(coroutine, self._loop)
+
+    def _run(self, coroutine):
+        return self._submit(coroutine).result()
+
+    def relate_sync(self, source, target):
+        return self._run(self.relate(source, target))
+
+    async def relate_threadsafe(self, source, target):
+        """relate() from any event loop: runs on the private loop, the caller's loop only awaits the result"""
+        return await asyncio.wrap_future(self._submit(self.relate(source, target)))
+
+    def relate_many_sync(self, pairs):
+        return self._run(self.relate_many(pairs))
+
+    def close_sync(self):
+        if self._loop is None:
+            return
+        self._run(self.close())
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join()
+        self._loop.close()
+        self._loop = None
+
+
+_engine = None
+
+
+def get_engine():
+    """
+    Process-wide engine shared by start() and start_sync(). Both run it on its
+    private loop, so start() works from any number of asyncio.run() calls.
+    """
+    global _engine
+    if _engine is None:
+        load_dotenv()
+        _engine = QueryEngine()
+    return _engine
+
+
+async def start(source, target):
+    return await get_engine().relate_threadsafe(source, target)
 
 def start_sync(source, target):
-    load_dotenv()
-    return asyncio.run(start(source, target))
+    return get_engine().relate_sync(source, target)
@@ -0,0 +1,69 @@
+import os
+import sys
+from collections import defaultdict
+
+# Add parent folder to sys.path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from schema_extraction.triplet_store import TripletStoreReader
+
+# Relations that hold in both directions, so (x, r, y) also answers (y, r, ?)
+SYMMETRIC_RELATIONS = {
+    "per:alternate_names",
+    "per:siblings",
+    "per:spouse",
+    "per:friends",
+    "per:other_family",
+}
+# (x, per:children, y) is the same fact as (y, per:parents, x)
+INVERSE_RELATIONS = {
+    "per:children": "per:parents",
+    "per:parents": "per:children",
+}
+
+
+class RelationIndex:
+    """
+    Typed lookup over extracted triplets: (subject, relation) -> objects and the
+    inverse (object, relation) -> subjects. objects() folds in symmetric and
+    inverse relations, so 'Ross's parents' also finds (Jack, per:children, Ross).
+    """
+
+    def __init__(self):
+        self.forward = defaultdict(set)
+        self.inverse = defaultdict(set)
+        self.entities = set()
+
+    def add(self, x, y, r):
+        if x == y:
+            return
+        self.forward[(x, r)].add(y)
+        self.inverse[(y, r)].add(x)
+        self.entities.update((x, y))
+
+    @classmethod
+    def from_triples(cls, triples):
+        index = cls()
+        for x, y, r in triples:
+            index.add(x, y, r)
+        return index
+
+    @classmethod
+    def from_store(cls, path):
+        with TripletStoreReader(path) as triplets:
+            return cls.from_triples(triplets.triples())
+
+    def __len__(self):
+        return sum(len(objects) for objects in self.forward.values())
+
+    def subjects(self, y, r):
+        return self.inverse.get((y, r), set())
+
+    def objects(self, x, r):
+        """Every y with (x, r, y), counting symmetric and inverse relations"""
+        found = set(self.forward.get((x, r), ()))
+        if r in SYMMETRIC_RELATIONS:
+            found |= self.inverse.get((x, r), set())
+        if r in INVERSE_RELATIONS:
+            found |= self.inverse.get((x, INVERSE_RELATIONS[r]), set())
+        return found
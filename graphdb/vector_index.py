@@ -0,0 +1,145 @@
+import json
+import os
+from pathlib import Path
+
+import numpy as np
+
+INDEX_VERSION = 1
+TOP_K = 20
+
+
+def _write_atomic(path, write):
+    tmp = path.with_name(path.name + ".tmp")
+    write(tmp)
+    os.replace(tmp, path)
+
+
+def _previous_dim(path):
+    try:
+        with (path / "meta.json").open("r", encoding="utf-8") as f:
+            return json.load(f)["dim"]
+    except (OSError, ValueError, KeyError):
+        return 0
+
+
+async def build_vector_index(path, triples, embedder, embedding_cache, text_of, batch_size=1000):
+    """
+    Write the edge embeddings of `triples` to `path` as a row-normalized float32
+    matrix (vectors.f32) with the triples in row order (triples.txt). Vectors
+    come from the embedding cache; only triples missing from it are embedded.
+    """
+    path = Path(path)
+    path.mkdir(parents=True, exist_ok=True)
+    triples = sorted(triples)
+
+    rows = []
+    for start in range(0, len(triples), batch_size):
+        batch = triples[start:start + batch_size]
+        rows.extend(await embedding_cache.embed(embedder, [text_of(*t) for t in batch]))
+    if triples:
+        matrix = np.asarray(rows, dtype=np.float32).reshape(len(triples), -1)
+    else:
+        # Nothing ingested: an empty matrix, keeping the dimension of the previous index if there was one
+        matrix = np.zeros((0, _previous_dim(path)), dtype=np.float32)
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    matrix /= np.where(norms == 0, 1, norms)
+
+    _write_atomic(path / "vectors.f32", lambda tmp: matrix.tofile(tmp))
+
+    def write_triples(tmp):
+        with open(tmp, "w", encoding="utf-8") as f:
+            for source, target, relation in triples:
+                f.write(f"{source}||{target}||{relation}\n")
+
+    _write_atomic(path / "triples.txt", write_triples)
+    # meta.json last: a reader never sees a matrix without its triples
+    meta = {"version": INDEX_VERSION, "model": embedding_cache.model, "rows": len(triples), "dim": matrix.shape[1]}
+    _write_atomic(path / "meta.json", lambda tmp: tmp.write_text(json.dumps(meta)))
+    return meta
+
+
+class VectorIndex:
+    """Exact cosine top-k over a memory-mapped edge embedding matrix"""
+
+    def __init__(self, path):
+        self.path = Path(path)
+        with (self.path / "meta.json").open("r", encoding="utf-8") as f:
+            self.meta = json.load(f)
+        if self.meta["version"] != INDEX_VERSION:
+            raise ValueError(f"{self.path} is a version {self.meta['version']} index")
+        with (self.path / "triples.txt").open("r", encoding="utf-8") as f:
+            self.triples = [line.rstrip("\n") for line in f]
+        if self.meta["rows"]:
+            self.matrix = np.memmap(
+                self.path / "vectors.f32", dtype=np.float32, mode="r",
+                shape=(self.meta["rows"], self.meta["dim"]),
+            )
+        else:
+            self.matrix = np.zeros((0, self.meta["dim"]), dtype=np.float32)
+
+    def __len__(self):
+        return len(self.triples)
+
+    def search(self, vector, k=TOP_K):
+        """(score, 'x||y||r') pairs of the `k` triples most similar to `vector`, best first"""
+        return self.search_many([vector], k)[0]
+
+    def search_many(self, vectors, k=TOP_K):
+        """search() for several query vectors with one matrix product"""
+        if not len(self) or not len(vectors):
+            return [[] for _ in vectors]
+        queries = np.asarray(vectors, dtype=np.float32).reshape(len(vectors), -1)
+        norms = np.linalg.norm(queries, axis=1, keepdims=True)
+        queries /= np.where(norms == 0, 1, norms)
+        scores = queries @ self.matrix.T
+        k = min(k, scores.shape[1])
+        top = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+        results = []
+        for row, candidates in zip(scores, top):
+            candidates = candidates[np.argsort(-row[candidates])]
+            results.append([(float(row[i]), self.triples[i]) for i in candidates])
+        return results
+
+
+class Retriever:
+    """
+    Embeds a question and returns its most similar triples, in QuestionAnswerAgent's 'x||y||r' format.
+    Questions are embedded with `search_embed`; `embedding_cache` must be a search cache
+    (EmbeddingCache(..., search=True)), not the one holding the triple embeddings.
+    """
+
+    def __init__(self, path, embedder, embedding_cache=None, k=TOP_K):
+        if embedding_cache is not None and not embedding_cache.search:
+            raise ValueError("questions need their own search embedding cache")
+        self.path = Path(path)
+        self.embedder = embedder
+        self.embedding_cache = embedding_cache
+        self.k = k
+        self.index = None
+        self._version = None
+
+    def refresh(self):
+        """Reopen the index after an ingest has rebuilt it"""
+        version = os.stat(self.path / "meta.json").st_mtime_ns
+        if version != self._version:
+            self.index = VectorIndex(self.path)
+            self._version = version
+
+    async def embed(self, questions):
+        if self.embedding_cache is not None:
+            return await self.embedding_cache.embed(self.embedder, questions)
+        return await self.embedder.search_embed(questions)
+
+    async def retrieve(self, question, k=None):
+        return (await self.retrieve_many([question], k))[0]
+
+    async def retrieve_many(self, questions, k=None, batch_size=100):
+        """retrieve() for many questions, embedded in batches of `batch_size`"""
+        self.refresh()
+        vectors = []
+        for start in range(0, len(questions), batch_size):
+            vectors.extend(await self.embed(questions[start:start + batch_size]))
+        return [
+            [triple for _, triple in hits]
+            for hits in self.index.search_many(vectors, k or self.k)
+        ]
@@ -0,0 +1,183 @@
+import argparse
+import asyncio
+import contextlib
+import json
+import sys
+import os
+import time
+
+import dspy
+from dotenv import load_dotenv
+
+# Add parent folder to sys.path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from schema_extraction import models
+from schema_extraction.scheduler import ExtractionScheduler, estimate_tokens
+from schema_extraction.telemetry import Telemetry
+from graphdb.embedding_cache import EMBEDDING_MODEL, EmbeddingCache, open_embedder
+from graphdb.inject import QUESTION_EMBEDDING_CACHE_PATH, GRAPH_BACKEND, vector_index_path
+from graphdb.vector_index import TOP_K, Retriever
+from router import load_router
+
+MAX_CONCURRENCY = 16
+REQUESTS_PER_MINUTE = None
+MAX_RETRIES = 3
+REQUEST_TIMEOUT = 120
+# Instructions and reasoning around the question and its relations
+PROMPT_TOKENS = 300
+COMPLETION_TOKENS = 300
+
+
+def read_questions(stream):
+    """One question per line: plain text, or a JSON object with 'question' and an optional 'id'"""
+    questions = []
+    for line_number, line in enumerate(stream, 1):
+        line = line.strip()
+        if not line:
+            continue
+        if line.startswith("{"):
+            record = json.loads(line)
+            questions.append({"id": record.get("id", line_number), "question": record["question"]})
+        else:
+            questions.append({"id": line_number, "question": line})
+    return questions
+
+
+def percentile(values, p):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(p / 100 * len(values)))]
+
+
+def write_record(out, record):
+    out.write(json.dumps(record, ensure_ascii=False) + "\n")
+    out.flush()
+
+
+async def answer_all(questions, agent, retriever, out, k=TOP_K, router=None, **scheduler_options):
+    """
+    Answer lookup questions the router can handle from the relation index, then
+    retrieve context for the rest (one batched embedding pass) and run the agent
+    concurrently under the scheduler's limits. Each answer is written to `out`
+    as a JSONL record as soon as it is ready.
+    """
+    started = time.monotonic()
+    results = []
+    remaining = []
+    for question in questions:
+        question_started = time.monotonic()
+        routed = router.route(question["question"]) if router is not None else None
+        if routed is None:
+            remaining.append(question)
+            continue
+        latency = time.monotonic() - question_started
+        write_record(out, {
+            "id": question["id"],
+            "question": question["question"],
+            "answer": routed.answer,
+            "relations": routed.relation_strings(),
+            "route": "index",
+            "latency": round(latency, 3),
+            "attempts": 0,
+            "error": None,
+        })
+        results.append((latency, False))
+    routed_count = len(results)
+
+    contexts = await retriever.retrieve_many([q["question"] for q in remaining], k)
+    retrieved = time.monotonic()
+    scheduler = ExtractionScheduler(agent, **scheduler_options)
+
+    async def answer_one(i, question, relations):
+        question_started = time.monotonic()
+        text = question["question"]
+        result = await scheduler.run_job(
+            i,
+            scheduler.prompt_tokens + scheduler.completion_tokens + estimate_tokens(text + "".join(relations)),
+            lambda: agent.acall(question_text=text, entity_relations=relations),
+            label=f"question {question['id']}",
+        )
+        latency = time.monotonic() - question_started
+        record = {
+            "id": question["id"],
+            "question": text,
+            "answer": None if result.failed else result.value,
+            "relations": relations,
+            "route": "llm",
+            "latency": round(latency, 3),
+            "attempts": result.attempts,
+            "error": f"{type(result.error).__name__}: {result.error}" if result.failed else None,
+        }
+        write_record(out, record)
+        return latency, result.failed
+
+    results += await asyncio.gather(*(
+        answer_one(i, question, relations)
+        for i, (question, relations) in enumerate(zip(remaining, contexts))
+    ))
+
+    elapsed = time.monotonic() - started
+    latencies = [latency for latency, _ in results]
+    failed = sum(1 for _, failed in results if failed)
+    print(f"📊 {len(questions)} questions ({routed_count} from the relation index, {failed} failed) in {elapsed:.1f}s, {len(questions) / elapsed if elapsed else 0:.2f} questions/s")
+    print(f"   retrieval {retrieved - started:.2f}s, answer latency p50 {percentile(latencies, 50):.2f}s / p95 {percentile(latencies, 95):.2f}s / max {max(latencies, default=0):.2f}s")
+    return results
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Answer many questions from the extracted knowledge graph")
+    parser.add_argument("questions", nargs="?", default="-", help="file with one question per line ('-' for stdin)")
+    parser.add_argument("--output", default="-", help="JSONL file for the answers ('-' for stdout)")
+    parser.add_argument("--top-k", type=int, default=TOP_K, help="number of retrieved triples given to the agent")
+    parser.add_argument("--max-concurrency", type=int, default=MAX_CONCURRENCY)
+    parser.add_argument("--metrics", default=None, help="write a metrics summary here (.json, or .prom for Prometheus text)")
+    return parser.parse_args()
+
+
+async def run(args, out):
+    with contextlib.ExitStack() as stack:
+        source = sys.stdin if args.questions == "-" else stack.enter_context(open(args.questions, "r", encoding="utf-8"))
+        questions = read_questions(source)
+        embedding_cache = EmbeddingCache(QUESTION_EMBEDDING_CACHE_PATH, EMBEDDING_MODEL, search=True)
+        stack.callback(embedding_cache.close)
+        retriever = Retriever(vector_index_path(GRAPH_BACKEND), open_embedder(), embedding_cache, args.top_k)
+        telemetry = Telemetry(stage="qa")
+        await answer_all(
+            questions,
+            models.QuestionAnswerAgent(),
+            retriever,
+            out,
+            k=args.top_k,
+            router=load_router(),
+            max_concurrency=args.max_concurrency,
+            requests_per_minute=REQUESTS_PER_MINUTE,
+            max_retries=MAX_RETRIES,
+            request_timeout=REQUEST_TIMEOUT,
+            prompt_tokens=PROMPT_TOKENS,
+            completion_tokens=COMPLETION_TOKENS,
+            telemetry=telemetry,
+        )
+        telemetry.report()
+        if args.metrics:
+            telemetry.write_summary(args.metrics)
+
+
+def main():
+    args = parse_args()
+    load_dotenv()
+    dspy.configure(lm=dspy.LM("gpt-4.1-mini"), api_key=models.OPEN)
+
+    if args.output == "-":
+        # Answers own stdout; progress and reports go to stderr
+        out = sys.stdout
+        with contextlib.redirect_stdout(sys.stderr):
+            asyncio.run(run(args, out))
+    else:
+        with open(args.output, "w", encoding="utf-8") as out:
+            asyncio.run(run(args, out))
+
+
+if __name__ == "__main__":
+    main()
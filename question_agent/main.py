@@ -1,19 +1,61 @@
+import argparse
+import asyncio
 import dspy
 import sys
 import os
 
+from dotenv import load_dotenv
+
 # Add parent folder to sys.path
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
 
 from schema_extraction import models
 from graphdb import query
+from graphdb.embedding_cache import EMBEDDING_MODEL, EmbeddingCache, open_embedder
+from graphdb.inject import QUESTION_EMBEDDING_CACHE_PATH, GRAPH_BACKEND, vector_index_path
+from graphdb.vector_index import TOP_K, Retriever
+from router import load_router
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Answer a question from the extracted knowledge graph")
+    parser.add_argument("question", nargs="?", default="What's the relation between emma and joshua?")
+    parser.add_argument("--top-k", type=int, default=TOP_K, help="number of retrieved triples given to the agent")
+    parser.add_argument(
+        "--between", nargs=2, metavar=("SOURCE", "TARGET"),
+        help="use the graph paths between two entities instead of retrieval",
+    )
+    return parser.parse_args()
+
+async def retrieve(question, k):
+    """Top-k triples most similar to the question, as 'entity1||entity2||relation' strings"""
+    embedding_cache = EmbeddingCache(QUESTION_EMBEDDING_CACHE_PATH, EMBEDDING_MODEL, search=True)
+    try:
+        retriever = Retriever(vector_index_path(GRAPH_BACKEND), open_embedder(), embedding_cache, k)
+        return await retriever.retrieve(question)
+    finally:
+        embedding_cache.close()
 
 def main():
+    args = parse_args()
+    load_dotenv()
     dspy.configure(lm=dspy.LM("gpt-4.1-mini"), api_key=models.OPEN)
 
     agent = models.QuestionAnswerAgent()
-    question = "What's the relation between emma and joshua?"
-    relations = query.start_sync("Emma", "Joshua")
+    question = args.question
+    routed = None if args.between else load_router().route(question)
+    if routed is not None:
+        # A single-relation lookup, answered from the relation index without the LLM
+        print(routed.relation_strings())
+        print(f"Q: {question}\nA: {routed.answer}")
+        return
+    if args.between:
+        try:
+            relations = query.start_sync(*args.between)
+        except query.UnresolvedEntityError as e:
+            print(f"❌ Could not resolve entities: {e}")
+            return
+    else:
+        relations = asyncio.run(retrieve(question, args.top_k))
     print(relations)
     answer = agent(question_text=question, entity_relations=relations)
     print(f"Q: {question}\nA: {answer}")
@@ -0,0 +1,105 @@
+import re
+import sys
+import os
+from typing import NamedTuple, Tuple
+
+# Add parent folder to sys.path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from graphdb.inject import TRIPLETS_PATH
+from graphdb.name_index import NameIndex
+from graphdb.relation_index import RelationIndex
+
+ENTITY = r"(?P<entity>[\w .'-]+?)"
+POSSESSIVE = r"(?:'s|’s|'|’)"
+
+# (question pattern, relations to look up, whether the entity is the object of the relation)
+TEMPLATES = [
+    (rf"who (?:are|is) {ENTITY}{POSSESSIVE} (?:siblings?|brothers?|sisters?)", ("per:siblings",), False),
+    (rf"who (?:are|is) {ENTITY}{POSSESSIVE} (?:parents?|mother|mom|father|dad)", ("per:parents",), False),
+    (rf"who (?:are|is) {ENTITY}{POSSESSIVE} (?:children|kids?|sons?|daughters?|child)", ("per:children",), False),
+    (rf"who (?:is|was) {ENTITY}{POSSESSIVE} (?:spouse|wife|husband)", ("per:spouse",), False),
+    (rf"who (?:is|was) {ENTITY} married to", ("per:spouse",), False),
+    (rf"who (?:are|is) {ENTITY}{POSSESSIVE} (?:friends?|best friend)", ("per:friends",), False),
+    (rf"who (?:are|is) {ENTITY}{POSSESSIVE} (?:relatives?|family|cousins?|aunts?|uncles?|grandparents?)", ("per:other_family",), False),
+    (rf"what (?:are|is) {ENTITY}{POSSESSIVE} (?:other names?|nicknames?|alternate names?)", ("per:alternate_names",), False),
+    (rf"what else is {ENTITY} called", ("per:alternate_names",), False),
+    (rf"(?:where|who) does {ENTITY} work(?: for| at)?", ("per:employee_of",), False),
+    (rf"who employs {ENTITY}", ("per:employee_of",), False),
+    (rf"who works (?:at|for) {ENTITY}", ("per:employee_of",), True),
+    (rf"who (?:are|is) (?:the )?members? of {ENTITY}", ("per:member_of",), True),
+    (rf"where (?:does|did) {ENTITY} live", ("per:places_lived", "per:city_of_residence", "per:state_of_residence"), False),
+    (rf"where (?:is|was) {ENTITY} from", ("per:origin",), False),
+    (rf"where did {ENTITY} go to school", ("per:schools_attended",), False),
+    (rf"what schools? did {ENTITY} attend", ("per:schools_attended",), False),
+    (rf"how old is {ENTITY}", ("per:age",), False),
+    (rf"when (?:is|was) {ENTITY} born", ("per:date_of_birth",), False),
+    (rf"what is {ENTITY}{POSSESSIVE} (?:job|profession|occupation)", ("per:profession", "per:title"), False),
+    (rf"what does {ENTITY} do(?: for a living)?", ("per:profession", "per:title"), False),
+    (rf"what is {ENTITY}{POSSESSIVE} title", ("per:title",), False),
+]
+TEMPLATES = [
+    (re.compile(rf"^\s*{pattern}\s*\??\s*$", re.IGNORECASE), relations, inverse)
+    for pattern, relations, inverse in TEMPLATES
+]
+
+
+class RoutedAnswer(NamedTuple):
+    answer: str
+    entity: str
+    # (other entity, relation) of every fact behind the answer
+    facts: Tuple[Tuple[str, str], ...]
+    # The entity is the object of the relations ("who works at Central Perk?")
+    inverse: bool = False
+
+    def relation_strings(self):
+        """The supporting facts in QuestionAnswerAgent's 'entity1||entity2||relation' format"""
+        if self.inverse:
+            return [f"{other}||{self.entity}||{r}" for other, r in self.facts]
+        return [f"{self.entity}||{other}||{r}" for other, r in self.facts]
+
+
+class QuestionRouter:
+    """
+    Answers single-relation lookup questions ("who are Ross's siblings?") straight
+    from a RelationIndex. route() returns None whenever the question needs the
+    LLM: no template matches, the entity does not resolve to exactly one name,
+    or the index has no answer.
+    """
+
+    def __init__(self, relation_index, name_index=None):
+        self.relation_index = relation_index
+        if name_index is None:
+            name_index = NameIndex()
+            for name in relation_index.entities:
+                name_index.add(name, name)
+        self.name_index = name_index
+
+    def match(self, question):
+        for pattern, relations, inverse in TEMPLATES:
+            m = pattern.match(question)
+            if m:
+                entity = m.group("entity").strip()
+                if entity.lower().startswith("the "):
+                    entity = entity[4:]
+                return entity, relations, inverse
+        return None
+
+    def route(self, question):
+        matched = self.match(question)
+        if matched is None:
+            return None
+        entity, relations, inverse = matched
+        resolution = self.name_index.resolve(entity)
+        if not resolution.found:
+            return None
+        lookup = self.relation_index.subjects if inverse else self.relation_index.objects
+        facts = sorted((other, r) for r in relations for other in lookup(resolution.name, r))
+        if not facts:
+            return None
+        answer = ", ".join(dict.fromkeys(other for other, _ in facts))
+        return RoutedAnswer(answer, resolution.name, tuple(facts), inverse)
+
+
+def load_router(path=TRIPLETS_PATH):
+    return QuestionRouter(RelationIndex.from_store(path))
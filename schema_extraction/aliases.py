@@ -0,0 +1,198 @@
+import difflib
+import json
+from collections import Counter, defaultdict
+from pathlib import Path
+
+ALIAS_RELATIONS = {"name", "nicknames"}
+ALTERNATE_NAMES = "per:alternate_names"
+
+
+def _is_valid_alias(alias):
+    # Skip placeholders and values the Fandom scrape truncated or merged
+    return bool(alias) and alias != "Unknown" and not any(c in alias for c in ",()")
+
+
+def _derived_aliases(canonical):
+    """'Rachel Karen Green-Geller' -> 'Rachel Green', 'Rachel Geller', 'Rachel Karen', ..."""
+    tokens = canonical.split()
+    if len(tokens) < 2:
+        return []
+    first = tokens[0]
+    parts = []
+    for token in tokens[1:]:
+        parts.append(token)
+        if "-" in token:
+            parts.extend(token.split("-"))
+    return [f"{first} {part}" for part in parts]
+
+
+class AliasIndex:
+    """
+    Resolves surface forms of entity names ('Pheebs', 'Monica E. Geller', 'Emma')
+    to canonical entities. Exact and case-insensitive lookups are dict hits;
+    approximate matches are computed once per unseen name and memoized.
+    """
+
+    def __init__(self, cutoff=0.9):
+        self.cutoff = cutoff
+        self.aliases = {}
+        self.folded = {}
+        self.ambiguous = set()
+        self._folded_ambiguous = set()
+        self._memo = {}
+
+    def add(self, alias, canonical, explicit=True):
+        """Register an alias; conflicting explicit aliases become ambiguous and are dropped"""
+        if alias in self.ambiguous:
+            return
+        current = self.aliases.get(alias)
+        if current is None:
+            self.aliases[alias] = canonical
+            self._fold(alias, canonical)
+            # Only a change can alter what resolve() matched approximately before
+            self._memo = {}
+        elif current != canonical and explicit:
+            del self.aliases[alias]
+            self.ambiguous.add(alias)
+            self._reindex()
+
+    def _fold(self, alias, canonical):
+        key = alias.casefold()
+        if key in self._folded_ambiguous:
+            return
+        if self.folded.setdefault(key, canonical) != canonical:
+            del self.folded[key]
+            self._folded_ambiguous.add(key)
+
+    def _reindex(self):
+        self.folded = {}
+        self._folded_ambiguous = set()
+        for alias, canonical in self.aliases.items():
+            self._fold(alias, canonical)
+        self._memo = {}
+
+    @classmethod
+    def from_fandom(cls, path, cutoff=0.9):
+        """
+        Build the index from Fandom_triples.txt. Precedence: canonical names, then
+        'name' rows, then first-name variants of a clearly dominant entity, then
+        'nicknames' (so a one-off nickname like Phoebe's 'Emma' cannot shadow Emma).
+        """
+        index = cls(cutoff=cutoff)
+        rows = Counter()
+        explicit = defaultdict(list)
+        with open(path, "r", encoding="utf-8") as f:
+            for line in f:
+                parts = line.strip().split("||")
+                if len(parts) != 3:
+                    continue
+                subject, value, relation = parts
+                rows[subject] += 1
+                if relation in ALIAS_RELATIONS and _is_valid_alias(value):
+                    explicit[relation].append((value, subject))
+
+        aliases = {canonical: canonical for canonical in rows}
+        ambiguous = set()
+
+        def add_rows(pairs):
+            # Stronger aliases win; an alias claimed by two entities within one kind is ambiguous
+            claimed = defaultdict(set)
+            for alias, canonical in pairs:
+                if alias not in aliases and alias not in ambiguous:
+                    claimed[alias].add(canonical)
+            for alias, canonicals in claimed.items():
+                if len(canonicals) == 1:
+                    aliases[alias] = canonicals.pop()
+                else:
+                    ambiguous.add(alias)
+
+        add_rows(explicit["name"])
+
+        # First names and 'first last' variants, only when one entity clearly dominates
+        derived = defaultdict(set)
+        for canonical in rows:
+            tokens = canonical.split()
+            if len(tokens) > 1 and _is_valid_alias(canonical):
+                derived[tokens[0]].add(canonical)
+                for alias in _derived_aliases(canonical):
+                    derived[alias].add(canonical)
+        for alias, candidates in derived.items():
+            if alias in aliases or alias in ambiguous:
+                continue
+            ranked = sorted(candidates, key=lambda c: rows[c], reverse=True)
+            if len(ranked) == 1 or rows[ranked[0]] >= 2 * rows[ranked[1]]:
+                aliases[alias] = ranked[0]
+
+        add_rows(explicit["nicknames"])
+
+        index.aliases = aliases
+        index.ambiguous = ambiguous
+        index._reindex()
+        return index
+
+    def resolve(self, name):
+        """Canonical entity for `name`, or `name` itself when nothing matches"""
+        canonical = self.aliases.get(name)
+        if canonical is not None:
+            return canonical
+        if name in self._memo:
+            return self._memo[name]
+        key = name.casefold()
+        canonical = self.folded.get(key)
+        if canonical is None and name not in self.ambiguous:
+            matches = difflib.get_close_matches(key, self.folded.keys(), n=1, cutoff=self.cutoff)
+            canonical = self.folded[matches[0]] if matches else None
+        self._memo[name] = canonical or name
+        return self._memo[name]
+
+    def learn(self, triplets):
+        """Add aliases from extracted per:alternate_names triplets between a known and an unknown name"""
+        for t in triplets:
+            if t.r != ALTERNATE_NAMES:
+                continue
+            x_known, y_known = t.x in self.aliases, t.y in self.aliases
+            if x_known and not y_known and _is_valid_alias(t.y):
+                self.add(t.y, self.aliases[t.x], explicit=False)
+            elif y_known and not x_known and _is_valid_alias(t.x):
+                self.add(t.x, self.aliases[t.y], explicit=False)
+
+    def canonicalize(self, triplets):
+        """Rewrite triplet entities to canonical names, dropping self-relations and duplicates"""
+        result = []
+        seen = set()
+        for t in triplets:
+            x, y = self.resolve(t.x), self.resolve(t.y)
+            if x == y or (x, y, t.r) in seen:
+                continue
+            seen.add((x, y, t.r))
+            result.append(t if (x, y) == (t.x, t.y) else t._replace(x=x, y=y))
+        return result
+
+    def canonicalize_episodes(self, episodes):
+        """
+        Learn from and canonicalize {episode: [triplet, ...]} one episode at a time in
+        episode order, so the names depend neither on the order episodes finished in
+        nor on which run or worker extracted them
+        """
+        result = {}
+        for episode in sorted(episodes):
+            triplets = episodes[episode]
+            if triplets:
+                self.learn(triplets)
+                triplets = self.canonicalize(triplets)
+            result[episode] = triplets
+        return result
+
+    def save(self, path):
+        with Path(path).open("w", encoding="utf-8") as f:
+            json.dump({"aliases": self.aliases, "ambiguous": sorted(self.ambiguous)}, f, ensure_ascii=False)
+
+    @classmethod
+    def load(cls, path, cutoff=0.9):
+        with Path(path).open("r", encoding="utf-8") as f:
+            data = json.load(f)
+        index = cls(cutoff=cutoff)
+        index.aliases = data["aliases"]
+        index.ambiguous = set(data["ambiguous"])
+        index._reindex()
+        return index
@@ -0,0 +1,78 @@
+import asyncio
+
+from models import BatchParseError
+from scheduler import EpisodeResult, estimate_tokens
+
+
+def pack_episodes(dialogues, indices, token_budget, prompt_tokens=0, max_episodes=20):
+    """
+    Greedily pack consecutive episodes into batches of (index, episode_text) pairs
+    whose estimated prompt size stays within `token_budget`. An episode larger than
+    the budget on its own gets a batch of one.
+    """
+    batches = []
+    current = []
+    used = prompt_tokens
+    for i, episode in zip(indices, dialogues):
+        text = "\n".join(episode)
+        tokens = estimate_tokens(text)
+        if current and (used + tokens > token_budget or len(current) >= max_episodes):
+            batches.append(current)
+            current = []
+            used = prompt_tokens
+        current.append((i, text))
+        used += tokens
+    if current:
+        batches.append(current)
+    return batches
+
+
+async def run_batch(scheduler, extractor, batch, on_result=None):
+    """
+    Extract one batch through the scheduler. If the output cannot be parsed the
+    batch is split in half and each half retried; a single episode whose output
+    still cannot be parsed yields no triplets, like the one-episode path.
+    """
+    tokens = (
+        sum(estimate_tokens(text) for _, text in batch)
+        + scheduler.prompt_tokens
+        + scheduler.completion_tokens * len(batch)
+    )
+    first = batch[0][0]
+    job = await scheduler.run_job(
+        first,
+        tokens,
+        lambda: extractor.acall(batch),
+        fatal=(BatchParseError,),
+        label=f"batch of {len(batch)} from dialogue {first+1}",
+    )
+
+    if isinstance(job.error, BatchParseError) and len(batch) > 1:
+        mid = len(batch) // 2
+        print(f"{first} ✂️ Splitting unparseable batch of {len(batch)} dialogues")
+        halves = await asyncio.gather(
+            run_batch(scheduler, extractor, batch[:mid], on_result),
+            run_batch(scheduler, extractor, batch[mid:], on_result),
+        )
+        return halves[0] + halves[1]
+
+    results = []
+    for i, _ in batch:
+        if job.error is None:
+            result = EpisodeResult(index=i, triplets=job.value.get(i, []), attempts=job.attempts)
+        elif isinstance(job.error, BatchParseError):
+            print(f"{i} Error parsing response: {job.error}")
+            result = EpisodeResult(index=i, attempts=job.attempts)
+        else:
+            result = EpisodeResult(index=i, attempts=job.attempts, error=job.error)
+        if on_result is not None:
+            on_result(result)
+        results.append(result)
+    return results
+
+
+async def run_batches(scheduler, extractor, batches, on_result=None):
+    results_per_batch = await asyncio.gather(
+        *(run_batch(scheduler, extractor, batch, on_result) for batch in batches)
+    )
+    return [result for results in results_per_batch for result in results]
@@ -0,0 +1,211 @@
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from pathlib import Path
+
+
+def signature_fingerprint(signature):
+    """Stable description of a dspy signature: instructions plus field descriptions"""
+    fields = {
+        name: (field.json_schema_extra or {}).get("desc", "")
+        for name, field in signature.fields.items()
+    }
+    return json.dumps(
+        {"instructions": signature.instructions, "fields": fields},
+        sort_keys=True,
+        ensure_ascii=False,
+    )
+
+
+def make_key(*parts):
+    """Content-addressed key over all parts (episode text, signature, model, ...)"""
+    digest = hashlib.sha256()
+    for part in parts:
+        digest.update(str(part).encode("utf-8"))
+        digest.update(b"\x00")
+    return digest.hexdigest()
+
+
+class ResponseCache:
+    """
+    Persistent SQLite cache of raw LLM outputs (str) or other payloads (bytes).
+
+    Entries older than `max_age` seconds are dropped on lookup and eviction;
+    beyond `max_entries` the least recently used entries are evicted. The cache
+    is only an optimization: a failed read is a miss and a failed write is
+    skipped, with a warning, so a locked or broken database never fails a run.
+    """
+
+    def __init__(self, path, max_entries=100_000, max_age=None, evict_every=100):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.max_entries = max_entries
+        self.max_age = max_age
+        self.evict_every = evict_every
+        self.hits = 0
+        self.misses = 0
+        self.errors = 0
+        self._writes = 0
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(self.path), timeout=30.0, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS responses ("
+            " key TEXT PRIMARY KEY,"
+            " value TEXT NOT NULL,"
+            " created REAL NOT NULL,"
+            " accessed REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS responses_accessed ON responses (accessed)")
+        self._conn.commit()
+        self.evict()
+
+    def key_for(self, signature, model, *inputs):
+        """Key for a prediction of `signature` by `model` on the given inputs"""
+        return make_key(signature_fingerprint(signature), model, *inputs)
+
+    def _failed(self, action, error):
+        """Roll back whatever the failed statement left open and count the error; caller holds the lock"""
+        self.errors += 1
+        try:
+            self._conn.rollback()
+        except sqlite3.Error:
+            pass
+        print(f"⚠️ Response cache {action} failed ({type(error).__name__}: {error}); continuing without it")
+
+    def get(self, key):
+        try:
+            return self._get(key)
+        except sqlite3.Error as e:
+            with self._lock:
+                self.misses += 1
+                self._failed("read", e)
+            return None
+
+    def _get(self, key):
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value, created FROM responses WHERE key = ?", (key,)
+            ).fetchone()
+            if row is not None and self.max_age is not None and now - row[1] > self.max_age:
+                self._conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+                self._conn.commit()
+                row = None
+            if row is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self._conn.execute("UPDATE responses SET accessed = ? WHERE key = ?", (now, key))
+            self._conn.commit()
+            return row[0]
+
+    def set(self, key, value):
+        now = time.time()
+        with self._lock:
+            try:
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO responses (key, value, created, accessed) VALUES (?, ?, ?, ?)",
+                    (key, value, now, now),
+                )
+                self._conn.commit()
+            except sqlite3.Error as e:
+                self._failed("write", e)
+                return
+            self._writes += 1
+            evict = self._writes % self.evict_every == 0
+        if evict:
+            self.evict()
+
+    def get_many(self, keys):
+        """Values for `keys` in order (None for misses), in one transaction"""
+        try:
+            return self._get_many(keys)
+        except sqlite3.Error as e:
+            with self._lock:
+                self.misses += len(keys)
+                self._failed("read", e)
+            return [None] * len(keys)
+
+    def _get_many(self, keys):
+        now = time.time()
+        values = []
+        with self._lock:
+            for key in keys:
+                row = self._conn.execute(
+                    "SELECT value, created FROM responses WHERE key = ?", (key,)
+                ).fetchone()
+                if row is None or (self.max_age is not None and now - row[1] > self.max_age):
+                    self.misses += 1
+                    values.append(None)
+                    continue
+                self.hits += 1
+                values.append(row[0])
+            self._conn.executemany(
+                "UPDATE responses SET accessed = ? WHERE key = ?",
+                [(now, key) for key, value in zip(keys, values) if value is not None],
+            )
+            self._conn.commit()
+        return values
+
+    def set_many(self, items):
+        """Store (key, value) pairs in one transaction"""
+        now = time.time()
+        items = list(items)
+        with self._lock:
+            try:
+                self._conn.executemany(
+                    "INSERT OR REPLACE INTO responses (key, value, created, accessed) VALUES (?, ?, ?, ?)",
+                    [(key, value, now, now) for key, value in items],
+                )
+                self._conn.commit()
+            except sqlite3.Error as e:
+                self._failed("write", e)
+                return
+            evict = (self._writes + len(items)) // self.evict_every > self._writes // self.evict_every
+            self._writes += len(items)
+        if evict:
+            self.evict()
+
+    def evict(self):
+        """Drop expired entries, then the least recently used ones over max_entries"""
+        with self._lock:
+            try:
+                if self.max_age is not None:
+                    self._conn.execute(
+                        "DELETE FROM responses WHERE created < ?", (time.time() - self.max_age,)
+                    )
+                if self.max_entries is not None:
+                    self._conn.execute(
+                        "DELETE FROM responses WHERE key IN ("
+                        " SELECT key FROM responses ORDER BY accessed DESC LIMIT -1 OFFSET ?)",
+                        (self.max_entries,),
+                    )
+                self._conn.commit()
+            except sqlite3.Error as e:
+                self._failed("eviction", e)
+
+    def __len__(self):
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+
+    def stats(self):
+        total = self.hits + self.misses
+        try:
+            entries = len(self)
+        except sqlite3.Error:
+            entries = None
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total else 0.0,
+            "errors": self.errors,
+            "entries": entries,
+        }
+
+    def close(self):
+        self.evict()
+        with self._lock:
+            self._conn.close()
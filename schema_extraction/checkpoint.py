@@ -0,0 +1,67 @@
+import json
+import os
+from pathlib import Path
+
+
+class CheckpointWriter:
+    """Appends each finished episode's triplets to a JSONL file as soon as it is done"""
+
+    def __init__(self, path):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._file = self.path.open("a", encoding="utf-8")
+
+    def write(self, index, triplets):
+        record = {"episode": index, "triplets": [triplet.dict() for triplet in triplets]}
+        self._file.write(json.dumps(record, ensure_ascii=False) + "\n")
+        self._file.flush()
+        os.fsync(self._file.fileno())
+
+    def close(self):
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+
+def load_checkpoint(path):
+    """Map episode index -> list of triplet dicts; a torn last line from a crash is ignored"""
+    episodes = {}
+    path = Path(path)
+    if not path.exists():
+        return episodes
+    with path.open("r", encoding="utf-8") as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                continue
+            # Later records win, e.g. when an episode was re-run without --resume
+            episodes[record["episode"]] = record["triplets"]
+    return episodes
+
+
+def completed_episodes(path):
+    return set(load_checkpoint(path))
+
+
+def compact(checkpoint_path, json_path, txt_path=None):
+    """Write the checkpoint out in the dev.json / dev.txt formats, ordered by episode"""
+    episodes = load_checkpoint(checkpoint_path)
+    all_triplets = [
+        triplet for index in sorted(episodes) for triplet in episodes[index]
+    ]
+
+    json_path = Path(json_path)
+    json_path.parent.mkdir(parents=True, exist_ok=True)
+    with json_path.open("w", encoding="utf-8") as f:
+        json.dump(all_triplets, f, indent=2, ensure_ascii=False)
+
+    if txt_path is not None:
+        with Path(txt_path).open("w", encoding="utf-8") as f:
+            for entry in all_triplets:
+                f.write(f"{entry['x']}||{entry['y']}||{entry['r']}\n")
+    return all_triplets
@@ -1,4 +1,7 @@
 import json
+from pathlib import Path
+from helper import load_triplet_store, save_triplet_store
+from models import FANDOM_TRIPLES, TripletRecord
 
 def json_to_txt(json_file, txt_file):
     # Load JSON data (list of dicts)
@@ -11,7 +14,25 @@ def json_to_txt(json_file, txt_file):
             line = f"{entry['x']}||{entry['y']}||{entry['r']}"
             f.write(line + "\n")
 
+def json_to_store(json_file, store_dir):
+    # Migrate a save_graph JSON output to the columnar triplet store
+    with open(json_file, "r", encoding="utf-8") as f:
+        data = json.load(f)
+    save_triplet_store([TripletRecord(**entry) for entry in data], store_dir)
+
+def store_to_txt(store_dir, txt_file):
+    with load_triplet_store(store_dir) as store, open(txt_file, "w", encoding="utf-8") as f:
+        for x, y, r in store.triples():
+            f.write(f"{x}||{y}||{r}\n")
+
 if __name__ == "__main__":
-    # Example usage
-    json_to_txt("result/dev.json", "result/dev.txt")
-    print("✅ Conversion complete: relations.txt")
+    # The store is generated, not committed: rebuild it from the last run's checkpoint,
+    # or migrate the legacy dev.json when there is none
+    if Path("result/dev.jsonl").exists():
+        from main import write_outputs
+        from aliases import AliasIndex
+        write_outputs("dev", "result/dev.jsonl", "result", AliasIndex.from_fandom(FANDOM_TRIPLES))
+    else:
+        json_to_store("result/dev.json", "result/dev.triplets")
+        store_to_txt("result/dev.triplets", "result/dev.txt")
+    print("✅ Conversion complete: result/dev.triplets, result/dev.txt")
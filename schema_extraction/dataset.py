@@ -0,0 +1,111 @@
+import json
+import os
+from pathlib import Path
+from typing import List, NamedTuple
+
+_WHITESPACE = " \t\r\n"
+
+
+class Episode(NamedTuple):
+    index: int
+    dialogue: List[str]
+    relations: List[dict]
+
+
+def _build_index(path):
+    """Byte offset and length of every top-level element of a DialogRE JSON array"""
+    # newline="" keeps \r\n intact so character and byte positions line up
+    with open(path, "r", encoding="utf-8", newline="") as f:
+        text = f.read()
+    decoder = json.JSONDecoder()
+    offsets = []
+    pos = text.index("[") + 1
+    byte_pos = len(text[:pos].encode("utf-8"))
+    while True:
+        # Skip whitespace and separators up to the next element
+        start = pos
+        while text[pos] in _WHITESPACE or text[pos] == ",":
+            pos += 1
+        byte_pos += len(text[start:pos].encode("utf-8"))
+        if text[pos] == "]":
+            break
+        _, end = decoder.raw_decode(text, pos)
+        length = len(text[pos:end].encode("utf-8"))
+        offsets.append((byte_pos, length))
+        byte_pos += length
+        pos = end
+    return offsets
+
+
+class DialogueDataset:
+    """
+    Lazy reader for a DialogRE split. The byte offsets of all episodes are
+    indexed once and cached next to the data file (`<file>.idx`); episodes are
+    then read and parsed on demand, dialogue and gold relations together.
+    """
+
+    def __init__(self, path, index_path=None):
+        self.path = Path(path)
+        self.index_path = Path(index_path) if index_path else self.path.with_name(self.path.name + ".idx")
+        self._offsets = self._load_index()
+        self._file = None
+
+    def _load_index(self):
+        stat = os.stat(self.path)
+        if self.index_path.exists():
+            try:
+                with self.index_path.open("r", encoding="utf-8") as f:
+                    cached = json.load(f)
+                if cached["size"] == stat.st_size and cached["mtime_ns"] == stat.st_mtime_ns:
+                    return [tuple(offset) for offset in cached["offsets"]]
+            except (json.JSONDecodeError, KeyError, OSError):
+                pass
+
+        offsets = _build_index(self.path)
+        try:
+            with self.index_path.open("w", encoding="utf-8") as f:
+                json.dump({"size": stat.st_size, "mtime_ns": stat.st_mtime_ns, "offsets": offsets}, f)
+        except OSError:
+            # Read-only data directory: keep the in-memory index only
+            pass
+        return offsets
+
+    def _read(self, i):
+        if self._file is None:
+            self._file = self.path.open("rb")
+        offset, length = self._offsets[i]
+        self._file.seek(offset)
+        item = json.loads(self._file.read(length))
+        return Episode(index=i, dialogue=item[0], relations=item[1])
+
+    def __len__(self):
+        return len(self._offsets)
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return [self._read(j) for j in range(*i.indices(len(self)))]
+        if i < 0:
+            i += len(self)
+        if not 0 <= i < len(self):
+            raise IndexError(f"episode {i} out of range")
+        return self._read(i)
+
+    def __iter__(self):
+        return self.iter()
+
+    def iter(self, start=0, stop=None):
+        """Generator over episodes[start:stop], parsing one episode at a time"""
+        stop = len(self) if stop is None else min(stop, len(self))
+        for i in range(start, stop):
+            yield self._read(i)
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
@@ -6,9 +6,17 @@ CLEANSED_RELATIONS_FILE = "result/cleansed.txt"
 GROUND_TRUTH_FILE = "../data/fandom_triples.txt"
 GROUND_TRUTH_MAPPING_FILE = "../data/matching_table.txt"
 REDUCED_GROUND_TRUTH_FILE = "../data/reduced_ground_truth.txt"
+RAW_DEV_CHECKPOINT_FILE = "result/dev.jsonl"
 
+import argparse
+import os
+import json
 from collections import defaultdict
 from models import *
+from dataset import DialogueDataset
+from checkpoint import load_checkpoint
+from aliases import AliasIndex
+from triplet_store import TripletStoreReader
 
 def extract_relations_from_fandom_triples():
     relations = defaultdict(list)
@@ -62,14 +70,256 @@ def load_relations(file_path):
                 relations[key].append(parts[2])
     return relations
 
+class Interner:
+    """Maps strings to dense integer ids so triples compare as int tuples"""
+    def __init__(self):
+        self.ids = {}
+        self.strings = []
+
+    def intern(self, s):
+        i = self.ids.get(s)
+        if i is None:
+            i = len(self.strings)
+            self.ids[s] = i
+            self.strings.append(s)
+        return i
+
+
+def prf(tp, n_pred, n_gold):
+    precision = tp / n_pred if n_pred else 0.0
+    recall = tp / n_gold if n_gold else 0.0
+    f1 = 2 * precision * recall / (precision + recall) if precision + recall else 0.0
+    return {"precision": precision, "recall": recall, "f1": f1, "tp": tp, "pred": n_pred, "gold": n_gold}
+
+
+def macro(scores):
+    if not scores:
+        return {"precision": 0.0, "recall": 0.0, "f1": 0.0}
+    return {
+        key: sum(score[key] for score in scores) / len(scores)
+        for key in ("precision", "recall", "f1")
+    }
+
+
+class Evaluator:
+    """
+    Set-based precision/recall/F1 of (x, y, r) triples against a fixed gold set.
+
+    Gold triples are interned once, so scoring a new batch of predictions only
+    costs one pass over the predictions. `normalize` is applied to entity names
+    on both sides (e.g. str.casefold or an alias resolver). `unscored_by_episode`
+    counts gold triples left out of the gold set, which per-episode reports list
+    on their own.
+    """
+    def __init__(self, gold_triples, gold_by_episode=None, normalize=None, unscored_by_episode=None):
+        self.entities = Interner()
+        self.relations = Interner()
+        self.normalize = normalize
+        self.unscored_by_episode = unscored_by_episode or {}
+        self.gold = self.encode(gold_triples)
+        self.gold_by_episode = None
+        if gold_by_episode is not None:
+            self.gold_by_episode = {
+                episode: self.encode(triples) for episode, triples in gold_by_episode.items()
+            }
+
+    def encode(self, triples):
+        normalize = self.normalize
+        encoded = set()
+        for x, y, r in triples:
+            if normalize is not None:
+                x, y = normalize(x), normalize(y)
+            encoded.add((self.entities.intern(x), self.entities.intern(y), self.relations.intern(r)))
+        return encoded
+
+    def _score(self, pred, gold):
+        tp_set = pred & gold
+        pred_by_r = defaultdict(int)
+        gold_by_r = defaultdict(int)
+        tp_by_r = defaultdict(int)
+        for _, _, r in pred:
+            pred_by_r[r] += 1
+        for _, _, r in gold:
+            gold_by_r[r] += 1
+        for _, _, r in tp_set:
+            tp_by_r[r] += 1
+        per_relation = {
+            self.relations.strings[r]: prf(tp_by_r[r], pred_by_r[r], gold_by_r[r])
+            for r in set(pred_by_r) | set(gold_by_r)
+        }
+        return {
+            "micro": prf(len(tp_set), len(pred), len(gold)),
+            "macro": macro(list(per_relation.values())),
+            "per_relation": per_relation,
+        }
+
+    def score(self, predicted_triples):
+        """Micro, macro (over relation types) and per-relation scores"""
+        return self._score(self.encode(predicted_triples), self.gold)
+
+    def score_episodes(self, predicted_by_episode):
+        """
+        Per-episode scores for episode-tagged predictions; only episodes present
+        in `predicted_by_episode` are scored, so partial runs can be tracked.
+        """
+        if self.gold_by_episode is None:
+            raise ValueError("Evaluator was built without per-episode gold relations")
+        pred_all, gold_all = set(), set()
+        per_episode = {}
+        for episode, triples in predicted_by_episode.items():
+            # Tag triples with the episode so identical triples in different episodes stay distinct
+            pred = {(episode,) + t for t in self.encode(triples)}
+            gold = {(episode,) + t for t in self.gold_by_episode.get(episode, ())}
+            tp = len(pred & gold)
+            per_episode[episode] = prf(tp, len(pred), len(gold))
+            pred_all |= pred
+            gold_all |= gold
+        report = self._score({t[1:] for t in pred_all}, {t[1:] for t in gold_all})
+        report["micro"] = prf(len(pred_all & gold_all), len(pred_all), len(gold_all))
+        # Episodes with neither gold nor predicted triples carry no signal
+        report["macro_episode"] = macro([
+            scores for scores in per_episode.values() if scores["pred"] or scores["gold"]
+        ])
+        report["per_episode"] = per_episode
+        report["unscored_gold"] = sum(self.unscored_by_episode.get(episode, 0) for episode in predicted_by_episode)
+        return report
+
+
+def load_triples(file_path):
+    """(x, y, r) triples of an 'x||y||r' file or a columnar triplet store directory"""
+    if os.path.isdir(file_path):
+        with TripletStoreReader(file_path) as store:
+            return list(store.triples())
+    triples = []
+    with open(file_path, "r", encoding="utf-8") as f:
+        for line in f:
+            parts = line.strip().split("||")
+            if len(parts) == 3:
+                triples.append(tuple(parts))
+    return triples
+
+
+def is_speaker(entity):
+    return entity.startswith("Speaker ")
+
+
+def speaker_names(relations):
+    """'Speaker N' -> the first name an episode's gold gives it with per:alternate_names"""
+    names = {}
+    for relation in relations:
+        if "per:alternate_names" in relation["r"] and is_speaker(relation["x"]) and not is_speaker(relation["y"]):
+            names.setdefault(relation["x"], relation["y"])
+    return names
+
+
+def load_dialogre_gold(path, schema_only=True, resolve_speakers=False):
+    """
+    Gold triples per episode from a DialogRE split. With `schema_only`, relations
+    outside RelationType (e.g. 'unanswerable', 'per:girl/boyfriend') are dropped.
+    With `resolve_speakers`, 'Speaker N' labels are replaced by the name the
+    episode's gold gives them, as the extractor does; the speaker's own
+    'Speaker N' -> name triple then says nothing and is dropped.
+    """
+    gold = {}
+    with DialogueDataset(path) as ds:
+        for episode in ds:
+            names = speaker_names(episode.relations) if resolve_speakers else {}
+            triples = []
+            for relation in episode.relations:
+                x = names.get(relation["x"], relation["x"])
+                y = names.get(relation["y"], relation["y"])
+                for r in relation["r"]:
+                    if schema_only and r not in ALL_RELATION_TYPES:
+                        continue
+                    if x == y:
+                        continue
+                    triples.append((x, y, r))
+            gold[episode.index] = triples
+    return gold
+
+
+def checkpoint_triples(checkpoint_path):
+    """Episode-tagged predicted triples from an extraction checkpoint (result/<split>.jsonl)"""
+    return {
+        episode: [(t["x"], t["y"], t["r"]) for t in triplets]
+        for episode, triplets in load_checkpoint(checkpoint_path).items()
+    }
+
+
+def dialogre_evaluator(path, normalize=None):
+    """
+    Evaluator on the DialogRE gold with speakers resolved to names. Triples whose
+    speaker the gold never names cannot be extracted (speaker triplets are
+    dropped), so they are left out of the scores and reported as unscored.
+    """
+    gold_by_episode, unscored_by_episode = {}, {}
+    for episode, triples in load_dialogre_gold(path, resolve_speakers=True).items():
+        gold_by_episode[episode] = [t for t in triples if not is_speaker(t[0]) and not is_speaker(t[1])]
+        unscored_by_episode[episode] = len(triples) - len(gold_by_episode[episode])
+    gold = [t for triples in gold_by_episode.values() for t in triples]
+    return Evaluator(gold, gold_by_episode=gold_by_episode, normalize=normalize, unscored_by_episode=unscored_by_episode)
+
+
+def format_scores(name, scores):
+    return (
+        f"{name}: P={scores['precision']:.3f} R={scores['recall']:.3f} F1={scores['f1']:.3f}"
+        + (f" (tp={scores['tp']} pred={scores['pred']} gold={scores['gold']})" if "tp" in scores else "")
+    )
+
+
+def format_unscored(report):
+    return f"  ({report['unscored_gold']} gold relations with speakers the gold never names are not scored)"
+
+
+def print_report(title, report, per_relation=True):
+    print(f"== {title}")
+    print(format_scores("micro", report["micro"]))
+    print(format_scores("macro", report["macro"]))
+    if "macro_episode" in report:
+        print(format_scores("macro (episodes)", report["macro_episode"]))
+    if report.get("unscored_gold"):
+        print(format_unscored(report))
+    if per_relation:
+        for r, scores in sorted(report["per_relation"].items()):
+            print("  " + format_scores(r, scores))
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Score extracted relations")
+    parser.add_argument("--predictions", default=RAW_RELATIONS_FILE, help="'x||y||r' file or triplet store directory")
+    parser.add_argument("--checkpoint", default=RAW_DEV_CHECKPOINT_FILE, help="episode-tagged JSONL output of main.py")
+    parser.add_argument("--split", default=DEV_SET, help="DialogRE split the checkpoint was extracted from")
+    parser.add_argument("--casefold", action="store_true", help="compare entity names case-insensitively")
+    parser.add_argument("--aliases", action="store_true", help="resolve entity names to canonical Fandom entities")
+    parser.add_argument("--json", action="store_true", help="print the full report as JSON")
+    return parser.parse_args()
+
+
 def main():
     # generate_source_of_truth()
+    args = parse_args()
+    normalize = str.casefold if args.casefold else None
+    if args.aliases:
+        normalize = AliasIndex.from_fandom(FANDOM_TRIPLES).resolve
+    reports = {}
 
-    ground_truth = load_relations(REDUCED_GROUND_TRUTH_FILE)
-    raw_relations = load_relations(RAW_RELATIONS_FILE)
-    
+    ground_truth = load_triples(REDUCED_GROUND_TRUTH_FILE)
+    raw_relations = load_triples(args.predictions)
     print(f"Ground truth relations: {len(ground_truth)}")
     print(f"Raw extracted relations: {len(raw_relations)}")
+    reports["reduced_ground_truth"] = Evaluator(ground_truth, normalize=normalize).score(raw_relations)
+
+    if os.path.exists(args.checkpoint):
+        predicted_by_episode = checkpoint_triples(args.checkpoint)
+        evaluator = dialogre_evaluator(args.split, normalize=normalize)
+        reports["dialogre"] = evaluator.score_episodes(predicted_by_episode)
+
+    if args.json:
+        print(json.dumps(reports, indent=2))
+        return
+    print_report("Reduced Fandom ground truth", reports["reduced_ground_truth"])
+    if "dialogre" in reports:
+        print_report("DialogRE gold", reports["dialogre"])
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
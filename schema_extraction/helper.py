@@ -1,7 +1,10 @@
 import asyncio
 import json
+import shutil
 from pathlib import Path
 from models import *
+from dataset import DialogueDataset
+from triplet_store import TripletStoreReader, TripletStoreWriter
 
 
 def load_db(path):
@@ -12,21 +15,16 @@ def load_db(path):
     
     return ds
 
+def load_episodes(path, count=None):
+    # Only the first `count` episodes are read and parsed
+    with DialogueDataset(path) as ds:
+        return list(ds.iter(stop=count))
+
 def load_dialogues(path, count=None):
-    ds = load_db(path)
-    count = min(count, len(ds)) if count is not None else len(ds)
-    dialogues = []
-    for item in ds[:count]:
-        dialogues.append(item[0])
-    return dialogues
+    return [episode.dialogue for episode in load_episodes(path, count)]
 
 def load_relations(path, count=None):
-    ds = load_db(path)
-    count = min(count, len(ds)) if count is not None else len(ds)
-    relations = []
-    for item in ds[:count]:
-        relations.append(item[1])
-    return relations
+    return [episode.relations for episode in load_episodes(path, count)]
 
 def save_graph(results, path):
     output_file = Path(path)
@@ -37,3 +35,31 @@ def save_graph(results, path):
 
     with output_file.open("w", encoding="utf-8") as f:
         json.dump(all_triplets, f, indent=2, ensure_ascii=False)
+
+def open_triplet_store(path):
+    # Append to (or create) a columnar triplet store
+    return TripletStoreWriter(path, ALL_RELATION_TYPES, ALL_ENTITY_TYPES)
+
+def save_triplet_store(results, path):
+    """Write {episode: [triplet, ...]}, or a flat list of triplets, as a fresh columnar store"""
+    store_dir = Path(path)
+    if store_dir.exists():
+        shutil.rmtree(store_dir)
+    if not isinstance(results, dict):
+        results = {-1: results}
+
+    with open_triplet_store(store_dir) as writer:
+        for episode in sorted(results):
+            writer.extend(results[episode], episode)
+
+def save_triplet_txt(results, path):
+    """Write {episode: [triplet, ...]} as x||y||r lines, ordered by episode"""
+    output_file = Path(path)
+    output_file.parent.mkdir(parents=True, exist_ok=True)
+    with output_file.open("w", encoding="utf-8") as f:
+        for episode in sorted(results):
+            for t in results[episode]:
+                f.write(f"{t.x}||{t.y}||{t.r}\n")
+
+def load_triplet_store(path):
+    return TripletStoreReader(path)
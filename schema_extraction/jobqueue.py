@@ -0,0 +1,290 @@
+import asyncio
+import json
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import NamedTuple
+
+from scheduler import RateLimiter
+
+PENDING = "pending"
+LEASED = "leased"
+DONE = "done"
+FAILED = "failed"
+
+LEASE_SECONDS = 300.0
+MAX_ATTEMPTS = 3
+
+
+class Job(NamedTuple):
+    split: str
+    episode: int
+    attempts: int
+
+
+def connect(path):
+    """
+    Connection in autocommit mode; writers take the database lock with BEGIN IMMEDIATE.
+    Workers call it from asyncio.to_thread, so it may be used from any thread
+    (one at a time; the owner serializes access with a lock).
+    """
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    conn = sqlite3.connect(str(path), timeout=30.0, isolation_level=None, check_same_thread=False)
+    conn.execute("PRAGMA journal_mode=WAL")
+    return conn
+
+
+class JobQueue:
+    """
+    Durable SQLite queue with one job per (split, episode), shared by any number
+    of worker processes. A worker leases jobs for `lease_seconds` and keeps them
+    with heartbeat(); jobs whose lease runs out (the worker died or hung) are
+    handed to the next worker that asks. A job that has been leased
+    `max_attempts` times without an ack is marked failed. Every method may
+    block for up to the 30 s busy timeout, so async callers run them through
+    asyncio.to_thread; a lock keeps those threads off the connection at the same time.
+    """
+
+    def __init__(self, path, lease_seconds=LEASE_SECONDS, max_attempts=MAX_ATTEMPTS):
+        self.path = Path(path)
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+        self._lock = threading.Lock()
+        self._conn = connect(self.path)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS jobs ("
+            " split TEXT NOT NULL,"
+            " episode INTEGER NOT NULL,"
+            " status TEXT NOT NULL,"
+            " attempts INTEGER NOT NULL DEFAULT 0,"
+            " worker TEXT,"
+            " lease_expires REAL,"
+            " result TEXT,"
+            " error TEXT,"
+            " updated REAL NOT NULL,"
+            " PRIMARY KEY (split, episode))"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS jobs_status ON jobs (status, split, episode)")
+
+    def _write(self, statements):
+        """Run (sql, params) pairs in one write transaction; returns the total rows changed"""
+        changed = 0
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                for sql, params in statements:
+                    changed += self._conn.execute(sql, params).rowcount
+                self._conn.execute("COMMIT")
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+        return changed
+
+    def enqueue(self, split, episodes):
+        """Add one pending job per episode; episodes already queued are left as they are"""
+        now = time.time()
+        return self._write(
+            ("INSERT OR IGNORE INTO jobs (split, episode, status, updated) VALUES (?, ?, ?, ?)", (split, i, PENDING, now))
+            for i in episodes
+        )
+
+    def lease(self, worker, limit, split=None):
+        """Claim up to `limit` pending or expired jobs for `worker`, in episode order"""
+        now = time.time()
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                rows = self._conn.execute(
+                    "SELECT split, episode, attempts FROM jobs"
+                    " WHERE (status = ? OR (status = ? AND lease_expires < ?))"
+                    " AND (? IS NULL OR split = ?)"
+                    " ORDER BY split, episode LIMIT ?",
+                    (PENDING, LEASED, now, split, split, limit),
+                ).fetchall()
+                jobs = []
+                for job_split, episode, attempts in rows:
+                    if attempts >= self.max_attempts:
+                        # Leased max_attempts times and never acked: its workers keep dying on it
+                        self._conn.execute(
+                            "UPDATE jobs SET status = ?, worker = NULL, lease_expires = NULL, error = ?, updated = ?"
+                            " WHERE split = ? AND episode = ?",
+                            (FAILED, f"lease expired after {attempts} attempts", now, job_split, episode),
+                        )
+                        continue
+                    self._conn.execute(
+                        "UPDATE jobs SET status = ?, worker = ?, lease_expires = ?, attempts = attempts + 1, updated = ?"
+                        " WHERE split = ? AND episode = ?",
+                        (LEASED, worker, now + self.lease_seconds, now, job_split, episode),
+                    )
+                    jobs.append(Job(job_split, episode, attempts + 1))
+                self._conn.execute("COMMIT")
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+        return jobs
+
+    def heartbeat(self, worker, jobs):
+        """Extend the leases `worker` still holds on `jobs`; returns how many it still holds"""
+        expires = time.time() + self.lease_seconds
+        return self._write(
+            ("UPDATE jobs SET lease_expires = ? WHERE split = ? AND episode = ? AND status = ? AND worker = ?",
+             (expires, job.split, job.episode, LEASED, worker))
+            for job in jobs
+        )
+
+    def ack(self, worker, job, triplets):
+        """
+        Store the triplet dicts of a finished job. A late ack for a job whose lease
+        expired is still accepted unless another worker has finished it first.
+        """
+        return bool(self._write([(
+            "UPDATE jobs SET status = ?, worker = ?, lease_expires = NULL, result = ?, error = NULL, updated = ?"
+            " WHERE split = ? AND episode = ? AND status != ?",
+            (DONE, worker, json.dumps(triplets, ensure_ascii=False), time.time(), job.split, job.episode, DONE),
+        )]))
+
+    def fail(self, worker, job, error):
+        """Give a job back after a failed attempt: pending again, or failed once out of attempts"""
+        status = FAILED if job.attempts >= self.max_attempts else PENDING
+        return bool(self._write([(
+            "UPDATE jobs SET status = ?, worker = NULL, lease_expires = NULL, error = ?, updated = ?"
+            " WHERE split = ? AND episode = ? AND status = ? AND worker = ?",
+            (status, str(error), time.time(), job.split, job.episode, LEASED, worker),
+        )]))
+
+    def retry_failed(self, split=None):
+        """Queue failed jobs again with a fresh attempt budget"""
+        return self._write([(
+            "UPDATE jobs SET status = ?, attempts = 0, error = NULL, updated = ?"
+            " WHERE status = ? AND (? IS NULL OR split = ?)",
+            (PENDING, time.time(), FAILED, split, split),
+        )])
+
+    def counts(self, split=None):
+        """{status: number of jobs}, with expired leases counted as pending"""
+        counts = {PENDING: 0, LEASED: 0, DONE: 0, FAILED: 0}
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT CASE WHEN status = ? AND lease_expires < ? THEN ? ELSE status END, COUNT(*) FROM jobs"
+                " WHERE (? IS NULL OR split = ?) GROUP BY 1",
+                (LEASED, time.time(), PENDING, split, split),
+            ).fetchall()
+        for status, count in rows:
+            counts[status] = count
+        return counts
+
+    def remaining(self, split=None):
+        """Jobs not yet done or failed, including those leased by other workers"""
+        counts = self.counts(split)
+        return counts[PENDING] + counts[LEASED]
+
+    def results(self, split):
+        """{episode: [triplet dict, ...]} of every finished job of a split"""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT episode, result FROM jobs WHERE split = ? AND status = ? ORDER BY episode", (split, DONE)
+            ).fetchall()
+        return {episode: json.loads(result) for episode, result in rows}
+
+    def failures(self, split=None):
+        with self._lock:
+            return self._conn.execute(
+                "SELECT split, episode, attempts, error FROM jobs WHERE status = ? AND (? IS NULL OR split = ?)"
+                " ORDER BY split, episode",
+                (FAILED, split, split),
+            ).fetchall()
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+
+class SharedRateLimiter(RateLimiter):
+    """
+    RateLimiter whose bucket lives in the queue database, so every worker
+    process draws on the same requests/tokens per minute budget. The bucket is
+    read, refilled and debited inside one write transaction per request, which
+    runs through asyncio.to_thread since BEGIN IMMEDIATE waits for other workers.
+    """
+
+    def __init__(self, path, requests_per_minute=None, tokens_per_minute=None, name="default"):
+        super().__init__(requests_per_minute, tokens_per_minute)
+        self.name = name
+        self._db_lock = threading.Lock()
+        self._conn = connect(path)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS quota ("
+            " name TEXT PRIMARY KEY,"
+            " requests REAL NOT NULL,"
+            " tokens REAL NOT NULL,"
+            " updated REAL NOT NULL,"
+            " paused_until REAL NOT NULL)"
+        )
+        self._conn.execute(
+            "INSERT OR IGNORE INTO quota VALUES (?, ?, ?, ?, 0)",
+            (name, self._requests, self._tokens, time.time()),
+        )
+
+    def _load(self):
+        # The bucket stores wall-clock times; RateLimiter works in time.monotonic()
+        requests, tokens, updated, paused_until = self._conn.execute(
+            "SELECT requests, tokens, updated, paused_until FROM quota WHERE name = ?", (self.name,)
+        ).fetchone()
+        offset = time.monotonic() - time.time()
+        self._requests, self._tokens = requests, tokens
+        self._updated = updated + offset
+        self._paused_until = paused_until + offset
+
+    def _save(self):
+        offset = time.time() - time.monotonic()
+        self._conn.execute(
+            "UPDATE quota SET requests = ?, tokens = ?, updated = ?, paused_until = ? WHERE name = ?",
+            (self._requests, self._tokens, self._updated + offset, self._paused_until + offset, self.name),
+        )
+
+    def _take(self, tokens):
+        """Debit one request if it fits now; otherwise the seconds to wait"""
+        with self._db_lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                self._load()
+                self._refill()
+                wait = self._wait_time(tokens)
+                if wait <= 0:
+                    if self.requests_per_minute:
+                        self._requests -= 1
+                    if self.tokens_per_minute:
+                        self._tokens -= min(tokens, self.tokens_per_minute)
+                self._save()
+                self._conn.execute("COMMIT")
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+        return wait
+
+    async def acquire(self, tokens=0):
+        async with self._lock:
+            while (wait := await asyncio.to_thread(self._take, tokens)) > 0:
+                await asyncio.sleep(wait)
+
+    async def pause(self, seconds):
+        # Waits on _db_lock, which _take holds through its BEGIN IMMEDIATE; keep that off the event loop
+        await asyncio.to_thread(self._pause, time.time() + seconds)
+
+    def _pause(self, until):
+        with self._db_lock:
+            self._conn.execute(
+                "UPDATE quota SET paused_until = MAX(paused_until, ?) WHERE name = ?", (until, self.name)
+            )
+
+    def close(self):
+        with self._db_lock:
+            self._conn.close()
@@ -2,46 +2,246 @@ import dspy
 from models import *
 from typing import List, Dict
 from helper import *
+from scheduler import ExtractionScheduler, estimate_tokens
+from cache import ResponseCache
+from telemetry import Telemetry
+from batching import pack_episodes, run_batches
+from windowing import run_windowed
+from aliases import AliasIndex
+from prefilter import EpisodeScorer
+from f1score import dialogre_evaluator, format_scores, format_unscored
+from checkpoint import CheckpointWriter, completed_episodes, load_checkpoint
+from pathlib import Path
+import argparse
 import asyncio
 
-async def process_episode(i, episode, extractor):
-    episode_text = "\n".join(episode)
-    try:
-        # Run extractor in a thread to avoid blocking event loop
-        triplets = await asyncio.to_thread(extractor, episode_text)
-        if not triplets:
-            print(f"[{i} ⚠️ No triplets extracted for dialogue {i+1}")
-            return []
-        print(f"{i} ✅ Found {len(triplets)} triplets in dialogue {i+1}")
-        return triplets
-    except Exception as e:
-        print(f"{i} ❌ Extraction failed for dialogue {i+1}: {episode}\nerror:{e}")
-        return []
-
-async def process_episodes(dialogues, extractor):
-    tasks = [
-        process_episode(i, episode, extractor)
-        for i, episode in enumerate(dialogues)
-    ]
-    results_per_episode = await asyncio.gather(*tasks)
+# Scheduler settings, tune to the provider quota of the configured model
+MAX_CONCURRENCY = 8
+REQUESTS_PER_MINUTE = 500
+TOKENS_PER_MINUTE = 200_000
+MAX_RETRIES = 3
+REQUEST_TIMEOUT = 120.0
+# The instruction block and relation list (as input and in the output schema) are sent with every episode
+PROMPT_TOKENS = estimate_tokens(DialogRERelation.instructions + ", ".join(ALL_RELATION_TYPES) * 2)
+# The compact mode sends short instructions and the relation list once, in the output schema
+MODE_PROMPT_TOKENS = {
+    "cot": PROMPT_TOKENS,
+    "predict": PROMPT_TOKENS,
+    "compact": estimate_tokens(DialogRECompactRelation.instructions + ", ".join(ALL_RELATION_TYPES)),
+}
+COMPLETION_TOKENS = 500
+# Batch mode sends the relation list only once per batch
+BATCH_PROMPT_TOKENS = estimate_tokens(DialogREBatchRelation.instructions + ", ".join(ALL_RELATION_TYPES))
+BATCH_MAX_EPISODES = 20
+# Raw LLM outputs are cached here so reruns only re-apply parsing and validation
+CACHE_PATH = "./result/llm_cache.sqlite"
+CACHE_MAX_ENTRIES = 100_000
+CACHE_MAX_AGE = 30 * 24 * 3600
+
+SPLITS = {"dev": DEV_SET, "train": TRAIN_SET, "test": TEST_SET}
+
+def report_episode(result, telemetry=None):
+    i = result.index
+    if telemetry is not None:
+        status = "failed" if result.failed else "empty" if not result.triplets else "ok"
+        telemetry.count("episodes", status=status)
+        telemetry.count("triplets", len(result.triplets))
+        telemetry.event(
+            "episode", episode=i, status=status, attempts=result.attempts,
+            triplets=len(result.triplets), error=repr(result.error) if result.failed else None,
+        )
+    if result.failed:
+        print(f"{i} ❌ Extraction failed for dialogue {i+1} after {result.attempts} attempts\nerror:{result.error}")
+    elif telemetry is not None:
+        # Per-episode progress goes to the telemetry log
+        return
+    elif not result.triplets:
+        print(f"[{i} ⚠️ No triplets extracted for dialogue {i+1}")
+    else:
+        print(f"{i} ✅ Found {len(result.triplets)} triplets in dialogue {i+1}")
+
+async def process_episodes(
+    dialogues, extractor, checkpoint=None, indices=None, batch_tokens=None,
+    window=None, overlap=0, aliases=None, **scheduler_options,
+):
+    """
+    Extract all dialogues through the scheduler. With `batch_tokens`, `extractor`
+    must be a BatchRelationExtractor and episodes are packed into multi-episode
+    prompts of at most that many tokens. With `window`, long episodes are split
+    into windows of that many turns (sharing `overlap` turns) extracted in
+    parallel; `extractor` should then keep speaker triplets for the merge.
+    The checkpoint keeps the extracted surface names. With `aliases` (an
+    AliasIndex), the returned triplets are canonicalized after the run, in
+    episode order.
+    """
+    options = dict(
+        max_concurrency=MAX_CONCURRENCY,
+        requests_per_minute=REQUESTS_PER_MINUTE,
+        tokens_per_minute=TOKENS_PER_MINUTE,
+        max_retries=MAX_RETRIES,
+        request_timeout=REQUEST_TIMEOUT,
+        prompt_tokens=MODE_PROMPT_TOKENS[getattr(extractor, "mode", "cot")],
+        completion_tokens=COMPLETION_TOKENS,
+    )
+    if batch_tokens:
+        options["prompt_tokens"] = BATCH_PROMPT_TOKENS
+    options.update(scheduler_options)
+    scheduler = ExtractionScheduler(extractor, **options)
+
+    def on_result(result):
+        report_episode(result, options.get("telemetry"))
+        # Failed episodes are left out of the checkpoint so --resume retries them
+        if checkpoint is not None and not result.failed:
+            checkpoint.write(result.index, result.triplets)
+
+    if indices is None:
+        indices = range(len(dialogues))
+    if batch_tokens:
+        batches = pack_episodes(
+            dialogues, indices, batch_tokens,
+            prompt_tokens=options["prompt_tokens"], max_episodes=BATCH_MAX_EPISODES,
+        )
+        print(f"Packed {len(dialogues)} dialogues into {len(batches)} batches")
+        results_per_episode = await run_batches(scheduler, extractor, batches, on_result=on_result)
+    elif window:
+        results_per_episode = await run_windowed(
+            scheduler, extractor, dialogues, indices, window, overlap, on_result=on_result
+        )
+    else:
+        results_per_episode = await scheduler.run(dialogues, on_result=on_result, indices=indices)
+
+    failed = [result.index for result in results_per_episode if result.failed]
+    if failed:
+        print(f"❌ {len(failed)} dialogues failed after retries: {failed}")
+    triplets = {result.index: result.triplets for result in results_per_episode}
+    if aliases is not None:
+        # Learning as episodes complete would make the names depend on completion order
+        triplets = aliases.canonicalize_episodes(triplets)
     # Flatten results into one list
-    all_results = [triplet for triplets in results_per_episode for triplet in triplets]
+    all_results = [triplet for index in sorted(triplets) for triplet in triplets[index]]
     return all_results
 
+def load_episodes(checkpoint_path, aliases=None):
+    """
+    {episode: [TripletRecord, ...]} of a checkpoint. With `aliases`, names are
+    canonicalized over the whole checkpoint in episode order, so a resumed run
+    learns from the earlier episodes too.
+    """
+    episodes = {
+        episode: [TripletRecord(**t) for t in triplets]
+        for episode, triplets in load_checkpoint(checkpoint_path).items()
+    }
+    if aliases is not None:
+        episodes = aliases.canonicalize_episodes(episodes)
+    return episodes
+
+def predicted_triples(episodes):
+    """(x, y, r) triples per episode, as the DialogRE evaluator takes them"""
+    return {episode: [(t.x, t.y, t.r) for t in triplets] for episode, triplets in episodes.items()}
+
+def write_outputs(split, checkpoint_path, output_dir, aliases=None):
+    """
+    Compact a split's per-episode checkpoint into its triplet store and dev.txt, and
+    print its DialogRE scores. With `aliases`, names are canonicalized (see load_episodes) and the
+    gold names are resolved through the same index before scoring.
+    """
+    output_dir = Path(output_dir)
+    # The checkpoint is read once; the store, dev.txt and the scores all come from this
+    episodes = load_episodes(checkpoint_path, aliases)
+    # The columnar store read by graphdb, and the x||y||r lines scored by f1score.py
+    save_triplet_store(episodes, output_dir / f"{split}.triplets")
+    save_triplet_txt(episodes, output_dir / f"{split}.txt")
+    print(f"✅ Saved {sum(map(len, episodes.values()))} triplets to {output_dir / f'{split}.triplets'}")
+    # Track quality alongside throughput settings
+    normalize = aliases.resolve if aliases is not None else None
+    report = dialogre_evaluator(SPLITS[split], normalize=normalize).score_episodes(predicted_triples(episodes))
+    print(format_scores("DialogRE micro", report["micro"]))
+    if report["unscored_gold"]:
+        print(format_unscored(report))
+    return episodes
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Extract relation triplets from a DialogRE split")
+    parser.add_argument("--split", choices=SPLITS, default="dev")
+    parser.add_argument("--count", type=int, default=None, help="only the first N dialogues")
+    parser.add_argument("--output-dir", default="./result")
+    parser.add_argument("--resume", action="store_true", help="skip episodes already in the checkpoint")
+    parser.add_argument(
+        "--batch-tokens", type=int, default=None,
+        help="pack several episodes into one prompt of at most this many tokens",
+    )
+    parser.add_argument("--window", type=int, default=None, help="split long dialogues into windows of this many turns")
+    parser.add_argument("--overlap", type=int, default=2, help="turns shared by consecutive windows")
+    parser.add_argument("--raw-names", action="store_true", help="keep entity surface forms instead of canonical names")
+    parser.add_argument(
+        "--mode", choices=EXTRACTION_MODES, default="cot",
+        help="cot: reasoning first (default); predict: same prompt, no reasoning; compact: short prompt, relation types sent once",
+    )
+    parser.add_argument(
+        "--prefilter", type=float, default=None, metavar="MIN_SCORE",
+        help="skip dialogues whose prefilter score is below MIN_SCORE (see prefilter.py)",
+    )
+    args = parser.parse_args()
+    if args.batch_tokens and args.window:
+        parser.error("--batch-tokens and --window cannot be combined")
+    if args.batch_tokens and args.mode != "cot":
+        parser.error("--batch-tokens only supports --mode cot")
+    return args
+
 def main():
+    args = parse_args()
+    output_dir = Path(args.output_dir)
+    checkpoint_path = output_dir / f"{args.split}.jsonl"
+
     # Configure the OpenAI LM
     # dspy.configure(lm=dspy.LM("openai/gpt-3.5-turbo"), api_key=OPEN)
     dspy.configure(lm=dspy.LM("gpt-4.1-mini"), api_key=OPEN)
 
     # Instantiate the predictor
-    extractor = OptimizedRelationExtractor()
-    # Example dialogue episode
-    dialogues = load_dialogues(DEV_SET)
+    cache = ResponseCache(CACHE_PATH, max_entries=CACHE_MAX_ENTRIES, max_age=CACHE_MAX_AGE)
+    telemetry = Telemetry(output_dir / f"{args.split}.telemetry.jsonl", stage="extraction")
+    if args.batch_tokens:
+        extractor = BatchRelationExtractor(cache=cache, telemetry=telemetry)
+    elif args.window:
+        extractor = OptimizedRelationExtractor(cache=cache, keep_speakers=True, telemetry=telemetry, mode=args.mode)
+    else:
+        extractor = OptimizedRelationExtractor(cache=cache, telemetry=telemetry, mode=args.mode)
+    aliases = None if args.raw_names else AliasIndex.from_fandom(FANDOM_TRIPLES)
+    dialogues = load_dialogues(SPLITS[args.split], args.count)
+    indices = list(range(len(dialogues)))
+
+    if args.resume:
+        done = completed_episodes(checkpoint_path)
+        indices = [i for i in indices if i not in done]
+        print(f"Resuming: {len(done)} dialogues already done, {len(indices)} to go")
+    elif checkpoint_path.exists():
+        checkpoint_path.unlink()
+
+    if args.prefilter is not None:
+        # Skipped episodes stay out of the checkpoint, so a rerun with a lower score can pick them up
+        scorer = EpisodeScorer(aliases or AliasIndex.from_fandom(FANDOM_TRIPLES))
+        indices, skipped = scorer.select([dialogues[i] for i in indices], indices, args.prefilter)
+        telemetry.count("episodes", len(skipped), status="skipped")
+        print(f"Prefilter: skipping {len(skipped)} dialogues scoring below {args.prefilter}, {len(indices)} to go")
+
+    with CheckpointWriter(checkpoint_path) as checkpoint:
+        asyncio.run(process_episodes(
+            [dialogues[i] for i in indices], extractor,
+            checkpoint=checkpoint, indices=indices, batch_tokens=args.batch_tokens,
+            window=args.window, overlap=args.overlap, telemetry=telemetry,
+        ))
 
-    results = asyncio.run(process_episodes(dialogues, extractor))
-    # Save results
-    save_graph(results, "./result/dev.json")
+    write_outputs(args.split, checkpoint_path, output_dir, aliases)
+    cache_stats = cache.stats()
+    print(f"LLM cache: {cache_stats}")
+    telemetry.count("cache_hits", cache_stats["hits"])
+    telemetry.count("cache_misses", cache_stats["misses"])
+    telemetry.report()
+    telemetry.write_summary(output_dir / f"{args.split}.metrics.json")
+    telemetry.write_summary(output_dir / f"{args.split}.metrics.prom")
+    telemetry.close()
+    cache.close()
 
 
 if __name__ == "__main__":
-   main()
\ No newline at end of file
+   main()
@@ -1,10 +1,14 @@
 from pydantic import BaseModel
-from typing import List, Dict
+from typing import List, Dict, NamedTuple
 from enum import Enum
+import asyncio
+import contextlib
 import dspy
+from dspy.utils.exceptions import AdapterParseError
 import json
 from pathlib import Path
 import os
+import time
 
 # Resolve the project root (the parent of "project")
 PROJECT_ROOT = Path(__file__).resolve().parent.parent
@@ -12,6 +16,7 @@ PROJECT_ROOT = Path(__file__).resolve().parent.parent
 DEV_SET = os.path.join(PROJECT_ROOT, "data", "dev.json")
 TRAIN_SET = os.path.join(PROJECT_ROOT, "data", "train.json")
 TEST_SET = os.path.join(PROJECT_ROOT, "data", "test.json")
+FANDOM_TRIPLES = os.path.join(PROJECT_ROOT, "data", "Fandom_triples.txt")
 
 OPEN = os.getenv("OPENAI_API_KEY", "")
 class EntityType(str, Enum):
@@ -67,6 +72,20 @@ class RelationTriplet(BaseModel):
     x_type: EntityType
     y_type: EntityType
 
+class TripletRecord(NamedTuple):
+    """
+    Validated triplet as produced by the extractors. Same fields as RelationTriplet,
+    but a plain tuple of strings, so validation doesn't build a model per item.
+    """
+    x: str
+    y: str
+    r: str
+    x_type: str
+    y_type: str
+
+    def dict(self):
+        return self._asdict()
+
 class DialogRERelation(dspy.Signature):
     """
     Extract relation triplets from dialogue text between multiple speakers.
@@ -96,16 +115,15 @@ class DialogRERelation(dspy.Signature):
         desc="Allowed entity types: per (person), org (organization), string (other)",
         default=ALL_ENTITY_TYPES
     )
+    # The list itself is the input value and the enum of the output schema; not a third time here
     relation_types: List[str] = dspy.InputField(
-        desc=(
-            "Allowed relation types in format 'entity:relation'. "
-            "MUST USE EXACTLY THESE STRINGS: " + ", ".join(ALL_RELATION_TYPES)
-        ),
+        desc="Allowed relation types in format 'entity:relation'. MUST USE EXACTLY THESE STRINGS.",
         default=ALL_RELATION_TYPES
     )
-    relation_triplets: str = dspy.OutputField(
+    # Typed: the adapter validates relation and entity types against RelationTriplet, no repair needed
+    relation_triplets: List[RelationTriplet] = dspy.OutputField(
         desc=(
-            "JSON string representing a list of relation triplets with real entity names. "
+            "List of relation triplets with real entity names. "
             "CRITICAL: NEVER use 'Speaker N' as entities. Always resolve to actual named entities. "
             "If speaker identities are unclear from context, omit the relation. "
             "MUST USE EXACT relation types from the provided list. "
@@ -120,69 +138,316 @@ class DialogRERelation(dspy.Signature):
         )
     )
 
+class DialogREWindowRelation(dspy.Signature):
+    """
+    Extract relation triplets from one window of a longer multi-speaker dialogue.
+
+    CRITICAL RULES:
+    1. The window is part of a longer dialogue; a speaker may only be named in another window
+    2. Use the speaker label ('Speaker 1', 'Speaker 2', ...) as the entity for a speaker
+       whose name this window does not reveal
+    3. Whenever the window reveals a speaker's name, ALSO output a triplet
+       {"x": "Speaker N", "y": "<name>", "r": "per:alternate_names", "x_type": "per", "y_type": "per"}
+    4. Extract relations ONLY between named entities or speaker labels, never generic terms
+       like 'man', 'woman' or 'agent'
+    5. Focus on explicit relationships mentioned or strongly implied in the dialogue
+    6. Use EXACT relation types from the provided list - no variations or abbreviations
+    """
+    episode_text: str = dspy.InputField(desc="One window of a multi-speaker dialogue episode")
+    entity_types: List[str] = dspy.InputField(
+        desc="Allowed entity types: per (person), org (organization), string (other)",
+        default=ALL_ENTITY_TYPES
+    )
+    relation_types: List[str] = dspy.InputField(
+        desc="Allowed relation types in format 'entity:relation'. MUST USE EXACTLY THESE STRINGS.",
+        default=ALL_RELATION_TYPES
+    )
+    relation_triplets: List[RelationTriplet] = dspy.OutputField(
+        desc=(
+            "List of relation triplets. "
+            "Speaker labels are allowed as entities; name them with per:alternate_names when the window reveals the name. "
+            "Example output format: "
+            '[{"x": "Speaker 1", "y": "Joey Tribbiani", "r": "per:alternate_names", "x_type": "per", "y_type": "per"}, '
+            '{"x": "Speaker 2", "y": "Speaker 1", "r": "per:friends", "x_type": "per", "y_type": "per"}]'
+        )
+    )
+
+class DialogRECompactRelation(dspy.Signature):
+    """
+    Extract relation triplets between named entities from a multi-speaker dialogue.
+
+    - Never use 'Speaker N' or generic terms ('man', 'woman', 'agent') as entities;
+      use a speaker's real name when the dialogue reveals it, otherwise omit the relation
+    - Only explicit or strongly implied relations, no trivial ones
+    - Entity types: per (person), org (organization), string (anything else)
+    """
+    episode_text: str = dspy.InputField(desc="Multi-speaker dialogue episode")
+    # The adapter renders the RelationTriplet schema, with the relation types, once
+    relation_triplets: List[RelationTriplet] = dspy.OutputField(desc="Relation triplets with real entity names")
+
+class DialogRECompactWindowRelation(dspy.Signature):
+    """
+    Extract relation triplets from one window of a longer multi-speaker dialogue.
+
+    - Use the speaker label ('Speaker 1', ...) as the entity for a speaker whose name
+      this window does not reveal; when it does, also output a triplet
+      {"x": "Speaker N", "y": "<name>", "r": "per:alternate_names", "x_type": "per", "y_type": "per"}
+    - Never use generic terms ('man', 'woman', 'agent') as entities
+    - Only explicit or strongly implied relations, no trivial ones
+    - Entity types: per (person), org (organization), string (anything else)
+    """
+    episode_text: str = dspy.InputField(desc="One window of a multi-speaker dialogue episode")
+    relation_triplets: List[RelationTriplet] = dspy.OutputField(desc="Relation triplets, speaker labels allowed")
+
+# Windowed extraction keeps 'Speaker N' entities, so it asks for them with its own prompt
+WINDOW_SIGNATURES = {
+    DialogRERelation: DialogREWindowRelation,
+    DialogRECompactRelation: DialogRECompactWindowRelation,
+}
+
+# Decoding modes of OptimizedRelationExtractor: (predictor, signature). Every
+# mode's output is typed as List[RelationTriplet] and validated by the adapter
+EXTRACTION_MODES = {
+    # Reasoning before the triplets, the most accurate and the slowest
+    "cot": (dspy.ChainOfThought, DialogRERelation),
+    # Same prompt, triplets without reasoning
+    "predict": (dspy.Predict, DialogRERelation),
+    # Short instructions, relation types sent once
+    "compact": (dspy.Predict, DialogRECompactRelation),
+}
+
 class OptimizedRelationExtractor(dspy.Module):
-    def __init__(self):
+    def __init__(self, cache=None, keep_speakers=False, telemetry=None, mode="cot"):
         super().__init__()
-        self.predictor = dspy.ChainOfThought(DialogRERelation)
+        if mode not in EXTRACTION_MODES:
+            raise ValueError(f"unknown extraction mode {mode!r}, expected one of {list(EXTRACTION_MODES)}")
+        self.mode = mode
+        predictor, self.signature = EXTRACTION_MODES[mode]
+        # Keep 'Speaker N' triplets so a later stage (windowing) can resolve them
+        self.keep_speakers = keep_speakers
+        if keep_speakers:
+            self.signature = WINDOW_SIGNATURES.get(self.signature, self.signature)
+        self.predictor = predictor(self.signature)
+        # Optional cache.ResponseCache of raw relation_triplets outputs
+        self.cache = cache
+        # Optional telemetry.Telemetry for LLM latency, tokens and drop counts
+        self.telemetry = telemetry
     
     def forward(self, episode_text):
+        key = self._cache_key(episode_text)
+        relation_triplets = self._cached(key)
+        if relation_triplets is None:
+            started = time.perf_counter()
+            try:
+                with self._track_usage() as usage:
+                    result = self.predictor(**self._inputs(episode_text))
+            except AdapterParseError as e:
+                result = self._typed_parse_failure(e)
+            self._record_call(usage, time.perf_counter() - started)
+            relation_triplets = self._output(result)
+            self._store(key, relation_triplets)
+        return self._parse_triplets(relation_triplets)
+
+    async def aforward(self, episode_text):
+        """Async-native variant of forward, used by the episode scheduler"""
+        key = self._cache_key(episode_text)
+        relation_triplets = await self._acached(key)
+        if relation_triplets is None:
+            started = time.perf_counter()
+            try:
+                with self._track_usage() as usage:
+                    result = await self.predictor.acall(**self._inputs(episode_text))
+            except AdapterParseError as e:
+                result = self._typed_parse_failure(e)
+            self._record_call(usage, time.perf_counter() - started)
+            relation_triplets = self._output(result)
+            await self._astore(key, relation_triplets)
+        return self._parse_triplets(relation_triplets)
+
+    def _inputs(self, episode_text):
+        if "relation_types" in self.signature.input_fields:
+            return dict(episode_text=episode_text, entity_types=ALL_ENTITY_TYPES, relation_types=ALL_RELATION_TYPES)
+        return dict(episode_text=episode_text)
+
+    @property
+    def typed(self):
+        """Whether the adapter validates the output against RelationTriplet (every mode but batch)"""
+        return self.signature.output_fields["relation_triplets"].annotation is not str
+
+    def _typed_parse_failure(self, error):
+        """
+        The adapter rejects the whole list when one item does not fit RelationTriplet,
+        after ChatAdapter's JSON fallback has already made a second call. Rather than
+        losing the episode, validate the items of the rejected output one by one and
+        keep those that fit. Returns a prediction with the kept items, or None when
+        the output is not a list at all (a parse failure; retrying would replay it).
+        """
+        if not self.typed:
+            raise error
+        self._count("typed_parse_failures")
+        items = None
+        # The JSONAdapter error is raised while handling ChatAdapter's, so both responses are on the chain
+        failure = error
+        while items is None and isinstance(failure, AdapterParseError):
+            items = self._rejected_items(failure.lm_response)
+            failure = failure.__context__
+        if items is None:
+            print(f"Typed output rejected: {error}")
+            return None
+        kept = []
+        for item in items:
+            try:
+                kept.append(RelationTriplet.model_validate(item))
+            except ValueError as e:
+                self._count("triplets_dropped", reason="schema")
+                print(f"Skipping triplet that does not fit RelationTriplet {item}: {e}")
+        print(f"Typed output rejected, kept {len(kept)} of {len(items)} triplets that fit RelationTriplet")
+        return dspy.Prediction(relation_triplets=kept)
+
+    def _rejected_items(self, lm_response):
+        """The relation_triplets list of a ChatAdapter or JSONAdapter response, or None"""
+        text = lm_response or ""
+        header = "[[ ## relation_triplets ## ]]"
+        if header in text:
+            text = text.split(header)[1].split("[[ ## ")[0]
         try:
-            result = self.predictor(
-                episode_text=episode_text,
-                entity_types=ALL_ENTITY_TYPES,
-                relation_types=ALL_RELATION_TYPES,
+            data = json.loads(text.strip())
+        except json.JSONDecodeError:
+            return None
+        if isinstance(data, dict):
+            data = data.get("relation_triplets")
+        return data if isinstance(data, list) else None
+
+    def _output(self, result):
+        """Raw relation_triplets JSON of a prediction; typed outputs are dumped to the same JSON"""
+        relation_triplets = getattr(result, "relation_triplets", None)
+        if isinstance(relation_triplets, list):
+            relation_triplets = json.dumps(
+                [triplet.model_dump(mode="json") for triplet in relation_triplets], ensure_ascii=False
             )
-                    
-            print(result.relation_triplets)
+        return relation_triplets
+
+    def _count(self, name, value=1, **labels):
+        if self.telemetry is not None:
+            self.telemetry.count(name, value, **labels)
+
+    def _track_usage(self):
+        """
+        Token usage of one predictor call. Tracked here rather than with dspy's
+        global track_usage, which would try to attach usage to the list forward returns.
+        """
+        return dspy.track_usage() if self.telemetry is not None else contextlib.nullcontext()
+
+    def _record_call(self, usage, seconds):
+        """LLM latency plus the token usage collected by _track_usage"""
+        if self.telemetry is None:
+            return
+        labels = dict(signature=self.signature.__name__, mode=self.mode)
+        self.telemetry.observe("llm", seconds, **labels)
+        calls = sum(len(entries) for entries in usage.usage_data.values()) or 1
+        self._count("llm_calls", calls, **labels)
+        if calls > 1:
+            # ChatAdapter could not parse the output and retried the call with JSONAdapter
+            self._count("adapter_fallbacks", calls - 1, **labels)
+            print(f"⚠️ Output parsing fell back to JSONAdapter: {calls} LLM calls for one prediction")
+        for model_usage in usage.get_total_tokens().values():
+            self._count("prompt_tokens", model_usage.get("prompt_tokens") or 0, **labels)
+            self._count("completion_tokens", model_usage.get("completion_tokens") or 0, **labels)
+
+    def _cache_key(self, episode_text):
+        """Cache key over prompt text, signature, predictor type and model name"""
+        if self.cache is None:
+            return None
+        lm = dspy.settings.lm
+        model = getattr(lm, "model", str(lm))
+        return self.cache.key_for(self.signature, model, type(self.predictor).__name__, episode_text)
+
+    def _cached(self, key):
+        return self.cache.get(key) if key is not None else None
+
+    def _store(self, key, relation_triplets):
+        if key is not None and relation_triplets is not None:
+            self.cache.set(key, relation_triplets)
+
+    # The cache may wait up to its SQLite timeout on other processes; async callers keep that off the loop
+    async def _acached(self, key):
+        return await asyncio.to_thread(self.cache.get, key) if key is not None else None
+
+    async def _astore(self, key, relation_triplets):
+        if key is not None and relation_triplets is not None:
+            await asyncio.to_thread(self.cache.set, key, relation_triplets)
+
+    def _parse_triplets(self, relation_triplets):
+        """Parse and validate the raw relation_triplets JSON of a prediction"""
+        try:
             # Parse the JSON string output
-            triplets_data = json.loads(result.relation_triplets)    
+            triplets_data = json.loads(relation_triplets)    
+            if not isinstance(triplets_data, list):
+                # An object would be iterated by key, each key counted as a malformed triplet
+                raise TypeError(f"expected a list of triplets, got {type(triplets_data).__name__}")
 
-            # Convert to RelationTriplet objects with validation
+            # Convert to TripletRecord tuples with validation
             validated_triplets = []
             for item in triplets_data:
-                try:
-                    # Validate and convert relation type
-                    if item["r"] not in ALL_RELATION_TYPES:
-                        # Try to find the closest match
-                        corrected_relation = self._correct_relation_type(item["r"])
-                        if corrected_relation:
-                            item["r"] = corrected_relation
-                        else:
-                            print(f"Skipping invalid relation type: {item['r']}")
-                            continue
-                    
-                    # Validate entity types
-                    if item["x_type"] not in ALL_ENTITY_TYPES:
-                        item["x_type"] = self._correct_entity_type(item["x_type"])
-                    if item["y_type"] not in ALL_ENTITY_TYPES:
-                        item["y_type"] = self._correct_entity_type(item["y_type"])
-                    
-                    # Skip speaker entities and generic terms
-                    if self._is_speaker_entity(item["x"]) or self._is_speaker_entity(item["y"]):
-                        continue
-                    if self._is_generic_entity(item["x"]) or self._is_generic_entity(item["y"]):
-                        continue
-                    
-                    # Create the validated triplet
-                    triplet = RelationTriplet(
-                        x=item["x"],
-                        y=item["y"], 
-                        r=RelationType(item["r"]),
-                        x_type=EntityType(item["x_type"]),
-                        y_type=EntityType(item["y_type"])
-                    )
+                triplet = self._validate_item(item)
+                if triplet is not None:
                     validated_triplets.append(triplet)
-                    
-                except (KeyError, ValueError) as e:
-                    print(f"Skipping invalid triplet {item}: {e}")
-                    continue
+            self._count("triplets_parsed", len(triplets_data))
+            self._count("triplets_kept", len(validated_triplets))
                     
             return validated_triplets
             
         except (json.JSONDecodeError, TypeError, AttributeError) as e:
+            self._count("parse_failures")
             print(f"Error parsing response: {e}")
-            print(f"Raw response: {getattr(result, 'relation_triplets', 'No response')}")
+            print(f"Raw response: {relation_triplets}")
             return []
+
+    def _validate_item(self, item):
+        """Validate one parsed triplet dict; returns a TripletRecord or None to skip it"""
+        try:
+            # Validate and convert relation type
+            if item["r"] not in ALL_RELATION_TYPES:
+                # Try to find the closest match; typed outputs were validated by the adapter and are not repaired
+                corrected_relation = None if self.typed else self._correct_relation_type(item["r"])
+                if corrected_relation:
+                    item["r"] = corrected_relation
+                else:
+                    self._count("triplets_dropped", reason="invalid_relation")
+                    return None
+                self._count("relations_corrected")
+            
+            # Validate entity types
+            if self.typed and not {item["x_type"], item["y_type"]} <= set(ALL_ENTITY_TYPES):
+                self._count("triplets_dropped", reason="invalid_entity_type")
+                return None
+            if item["x_type"] not in ALL_ENTITY_TYPES:
+                item["x_type"] = self._correct_entity_type(item["x_type"])
+            if item["y_type"] not in ALL_ENTITY_TYPES:
+                item["y_type"] = self._correct_entity_type(item["y_type"])
+            
+            # Skip speaker entities and generic terms
+            if not self.keep_speakers and (self._is_speaker_entity(item["x"]) or self._is_speaker_entity(item["y"])):
+                self._count("triplets_dropped", reason="speaker")
+                return None
+            if self._is_generic_entity(item["x"]) or self._is_generic_entity(item["y"]):
+                self._count("triplets_dropped", reason="generic")
+                return None
+            
+            # Create the validated triplet
+            return TripletRecord(
+                x=item["x"],
+                y=item["y"],
+                r=item["r"],
+                x_type=item["x_type"],
+                y_type=item["y_type"],
+            )
+            
+        except (KeyError, ValueError, TypeError, AttributeError) as e:
+            # Not a dict, a missing field or a non-string type: drop this item, keep the rest
+            self._count("triplets_dropped", reason="malformed")
+            print(f"Skipping invalid triplet {item}: {e}")
+            return None
     
     def _correct_relation_type(self, relation_str):
         """Try to correct common relation type mistakes"""
@@ -221,6 +486,135 @@ class OptimizedRelationExtractor(dspy.Module):
         return entity.lower() in generic_terms
     
     
+class BatchParseError(ValueError):
+    """The output of a multi-episode batch could not be parsed"""
+
+
+def format_batch(episodes):
+    """Render (episode_id, episode_text) pairs as one prompt with per-episode headers"""
+    return "\n\n".join(f"### Episode {episode_id}\n{text}" for episode_id, text in episodes)
+
+
+class DialogREBatchRelation(dspy.Signature):
+    __doc__ = DialogRERelation.__doc__ + """
+    Batch Rules:
+    - The input holds several independent episodes, each starting with '### Episode <id>'
+    - Never combine entities or speaker identities across episodes
+    - Tag every triplet with the id of the episode it was extracted from
+    """
+    episodes: str = dspy.InputField(desc="Several multi-speaker dialogue episodes, each introduced by '### Episode <id>'")
+    entity_types: List[str] = dspy.InputField(
+        desc="Allowed entity types: per (person), org (organization), string (other)",
+        default=ALL_ENTITY_TYPES
+    )
+    relation_types: List[str] = dspy.InputField(
+        desc="Allowed relation types in format 'entity:relation'. MUST USE EXACTLY THESE STRINGS.",
+        default=ALL_RELATION_TYPES
+    )
+    relation_triplets: str = dspy.OutputField(
+        desc=(
+            "JSON string representing a list of relation triplets with real entity names, "
+            "each tagged with the integer id of its episode. "
+            "CRITICAL: NEVER use 'Speaker N' as entities. Always resolve to actual named entities. "
+            "MUST USE EXACT relation types from the provided list. "
+            "Example output format: "
+            '[{"episode": 3, "x": "Joey Tribbiani", "y": "Phoebe Buffay", "r": "per:friends", "x_type": "per", "y_type": "per"}, '
+            '{"episode": 4, "x": "Ross Geller", "y": "Ben", "r": "per:children", "x_type": "per", "y_type": "per"}]'
+        )
+    )
+
+
+class BatchRelationExtractor(OptimizedRelationExtractor):
+    """
+    Extracts several episodes in one call. Takes a list of (episode_id, episode_text)
+    pairs and returns {episode_id: [TripletRecord, ...]}; raises BatchParseError
+    when the output cannot be parsed so the caller can split the batch.
+    """
+    def __init__(self, cache=None, telemetry=None):
+        super().__init__(cache=cache, telemetry=telemetry)
+        self.signature = DialogREBatchRelation
+        self.predictor = dspy.ChainOfThought(self.signature)
+
+    def forward(self, episodes):
+        batch_text = format_batch(episodes)
+        key = self._cache_key(batch_text)
+        relation_triplets = self._cached(key)
+        if relation_triplets is None:
+            started = time.perf_counter()
+            with self._track_usage() as usage:
+                result = self.predictor(
+                    episodes=batch_text,
+                    entity_types=ALL_ENTITY_TYPES,
+                    relation_types=ALL_RELATION_TYPES,
+                )
+            self._record_call(usage, time.perf_counter() - started)
+            relation_triplets = getattr(result, "relation_triplets", None)
+            # Only parseable outputs are cached, a bad batch is split and retried
+            triplets = self._parse_batch(relation_triplets, episodes)
+            self._store(key, relation_triplets)
+            return triplets
+        return self._parse_batch(relation_triplets, episodes)
+
+    async def aforward(self, episodes):
+        batch_text = format_batch(episodes)
+        key = self._cache_key(batch_text)
+        relation_triplets = await self._acached(key)
+        if relation_triplets is None:
+            started = time.perf_counter()
+            with self._track_usage() as usage:
+                result = await self.predictor.acall(
+                    episodes=batch_text,
+                    entity_types=ALL_ENTITY_TYPES,
+                    relation_types=ALL_RELATION_TYPES,
+                )
+            self._record_call(usage, time.perf_counter() - started)
+            relation_triplets = getattr(result, "relation_triplets", None)
+            # Only parseable outputs are cached, a bad batch is split and retried
+            triplets = self._parse_batch(relation_triplets, episodes)
+            await self._astore(key, relation_triplets)
+            return triplets
+        return self._parse_batch(relation_triplets, episodes)
+
+    def _parse_batch(self, relation_triplets, episodes):
+        """Group validated triplets by episode id"""
+        try:
+            triplets_data = json.loads(relation_triplets)
+        except (json.JSONDecodeError, TypeError) as e:
+            self._count("parse_failures")
+            print(f"Raw response: {relation_triplets}")
+            raise BatchParseError(f"unparseable batch output: {e}") from e
+        if not isinstance(triplets_data, list):
+            self._count("parse_failures")
+            raise BatchParseError("batch output is not a list of triplets")
+
+        ids = {str(episode_id): episode_id for episode_id, _ in episodes}
+        triplets = {episode_id: [] for episode_id, _ in episodes}
+        for item in triplets_data:
+            if not isinstance(item, dict) or str(item.get("episode")) not in ids:
+                self._count("triplets_dropped", reason="unknown_episode")
+                print(f"Skipping triplet without a known episode id: {item}")
+                continue
+            triplet = self._validate_item(item)
+            if triplet is not None:
+                triplets[ids[str(item["episode"])]].append(triplet)
+        self._count("triplets_parsed", len(triplets_data))
+        self._count("triplets_kept", sum(len(kept) for kept in triplets.values()))
+        return triplets
+
+
+
+class PredicateRelationSignature(dspy.Signature):
+    """
+    Map a free-form predicate from schemaless extraction ("x || y || predicate")
+    onto one of the candidate relation types, or 'none' when no candidate
+    describes the predicate. Keep the direction: (x, per:children, y) means y is
+    a child of x, (x, per:parents, y) means y is a parent of x.
+    """
+    predicate: str = dspy.InputField(desc="Predicate text linking entity x to entity y")
+    examples: List[str] = dspy.InputField(desc="Triples using the predicate, as 'x || y || predicate'", default=[])
+    candidates: List[str] = dspy.InputField(desc="Candidate relation types, best embedding match first")
+    relation: str = dspy.OutputField(desc="Exactly one of the candidates, or 'none'")
+    
 class QuestionAnswerAgentWithRelationSignature(dspy.Signature):
     """
     """
@@ -244,4 +638,11 @@ class QuestionAnswerAgent(dspy.Module):
             question_text=question_text,
             entity_relations=entity_relations
         )
+        return result.answer
+
+    async def aforward(self, question_text, entity_relations: List[str]):
+        result = await self.predictor.acall(
+            question_text=question_text,
+            entity_relations=entity_relations
+        )
         return result.answer
\ No newline at end of file
@@ -0,0 +1,113 @@
+import argparse
+import asyncio
+import json
+import time
+from pathlib import Path
+
+import dspy
+
+from models import *
+from helper import load_dialogues
+from telemetry import Telemetry
+from aliases import AliasIndex
+from checkpoint import CheckpointWriter
+from f1score import dialogre_evaluator
+from main import SPLITS, load_episodes, predicted_triples, process_episodes
+
+MODES_DIR = "./result/modes"
+# Enough dialogues for stable token counts and F1 without paying for a whole split per mode
+COUNT = 50
+
+
+def _counter(summary, name):
+    return sum(c["value"] for c in summary["counters"] if c["name"] == name)
+
+
+def _timing(summary, name):
+    rows = [t for t in summary["timings"] if t["name"] == name]
+    count = sum(t["count"] for t in rows)
+    return {
+        "mean": sum(t["sum"] for t in rows) / count if count else 0.0,
+        "p95": max((t["p95"] for t in rows), default=0.0),
+    }
+
+
+async def run_mode(mode, split, dialogues, output_dir, raw_names=False, **scheduler_options):
+    """
+    Extract `dialogues` (the first ones of `split`) in one decoding mode, without
+    the response cache, and return its latency, token and DialogRE micro scores.
+    """
+    output_dir = Path(output_dir)
+    output_dir.mkdir(parents=True, exist_ok=True)
+    checkpoint_path = output_dir / f"{split}.{mode}.jsonl"
+    if checkpoint_path.exists():
+        checkpoint_path.unlink()
+    telemetry = Telemetry(output_dir / f"{split}.{mode}.telemetry.jsonl", stage="extraction", mode=mode)
+    extractor = OptimizedRelationExtractor(telemetry=telemetry, mode=mode)
+    aliases = None if raw_names else AliasIndex.from_fandom(FANDOM_TRIPLES)
+    started = time.perf_counter()
+    try:
+        with CheckpointWriter(checkpoint_path) as checkpoint:
+            await process_episodes(
+                dialogues, extractor, checkpoint=checkpoint, telemetry=telemetry, **scheduler_options,
+            )
+    finally:
+        telemetry.close()
+    seconds = time.perf_counter() - started
+    summary = telemetry.summary()
+    calls = _counter(summary, "llm_calls")
+    # Canonicalized as main.write_outputs does, and the gold resolved through the same index
+    predicted = predicted_triples(load_episodes(checkpoint_path, aliases))
+    normalize = aliases.resolve if aliases is not None else None
+    report = dialogre_evaluator(SPLITS[split], normalize=normalize).score_episodes(predicted)
+    return {
+        "mode": mode,
+        "episodes": len(dialogues),
+        "seconds": seconds,
+        "llm": _timing(summary, "llm"),
+        "llm_calls": calls,
+        "prompt_tokens": _counter(summary, "prompt_tokens"),
+        "completion_tokens": _counter(summary, "completion_tokens"),
+        "parse_failures": _counter(summary, "parse_failures"),
+        "relations_corrected": _counter(summary, "relations_corrected"),
+        "micro": report["micro"],
+        "unscored_gold": report["unscored_gold"],
+    }
+
+
+def print_table(results):
+    print(f"{'mode':<8} {'s/ep':>6} {'llm mean':>9} {'llm p95':>8} {'prompt/ep':>10} {'compl/ep':>9} {'failed':>7} {'P':>6} {'R':>6} {'F1':>6}")
+    for r in results:
+        episodes = r["episodes"] or 1
+        micro = r["micro"]
+        print(
+            f"{r['mode']:<8} {r['seconds'] / episodes:>6.2f} {r['llm']['mean']:>8.2f}s {r['llm']['p95']:>7.2f}s "
+            f"{r['prompt_tokens'] / episodes:>10.0f} {r['completion_tokens'] / episodes:>9.0f} {r['parse_failures']:>7g} "
+            f"{micro['precision']:>6.3f} {micro['recall']:>6.3f} {micro['f1']:>6.3f}"
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare latency, tokens and DialogRE F1 of the extraction decoding modes")
+    parser.add_argument("--split", choices=SPLITS, default="dev")
+    parser.add_argument("--count", type=int, default=COUNT, help="first N dialogues, the same for every mode")
+    parser.add_argument("--modes", nargs="+", choices=EXTRACTION_MODES, default=list(EXTRACTION_MODES))
+    parser.add_argument("--output-dir", default=MODES_DIR)
+    parser.add_argument("--raw-names", action="store_true", help="keep entity surface forms instead of canonical names")
+    args = parser.parse_args()
+
+    # No LM cache either, so every mode pays for its own calls
+    dspy.configure(lm=dspy.LM("gpt-4.1-mini", cache=False), api_key=OPEN)
+    dialogues = load_dialogues(SPLITS[args.split], args.count)
+    results = [
+        asyncio.run(run_mode(mode, args.split, dialogues, args.output_dir, args.raw_names))
+        for mode in args.modes
+    ]
+    print_table(results)
+    output = Path(args.output_dir) / f"{args.split}.json"
+    output.write_text(json.dumps(results, indent=2), encoding="utf-8")
+    print(f"✅ Results written to {output}")
+
+
+if __name__ == "__main__":
+    main()
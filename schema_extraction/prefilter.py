@@ -0,0 +1,177 @@
+import argparse
+import re
+from typing import NamedTuple
+
+from models import *
+from dataset import DialogueDataset
+from aliases import AliasIndex
+from f1score import checkpoint_triples, dialogre_evaluator, format_scores, format_unscored, is_speaker, load_dialogre_gold
+
+# Words that usually carry one of the RelationType relations: family, partners,
+# friends, work, school, places, names and ages (mostly DialogRE trigger words)
+LEXICON = {
+    "mom", "mommy", "mother", "moms", "dad", "daddy", "father", "parents", "parent",
+    "sister", "sisters", "brother", "brothers", "son", "sons", "daughter", "daughters",
+    "kid", "kids", "child", "children", "baby", "babies", "twin", "twins",
+    "aunt", "uncle", "nephew", "niece", "cousin", "cousins", "grandma", "grandpa",
+    "grandmother", "grandfather", "granddaughter", "grandson", "stepmom", "stepmum", "stepdad",
+    "family", "relative", "relatives", "adopted", "adopting", "adopt", "pregnant",
+    "wife", "wives", "husband", "husbands", "ex-wife", "ex-husband", "married", "marry", "marriage",
+    "wedding", "honeymoon", "divorce", "divorced", "fiance", "fiancé", "fiancée", "engaged",
+    "boyfriend", "girlfriend", "couple", "friend", "friends", "friendship", "pal", "pals", "buddy", "bud",
+    "roommate", "roommates", "neighbor", "neighbour", "boss", "job", "work", "works", "working",
+    "company", "office", "hired", "fired", "employee", "assistant", "doctor", "lawyer", "chef",
+    "waitress", "actor", "actress", "professor", "student", "school", "college", "university",
+    "class", "teacher", "live", "lives", "living", "moved", "apartment", "born", "birthday", "age",
+    "old", "name", "names", "named", "nickname", "call", "called",
+}
+# Capitalized words that are not names of people, places or organizations
+NOT_NAMES = {
+    "I", "I'm", "I'll", "I've", "I'd", "Im", "Ill", "Oh", "Ohh", "Ah", "Uh", "Um", "Hmm", "Hey", "Hi", "Hello",
+    "OK", "Ok", "Okay", "Yeah", "Yes", "No", "Nope", "Well", "So", "And", "But", "Or", "What", "Why", "How",
+    "Who", "Where", "When", "God", "Mr", "Mrs", "Ms", "Dr", "Sir", "Man", "Guys", "Honey", "Sweetie",
+    "Monday", "Tuesday", "Wednesday", "Thursday", "Friday", "Saturday", "Sunday", "Christmas",
+}
+WORD = re.compile(r"[A-Za-z][A-Za-z'\-é]*")
+SENTENCE = re.compile(r"(?<=[.!?])\s+")
+SPEAKER = re.compile(r"^Speaker \d+:\s*")
+
+# Score = weighted count of distinct lexicon words, cast members and other names
+LEXICON_WEIGHT = 1.0
+CAST_WEIGHT = 1.0
+NAME_WEIGHT = 0.25
+# Episodes scoring below this are not sent to the LLM by `main.py --prefilter`
+MIN_SCORE = 1.5
+THRESHOLDS = [0.5, 1.0, 1.5, 2.0, 2.5, 3.0, 4.0, 5.0]
+
+
+class EpisodeScore(NamedTuple):
+    score: float
+    lexicon: int
+    cast: int
+    names: int
+
+
+class EpisodeScorer:
+    """
+    Cheap local guess of whether a dialogue holds any relation worth an LLM call:
+    relation words, cast members known to the alias index and other capitalized
+    names. No model calls; scoring the whole train split takes a fraction of a second.
+    """
+
+    def __init__(self, aliases=None, lexicon_weight=LEXICON_WEIGHT, cast_weight=CAST_WEIGHT, name_weight=NAME_WEIGHT):
+        self.aliases = aliases.aliases if aliases is not None else {}
+        self.lexicon_weight = lexicon_weight
+        self.cast_weight = cast_weight
+        self.name_weight = name_weight
+
+    def score(self, dialogue):
+        lexicon, cast, names = set(), set(), set()
+        for turn in dialogue:
+            for sentence in SENTENCE.split(SPEAKER.sub("", turn)):
+                words = WORD.findall(sentence)
+                for j, word in enumerate(words):
+                    if word.lower() in LEXICON:
+                        lexicon.add(word.lower())
+                    if not word[0].isupper() or word in NOT_NAMES:
+                        continue
+                    # 'Monica Geller' as well as 'Monica'
+                    pair = f"{word} {words[j + 1]}" if j + 1 < len(words) else None
+                    canonical = self.aliases.get(pair) or self.aliases.get(word)
+                    if canonical is not None:
+                        cast.add(canonical)
+                    elif j > 0:
+                        # The first word of a sentence is capitalized anyway
+                        names.add(word)
+        score = (
+            self.lexicon_weight * len(lexicon)
+            + self.cast_weight * len(cast)
+            + self.name_weight * len(names)
+        )
+        return EpisodeScore(score, len(lexicon), len(cast), len(names))
+
+    def select(self, dialogues, indices, min_score=MIN_SCORE):
+        """Split `indices` into the episodes scoring at least `min_score` and the skipped ones"""
+        kept, skipped = [], []
+        for dialogue, i in zip(dialogues, indices):
+            (kept if self.score(dialogue).score >= min_score else skipped).append(i)
+        return kept, skipped
+
+
+def sweep(path, thresholds=THRESHOLDS, checkpoint_path=None, scorer=None):
+    """
+    Episodes skipped and gold relations lost at each threshold. 'named' gold
+    leaves out Speaker N relations, which the extractor drops anyway. With an
+    extraction checkpoint, also the DialogRE micro F1 when the skipped
+    episodes are left empty.
+    """
+    aliases = AliasIndex.from_fandom(FANDOM_TRIPLES)
+    scorer = scorer or EpisodeScorer(aliases)
+    with DialogueDataset(path) as ds:
+        scores = {episode.index: scorer.score(episode.dialogue).score for episode in ds}
+    gold = load_dialogre_gold(path)
+    named = {
+        i: [t for t in triples if not is_speaker(t[0]) and not is_speaker(t[1])]
+        for i, triples in gold.items()
+    }
+    total_gold = sum(len(triples) for triples in gold.values())
+    total_named = sum(len(triples) for triples in named.values())
+    free = {i for i, triples in gold.items() if not triples}
+    evaluator = predicted = baseline = unscored = None
+    if checkpoint_path is not None:
+        # main.py canonicalizes names by default; resolving both sides also scores --raw-names runs fairly
+        evaluator = dialogre_evaluator(path, normalize=aliases.resolve)
+        predicted = checkpoint_triples(checkpoint_path)
+        scored = evaluator.score_episodes(predicted)
+        baseline, unscored = scored["micro"], scored["unscored_gold"]
+
+    rows = []
+    for threshold in thresholds:
+        skipped = {i for i, score in scores.items() if score < threshold}
+        row = {
+            "threshold": threshold,
+            "skipped": len(skipped),
+            "skipped_ratio": len(skipped) / len(scores),
+            "relation_free_skipped": len(skipped & free),
+            "gold_recall": 1 - sum(len(gold[i]) for i in skipped) / max(total_gold, 1),
+            "named_gold_recall": 1 - sum(len(named[i]) for i in skipped) / max(total_named, 1),
+        }
+        if evaluator is not None:
+            filtered = {i: ([] if i in skipped else triples) for i, triples in predicted.items()}
+            row["micro"] = evaluator.score_episodes(filtered)["micro"]
+        rows.append(row)
+    return {
+        "episodes": len(scores), "relation_free": len(free), "gold": total_gold, "named_gold": total_named,
+        "baseline": baseline, "unscored_gold": unscored, "rows": rows,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure what the extraction prefilter skips and the gold relations it loses")
+    parser.add_argument("--split", choices=["dev", "train", "test"], default="dev")
+    parser.add_argument("--thresholds", type=float, nargs="+", default=THRESHOLDS)
+    parser.add_argument("--checkpoint", default=None, help="extraction checkpoint (result/<split>.jsonl) to score F1 with")
+    args = parser.parse_args()
+    path = {"dev": DEV_SET, "train": TRAIN_SET, "test": TEST_SET}[args.split]
+
+    report = sweep(path, args.thresholds, args.checkpoint)
+    print(
+        f"{args.split}: {report['episodes']} episodes, {report['relation_free']} without schema relations, "
+        f"{report['gold']} gold relations ({report['named_gold']} between named entities)"
+    )
+    if report["baseline"] is not None:
+        print(format_scores("No prefilter", report["baseline"]))
+        if report["unscored_gold"]:
+            print(format_unscored(report))
+    for row in report["rows"]:
+        print(
+            f"min score {row['threshold']:>4}: skip {row['skipped']:>4} ({row['skipped_ratio']:.1%}), "
+            f"{row['relation_free_skipped']} relation-free | gold recall {row['gold_recall']:.1%}, "
+            f"named {row['named_gold_recall']:.1%}"
+        )
+        if "micro" in row:
+            print(format_scores(f"  min score {row['threshold']}", row["micro"]))
+
+
+if __name__ == "__main__":
+    main()
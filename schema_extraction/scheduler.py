@@ -0,0 +1,264 @@
+import asyncio
+import random
+import time
+from dataclasses import dataclass, field
+from typing import Any, List, Optional
+
+
+def estimate_tokens(text):
+    """Rough token estimate (~4 characters per token)"""
+    return len(text) // 4 + 1
+
+
+def is_rate_limit_error(error):
+    """Check if an exception is a provider 429 / rate limit error"""
+    if getattr(error, "status_code", None) == 429:
+        return True
+    name = type(error).__name__.lower()
+    return "ratelimit" in name or "rate limit" in str(error).lower()
+
+
+def is_timeout_error(error):
+    """Check if an exception is a timeout (ours or the provider's)"""
+    if isinstance(error, (asyncio.TimeoutError, TimeoutError)):
+        return True
+    return "timeout" in type(error).__name__.lower()
+
+
+class RateLimiter:
+    """Token bucket limiting requests per minute and tokens per minute"""
+
+    def __init__(self, requests_per_minute=None, tokens_per_minute=None):
+        self.requests_per_minute = requests_per_minute
+        self.tokens_per_minute = tokens_per_minute
+        self._requests = float(requests_per_minute or 0)
+        self._tokens = float(tokens_per_minute or 0)
+        self._updated = time.monotonic()
+        self._paused_until = 0.0
+        self._lock = asyncio.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        elapsed = now - self._updated
+        self._updated = now
+        if self.requests_per_minute:
+            self._requests = min(
+                self.requests_per_minute,
+                self._requests + elapsed * self.requests_per_minute / 60,
+            )
+        if self.tokens_per_minute:
+            self._tokens = min(
+                self.tokens_per_minute,
+                self._tokens + elapsed * self.tokens_per_minute / 60,
+            )
+
+    def _wait_time(self, tokens):
+        wait = max(0.0, self._paused_until - time.monotonic())
+        if self.requests_per_minute and self._requests < 1:
+            wait = max(wait, (1 - self._requests) * 60 / self.requests_per_minute)
+        if self.tokens_per_minute:
+            # A single request larger than the whole budget only waits for a full bucket
+            tokens = min(tokens, self.tokens_per_minute)
+            if self._tokens < tokens:
+                wait = max(wait, (tokens - self._tokens) * 60 / self.tokens_per_minute)
+        return wait
+
+    async def acquire(self, tokens=0):
+        """Wait until one request of `tokens` tokens fits in the budget"""
+        async with self._lock:
+            while True:
+                self._refill()
+                wait = self._wait_time(tokens)
+                if wait <= 0:
+                    break
+                await asyncio.sleep(wait)
+            if self.requests_per_minute:
+                self._requests -= 1
+            if self.tokens_per_minute:
+                self._tokens -= min(tokens, self.tokens_per_minute)
+
+    async def pause(self, seconds):
+        """Hold back every caller for `seconds`, e.g. after a 429"""
+        self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+
+
+class AdaptiveConcurrency:
+    """Concurrency cap that halves on throttling and grows back on success"""
+
+    def __init__(self, max_concurrency, success_threshold=10):
+        self.max_concurrency = max_concurrency
+        self.limit = max_concurrency
+        self.success_threshold = success_threshold
+        self._active = 0
+        self._successes = 0
+        self._condition = asyncio.Condition()
+
+    async def __aenter__(self):
+        async with self._condition:
+            await self._condition.wait_for(lambda: self._active < self.limit)
+            self._active += 1
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        async with self._condition:
+            self._active -= 1
+            self._condition.notify_all()
+
+    async def throttled(self):
+        async with self._condition:
+            self.limit = max(1, self.limit // 2)
+            self._successes = 0
+
+    async def succeeded(self):
+        async with self._condition:
+            self._successes += 1
+            if self._successes >= self.success_threshold and self.limit < self.max_concurrency:
+                self.limit += 1
+                self._successes = 0
+                self._condition.notify_all()
+
+
+@dataclass
+class JobResult:
+    """Outcome of one run_job call: whatever `call()` returned, or the last error"""
+    index: int
+    value: Any = None
+    attempts: int = 0
+    error: Optional[BaseException] = None
+
+    @property
+    def failed(self):
+        return self.error is not None
+
+
+@dataclass
+class EpisodeResult:
+    index: int
+    triplets: List = field(default_factory=list)
+    attempts: int = 0
+    error: Optional[BaseException] = None
+
+    @property
+    def failed(self):
+        return self.error is not None
+
+
+class ExtractionScheduler:
+    """
+    Runs the extractor over many episodes with a bounded, rate-limit-aware
+    fan-out instead of one thread per episode.
+    """
+
+    def __init__(
+        self,
+        extractor,
+        max_concurrency=8,
+        requests_per_minute=None,
+        tokens_per_minute=None,
+        max_retries=3,
+        request_timeout=120.0,
+        base_backoff=2.0,
+        max_backoff=60.0,
+        prompt_tokens=0,
+        completion_tokens=0,
+        telemetry=None,
+    ):
+        self.extractor = extractor
+        # Optional telemetry.Telemetry for job latency, retries and rate-limit waits
+        self.telemetry = telemetry
+        self.limiter = RateLimiter(requests_per_minute, tokens_per_minute)
+        self.concurrency = AdaptiveConcurrency(max_concurrency)
+        self.max_retries = max_retries
+        self.request_timeout = request_timeout
+        self.base_backoff = base_backoff
+        self.max_backoff = max_backoff
+        # Fixed per-request overhead (instructions, schema) and expected output size
+        self.prompt_tokens = prompt_tokens
+        self.completion_tokens = completion_tokens
+
+    def _backoff(self, attempt):
+        delay = min(self.max_backoff, self.base_backoff * 2 ** (attempt - 1))
+        return delay * (0.5 + random.random() / 2)
+
+    async def _call(self, call):
+        if self.request_timeout:
+            return await asyncio.wait_for(call(), self.request_timeout)
+        return await call()
+
+    async def run_job(self, index, tokens, call, fatal=(), label=None):
+        """
+        Run `call()` (any model-calling coroutine) under the rate and concurrency
+        limits, retrying with backoff. Returns a JobResult holding its return value;
+        exceptions in `fatal` are returned without retrying.
+        """
+        label = label or f"dialogue {index+1}"
+        result = JobResult(index=index)
+        started = time.perf_counter()
+        while result.attempts <= self.max_retries:
+            result.attempts += 1
+            waited = time.perf_counter()
+            await self.limiter.acquire(tokens)
+            self._observe("rate_limit_wait", time.perf_counter() - waited)
+            try:
+                async with self.concurrency:
+                    result.value = await self._call(call)
+                result.error = None
+                await self.concurrency.succeeded()
+                self._finish(result, started, "ok")
+                return result
+            except fatal as e:
+                result.error = e
+                self._finish(result, started, "fatal")
+                return result
+            except Exception as e:
+                result.error = e
+                delay = self._backoff(result.attempts)
+                self._count("failed_attempts", reason=(
+                    "rate_limit" if is_rate_limit_error(e) else "timeout" if is_timeout_error(e) else "error"
+                ))
+                if is_rate_limit_error(e) or is_timeout_error(e):
+                    # Slow everyone down, not just this episode, to avoid a throttling storm
+                    await self.concurrency.throttled()
+                    await self.limiter.pause(delay)
+                print(
+                    f"{index} 🔁 Attempt {result.attempts} failed for {label}: "
+                    f"{type(e).__name__}: {e}"
+                )
+                if result.attempts <= self.max_retries:
+                    await asyncio.sleep(delay)
+        self._finish(result, started, "failed")
+        return result
+
+    def _count(self, name, value=1, **labels):
+        if self.telemetry is not None:
+            self.telemetry.count(name, value, **labels)
+
+    def _observe(self, name, seconds):
+        if self.telemetry is not None:
+            self.telemetry.observe(name, seconds)
+
+    def _finish(self, result, started, status):
+        self._observe("job", time.perf_counter() - started)
+        self._count("jobs", status=status)
+
+    async def run_episode(self, i, episode):
+        episode_text = "\n".join(episode)
+        tokens = estimate_tokens(episode_text) + self.prompt_tokens + self.completion_tokens
+        job = await self.run_job(i, tokens, lambda: self.extractor.acall(episode_text))
+        return EpisodeResult(index=i, triplets=job.value or [], attempts=job.attempts, error=job.error)
+
+    async def run(self, dialogues, on_result=None, indices=None):
+        """
+        Extract all dialogues; `on_result` is called as each episode finishes.
+        `indices` gives the episode index of each dialogue (default: position).
+        """
+        async def run_one(i, episode):
+            result = await self.run_episode(i, episode)
+            if on_result is not None:
+                on_result(result)
+            return result
+
+        if indices is None:
+            indices = range(len(dialogues))
+        tasks = [run_one(i, episode) for i, episode in zip(indices, dialogues)]
+        return await asyncio.gather(*tasks)
@@ -0,0 +1,136 @@
+import json
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+from pathlib import Path
+
+METRIC_PREFIX = "ke_"
+QUANTILES = (0.5, 0.95, 0.99)
+
+
+def _labels_key(labels):
+    return tuple(sorted(labels.items()))
+
+
+def _quantile(values, q):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(q * len(values)))]
+
+
+def _prometheus_labels(labels, **extra):
+    pairs = list(labels) + list(extra.items())
+    if not pairs:
+        return ""
+    escaped = (str(v).replace("\\", "\\\\").replace('"', '\\"') for _, v in pairs)
+    return "{" + ",".join(f'{k}="{v}"' for (k, _), v in zip(pairs, escaped)) + "}"
+
+
+class Telemetry:
+    """
+    Run metrics for the pipeline: counters (calls, tokens, parse failures) and
+    timings (LLM latency, embed and write time), each with optional labels.
+    Events go to a JSONL log when `log_path` is set; summary() / prometheus()
+    render the totals at the end of a run.
+    """
+
+    def __init__(self, log_path=None, **labels):
+        # Labels added to every metric, e.g. stage="extraction"
+        self.labels = labels
+        self.started = time.monotonic()
+        self.counters = defaultdict(float)
+        self.timings = defaultdict(list)
+        self._log = None
+        if log_path is not None:
+            Path(log_path).parent.mkdir(parents=True, exist_ok=True)
+            self._log = open(log_path, "a", encoding="utf-8")
+
+    def count(self, name, value=1, **labels):
+        self.counters[(name, _labels_key({**self.labels, **labels}))] += value
+
+    def observe(self, name, seconds, **labels):
+        self.timings[(name, _labels_key({**self.labels, **labels}))].append(seconds)
+
+    @contextmanager
+    def timer(self, name, **labels):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - started, **labels)
+
+    def event(self, name, **fields):
+        """One structured log line; dropped when no log file is configured"""
+        if self._log is None:
+            return
+        record = {"ts": round(time.time(), 3), "event": name, **self.labels, **fields}
+        self._log.write(json.dumps(record, ensure_ascii=False, default=str) + "\n")
+        self._log.flush()
+
+    def summary(self):
+        elapsed = time.monotonic() - self.started
+        counters = [
+            {"name": name, "labels": dict(labels), "value": value}
+            for (name, labels), value in sorted(self.counters.items())
+        ]
+        timings = []
+        for (name, labels), values in sorted(self.timings.items()):
+            timing = {
+                "name": name,
+                "labels": dict(labels),
+                "count": len(values),
+                "sum": sum(values),
+                "mean": sum(values) / len(values),
+                "max": max(values),
+            }
+            for q in QUANTILES:
+                timing[f"p{int(q * 100)}"] = _quantile(values, q)
+            timings.append(timing)
+        return {"elapsed": elapsed, "counters": counters, "timings": timings}
+
+    def prometheus(self):
+        """The totals in Prometheus text exposition format"""
+        lines = []
+        declared = set()
+        for (name, labels), value in sorted(self.counters.items()):
+            metric = f"{METRIC_PREFIX}{name}_total"
+            if metric not in declared:
+                lines.append(f"# TYPE {metric} counter")
+                declared.add(metric)
+            lines.append(f"{metric}{_prometheus_labels(labels)} {value:g}")
+        for (name, labels), values in sorted(self.timings.items()):
+            metric = f"{METRIC_PREFIX}{name}_seconds"
+            if metric not in declared:
+                lines.append(f"# TYPE {metric} summary")
+                declared.add(metric)
+            for q in QUANTILES:
+                lines.append(f"{metric}{_prometheus_labels(labels, quantile=q)} {_quantile(values, q):.6f}")
+            lines.append(f"{metric}_sum{_prometheus_labels(labels)} {sum(values):.6f}")
+            lines.append(f"{metric}_count{_prometheus_labels(labels)} {len(values)}")
+        return "\n".join(lines) + "\n"
+
+    def write_summary(self, path):
+        """Write the summary as JSON, or as Prometheus text when `path` ends in .prom"""
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        if path.suffix == ".prom":
+            path.write_text(self.prometheus(), encoding="utf-8")
+        else:
+            path.write_text(json.dumps(self.summary(), indent=2), encoding="utf-8")
+
+    def report(self):
+        """Short human-readable digest of the timings and counters"""
+        summary = self.summary()
+        for timing in summary["timings"]:
+            labels = ",".join(f"{k}={v}" for k, v in timing["labels"].items())
+            print(
+                f"⏱️ {timing['name']}{'{' + labels + '}' if labels else ''}: {timing['count']} × "
+                f"mean {timing['mean']:.3f}s p95 {timing['p95']:.3f}s (total {timing['sum']:.1f}s)"
+            )
+        for counter in summary["counters"]:
+            labels = ",".join(f"{k}={v}" for k, v in counter["labels"].items())
+            print(f"🔢 {counter['name']}{'{' + labels + '}' if labels else ''}: {counter['value']:g}")
+
+    def close(self):
+        if self._log is not None:
+            self._log.close()
+            self._log = None
@@ -0,0 +1,225 @@
+import json
+import mmap
+import sys
+from array import array
+from pathlib import Path
+from typing import NamedTuple
+
+STORE_VERSION = 1
+
+# Column name -> array typecode; every column file is a raw native-endian array
+COLUMNS = {
+    "x": "I",
+    "y": "I",
+    "r": "B",
+    "x_type": "B",
+    "y_type": "B",
+    "episode": "i",
+}
+
+
+class StoredTriplet(NamedTuple):
+    x: str
+    y: str
+    r: str
+    x_type: str
+    y_type: str
+    episode: int
+
+
+def _column_path(path, name):
+    return path / f"{name}.{COLUMNS[name]}"
+
+
+class TripletStoreWriter:
+    """
+    Appends triplets to a columnar store directory:
+
+        meta.json       relation/entity type vocabularies (the enum columns index into them)
+        strings.jsonl   interned entity strings, one JSON string per line
+        <column>.<code> one raw fixed-width array per column (x, y, r, x_type, y_type, episode)
+
+    Opening an existing store continues appending to it.
+    """
+
+    def __init__(self, path, relation_types, entity_types):
+        self.path = Path(path)
+        self.path.mkdir(parents=True, exist_ok=True)
+        meta_path = self.path / "meta.json"
+        if meta_path.exists():
+            with meta_path.open("r", encoding="utf-8") as f:
+                meta = json.load(f)
+            if meta["byteorder"] != sys.byteorder:
+                raise ValueError(f"{self.path} was written with {meta['byteorder']}-endian columns")
+        else:
+            meta = {
+                "version": STORE_VERSION,
+                "byteorder": sys.byteorder,
+                "relation_types": list(relation_types),
+                "entity_types": list(entity_types),
+            }
+            with meta_path.open("w", encoding="utf-8") as f:
+                json.dump(meta, f)
+        self.relation_ids = {r: i for i, r in enumerate(meta["relation_types"])}
+        self.entity_type_ids = {t: i for i, t in enumerate(meta["entity_types"])}
+
+        self.string_ids = {}
+        strings_path = self.path / "strings.jsonl"
+        if strings_path.exists():
+            with strings_path.open("r", encoding="utf-8") as f:
+                for line in f:
+                    self.string_ids[json.loads(line)] = len(self.string_ids)
+        self._strings = strings_path.open("a", encoding="utf-8")
+
+        self._truncate_to_complete_rows()
+        self._columns = {name: _column_path(self.path, name).open("ab") for name in COLUMNS}
+        self._buffers = {name: array(code) for name, code in COLUMNS.items()}
+
+    def _truncate_to_complete_rows(self):
+        # A crash between column writes can leave columns of different lengths
+        rows = []
+        for name, code in COLUMNS.items():
+            column = _column_path(self.path, name)
+            size = column.stat().st_size if column.exists() else 0
+            rows.append(size // array(code).itemsize)
+        complete = min(rows)
+        for name, code in COLUMNS.items():
+            column = _column_path(self.path, name)
+            if column.exists():
+                with column.open("r+b") as f:
+                    f.truncate(complete * array(code).itemsize)
+
+    def _intern(self, s):
+        i = self.string_ids.get(s)
+        if i is None:
+            i = len(self.string_ids)
+            self.string_ids[s] = i
+            self._strings.write(json.dumps(s, ensure_ascii=False) + "\n")
+        return i
+
+    def append(self, x, y, r, x_type, y_type, episode=-1):
+        b = self._buffers
+        b["x"].append(self._intern(x))
+        b["y"].append(self._intern(y))
+        b["r"].append(self.relation_ids[r])
+        b["x_type"].append(self.entity_type_ids[x_type])
+        b["y_type"].append(self.entity_type_ids[y_type])
+        b["episode"].append(episode)
+
+    def extend(self, triplets, episode=-1):
+        """Append objects with x, y, r, x_type, y_type attributes (TripletRecord, RelationTriplet)"""
+        for t in triplets:
+            # RelationTriplet fields are str enums, use their values
+            self.append(
+                t.x, t.y, getattr(t.r, "value", t.r),
+                getattr(t.x_type, "value", t.x_type), getattr(t.y_type, "value", t.y_type),
+                episode,
+            )
+
+    def flush(self):
+        # Strings first, so every id written to a column is resolvable
+        self._strings.flush()
+        for name, buffer in self._buffers.items():
+            buffer.tofile(self._columns[name])
+            self._columns[name].flush()
+            del buffer[:]
+
+    def close(self):
+        self.flush()
+        self._strings.close()
+        for column in self._columns.values():
+            column.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+
+class TripletStoreReader:
+    """Memory-maps the columns of a store written by TripletStoreWriter"""
+
+    def __init__(self, path):
+        self.path = Path(path)
+        if not (self.path / "meta.json").exists():
+            # Stores are generated, not committed
+            raise FileNotFoundError(
+                f"no triplet store at {self.path}; run schema_extraction/main.py, or convert.py to rebuild it from the checkpoint"
+            )
+        with (self.path / "meta.json").open("r", encoding="utf-8") as f:
+            meta = json.load(f)
+        if meta["byteorder"] != sys.byteorder:
+            raise ValueError(f"{self.path} was written with {meta['byteorder']}-endian columns")
+        self.relation_types = meta["relation_types"]
+        self.entity_types = meta["entity_types"]
+        with (self.path / "strings.jsonl").open("r", encoding="utf-8") as f:
+            self.strings = [json.loads(line) for line in f]
+
+        self._files = []
+        self._maps = []
+        self._views = []
+        self.columns = {name: self._map_column(name) for name in COLUMNS}
+        self._length = min(len(column) for column in self.columns.values())
+
+    def _map_column(self, name):
+        column = _column_path(self.path, name)
+        if not column.exists() or column.stat().st_size == 0:
+            return memoryview(array(COLUMNS[name]))
+        f = column.open("rb")
+        mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        self._files.append(f)
+        self._maps.append(mapped)
+        view = memoryview(mapped)
+        itemsize = array(COLUMNS[name]).itemsize
+        # Ignore a torn trailing item from an interrupted append
+        whole = view[: len(view) - len(view) % itemsize]
+        typed = whole.cast(COLUMNS[name])
+        self._views.extend([typed, whole, view])
+        return typed
+
+    def __len__(self):
+        return self._length
+
+    def __getitem__(self, i):
+        if not -len(self) <= i < len(self):
+            raise IndexError(f"triplet {i} out of range")
+        i %= len(self)
+        c = self.columns
+        return StoredTriplet(
+            x=self.strings[c["x"][i]],
+            y=self.strings[c["y"][i]],
+            r=self.relation_types[c["r"][i]],
+            x_type=self.entity_types[c["x_type"][i]],
+            y_type=self.entity_types[c["y_type"][i]],
+            episode=c["episode"][i],
+        )
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield self[i]
+
+    def triples(self):
+        """(x, y, r) strings of every triplet, without materializing whole records"""
+        strings, relation_types = self.strings, self.relation_types
+        c = self.columns
+        for i in range(len(self)):
+            yield strings[c["x"][i]], strings[c["y"][i]], relation_types[c["r"][i]]
+
+    def close(self):
+        # Views must be released before their mmap can be closed
+        self.columns = {}
+        for view in self._views:
+            view.release()
+        self._views = []
+        for mapped in self._maps:
+            mapped.close()
+        for f in self._files:
+            f.close()
+        self._maps, self._files = [], []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
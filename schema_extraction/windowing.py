@@ -0,0 +1,82 @@
+import asyncio
+
+from models import RelationType
+from scheduler import EpisodeResult
+
+
+def make_windows(episode, window, overlap=0):
+    """Split an episode into windows of `window` turns, consecutive windows sharing `overlap` turns"""
+    if window <= 0 or len(episode) <= window:
+        return [episode]
+    step = max(1, window - overlap)
+    windows = []
+    for start in range(0, len(episode), step):
+        windows.append(episode[start:start + window])
+        if start + window >= len(episode):
+            break
+    return windows
+
+
+def merge_window_triplets(triplets_per_window, is_speaker):
+    """
+    Merge the triplets of all windows of one episode.
+
+    Speaker labels are consistent across an episode, so a 'Speaker N' ->
+    name resolution (a per:alternate_names triplet) found in any window is
+    applied to the triplets of every window. Triplets that still mention a
+    speaker label afterwards are dropped, and duplicates are collapsed.
+    """
+    speaker_names = {}
+    for triplets in triplets_per_window:
+        for t in triplets:
+            if t.r != RelationType.per_alternate_names:
+                continue
+            if is_speaker(t.x) and not is_speaker(t.y):
+                speaker_names.setdefault(t.x, t.y)
+            elif is_speaker(t.y) and not is_speaker(t.x):
+                speaker_names.setdefault(t.y, t.x)
+
+    merged = []
+    seen = set()
+    for triplets in triplets_per_window:
+        for t in triplets:
+            if t.r == RelationType.per_alternate_names and (is_speaker(t.x) or is_speaker(t.y)):
+                continue
+            x = speaker_names.get(t.x, t.x)
+            y = speaker_names.get(t.y, t.y)
+            if is_speaker(x) or is_speaker(y) or x == y:
+                continue
+            key = (x, y, t.r)
+            if key in seen:
+                continue
+            seen.add(key)
+            merged.append(t._replace(x=x, y=y))
+    return merged
+
+
+async def run_windowed_episode(scheduler, extractor, i, episode, window, overlap):
+    """Extract all windows of an episode in parallel and merge them into one EpisodeResult"""
+    windows = make_windows(episode, window, overlap)
+    jobs = await asyncio.gather(*(
+        scheduler.run_episode(i, turns) for turns in windows
+    ))
+    errors = [job.error for job in jobs if job.failed]
+    result = EpisodeResult(index=i, attempts=max(job.attempts for job in jobs))
+    if errors:
+        # Fail the whole episode so --resume re-runs it; successful windows come from the cache
+        result.error = errors[0]
+        return result
+    result.triplets = merge_window_triplets(
+        [job.triplets for job in jobs], extractor._is_speaker_entity
+    )
+    return result
+
+
+async def run_windowed(scheduler, extractor, dialogues, indices, window, overlap=0, on_result=None):
+    async def run_one(i, episode):
+        result = await run_windowed_episode(scheduler, extractor, i, episode, window, overlap)
+        if on_result is not None:
+            on_result(result)
+        return result
+
+    return await asyncio.gather(*(run_one(i, episode) for i, episode in zip(indices, dialogues)))
@@ -0,0 +1,206 @@
+import argparse
+import asyncio
+import os
+import socket
+from pathlib import Path
+
+import dspy
+
+from models import *
+from dataset import DialogueDataset
+from scheduler import ExtractionScheduler
+from cache import ResponseCache
+from telemetry import Telemetry
+from aliases import AliasIndex
+from checkpoint import CheckpointWriter
+from prefilter import EpisodeScorer
+from jobqueue import JobQueue, LEASE_SECONDS, MAX_ATTEMPTS, SharedRateLimiter
+from main import (
+    CACHE_MAX_AGE, CACHE_MAX_ENTRIES, CACHE_PATH, COMPLETION_TOKENS, MAX_CONCURRENCY, MAX_RETRIES, MODE_PROMPT_TOKENS,
+    REQUEST_TIMEOUT, REQUESTS_PER_MINUTE, SPLITS, TOKENS_PER_MINUTE, report_episode, write_outputs,
+)
+
+QUEUE_PATH = "./result/jobs.sqlite"
+# Seconds between checks on running jobs
+POLL_INTERVAL = 5.0
+# Seconds between polls while other workers hold the last jobs; short, so an idle worker exits soon after they finish
+IDLE_POLL_INTERVAL = 0.25
+
+
+def worker_id():
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+async def heartbeat(queue, worker, in_flight):
+    """Renew the leases on the jobs this worker is running, several times per lease period, until cancelled"""
+    while True:
+        await asyncio.sleep(queue.lease_seconds / 5)
+        jobs = [job for job, task in in_flight.items() if not task.done()]
+        if jobs:
+            # The write waits on other workers' transactions; keep it off the event loop
+            held = await asyncio.to_thread(queue.heartbeat, worker, jobs)
+            if held < len(jobs):
+                print(f"⚠️ {len(jobs) - held} leases of {worker} expired; other workers may redo those episodes")
+
+
+async def run_worker(queue, extractor, worker, split=None, telemetry=None, **scheduler_options):
+    """
+    Lease episodes from `queue` and extract them until no job is left, keeping
+    about twice `max_concurrency` jobs leased so the scheduler never idles.
+    Finished episodes are acked with their triplets, failed ones given back.
+    """
+    scheduler = ExtractionScheduler(extractor, telemetry=telemetry, **scheduler_options)
+    # Requests and tokens per minute are one budget for every worker on this queue
+    scheduler.limiter = SharedRateLimiter(
+        queue.path, scheduler.limiter.requests_per_minute, scheduler.limiter.tokens_per_minute,
+    )
+    capacity = 2 * scheduler.concurrency.max_concurrency
+    datasets = {}
+    in_flight = {}
+    done = failed = 0
+
+    async def process(job):
+        if job.split not in datasets:
+            datasets[job.split] = DialogueDataset(SPLITS[job.split])
+        dialogue = datasets[job.split][job.episode].dialogue
+        result = await scheduler.run_episode(job.episode, dialogue)
+        report_episode(result, telemetry)
+        if result.failed:
+            await asyncio.to_thread(queue.fail, worker, job, f"{type(result.error).__name__}: {result.error}")
+        else:
+            await asyncio.to_thread(queue.ack, worker, job, [triplet.dict() for triplet in result.triplets])
+        return result
+
+    beat = asyncio.create_task(heartbeat(queue, worker, in_flight))
+    try:
+        while True:
+            if len(in_flight) < capacity:
+                for job in await asyncio.to_thread(queue.lease, worker, capacity - len(in_flight), split):
+                    in_flight[job] = asyncio.create_task(process(job))
+            if not in_flight:
+                if not await asyncio.to_thread(queue.remaining, split):
+                    break
+                # The last jobs are leased by other workers; pick them up if their leases expire
+                await asyncio.sleep(IDLE_POLL_INTERVAL)
+                continue
+            finished, _ = await asyncio.wait(in_flight.values(), timeout=POLL_INTERVAL, return_when=asyncio.FIRST_COMPLETED)
+            for job in [job for job, task in in_flight.items() if task in finished]:
+                task = in_flight.pop(job)
+                if task.exception() is not None:
+                    # E.g. the ack or fail write itself failed; the lease expires and another worker redoes the episode
+                    e = task.exception()
+                    print(f"❌ {job.split} episode {job.episode} could not be finished: {type(e).__name__}: {e}")
+                    failed += 1
+                elif task.result().failed:
+                    failed += 1
+                else:
+                    done += 1
+    finally:
+        beat.cancel()
+        for task in in_flight.values():
+            task.cancel()
+        await asyncio.gather(beat, *in_flight.values(), return_exceptions=True)
+        scheduler.limiter.close()
+        for dataset in datasets.values():
+            dataset.close()
+    print(f"✅ Worker {worker} finished: {done} episodes done, {failed} failed attempts")
+    return done, failed
+
+
+def merge(queue, split, output_dir, raw_names=False):
+    """Assemble a split's outputs from the queue, as main.py writes them"""
+    counts = queue.counts(split)
+    if counts["pending"] or counts["leased"]:
+        print(f"⚠️ {split} is not finished ({counts}); merging the {counts['done']} episodes done so far")
+    for _, episode, attempts, error in queue.failures(split):
+        print(f"❌ Episode {episode} failed after {attempts} attempts: {error}")
+    results = queue.results(split)
+    # write_outputs learns aliases in episode order, so the names do not depend on which worker ran what
+    aliases = None if raw_names else AliasIndex.from_fandom(FANDOM_TRIPLES)
+    checkpoint_path = Path(output_dir) / f"{split}.jsonl"
+    if checkpoint_path.exists():
+        checkpoint_path.unlink()
+    with CheckpointWriter(checkpoint_path) as checkpoint:
+        for episode, triplets in results.items():
+            checkpoint.write(episode, [TripletRecord(**t) for t in triplets])
+    return write_outputs(split, checkpoint_path, output_dir, aliases)
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Extract DialogRE splits with any number of workers sharing one job queue")
+    parser.add_argument("--queue", default=QUEUE_PATH, help="SQLite job queue shared by all workers")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    enqueue = commands.add_parser("enqueue", help="add one job per episode of a split")
+    enqueue.add_argument("--split", choices=SPLITS, default="dev")
+    enqueue.add_argument("--count", type=int, default=None, help="only the first N dialogues")
+    enqueue.add_argument("--retry-failed", action="store_true", help="also queue failed episodes again")
+    enqueue.add_argument(
+        "--prefilter", type=float, default=None, metavar="MIN_SCORE",
+        help="do not queue dialogues whose prefilter score is below MIN_SCORE",
+    )
+
+    run = commands.add_parser("run", help="lease and extract episodes until the queue is empty")
+    run.add_argument("--split", choices=SPLITS, default=None, help="only take jobs of this split")
+    run.add_argument("--worker-id", default=None, help="default: <hostname>:<pid>")
+    run.add_argument("--max-concurrency", type=int, default=MAX_CONCURRENCY)
+    run.add_argument("--mode", choices=EXTRACTION_MODES, default="cot", help="decoding mode, see main.py --mode")
+    run.add_argument("--lease", type=float, default=LEASE_SECONDS, help="seconds before an unrenewed job is handed to another worker")
+
+    commands.add_parser("status", help="job counts per split")
+
+    merge_command = commands.add_parser("merge", help="write <split>.jsonl/.json/.txt/.triplets from the finished jobs")
+    merge_command.add_argument("--split", choices=SPLITS, default="dev")
+    merge_command.add_argument("--output-dir", default="./result")
+    merge_command.add_argument("--raw-names", action="store_true", help="keep entity surface forms instead of canonical names")
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    lease = getattr(args, "lease", LEASE_SECONDS)
+    with JobQueue(args.queue, lease_seconds=lease, max_attempts=MAX_ATTEMPTS) as queue:
+        if args.command == "enqueue":
+            with DialogueDataset(SPLITS[args.split]) as dataset:
+                count = len(dataset) if args.count is None else min(args.count, len(dataset))
+                episodes = range(count)
+                if args.prefilter is not None:
+                    scorer = EpisodeScorer(AliasIndex.from_fandom(FANDOM_TRIPLES))
+                    dialogues = [episode.dialogue for episode in dataset.iter(0, count)]
+                    episodes, skipped = scorer.select(dialogues, episodes, args.prefilter)
+                    print(f"Prefilter: not queueing {len(skipped)} dialogues scoring below {args.prefilter}")
+            added = queue.enqueue(args.split, episodes)
+            if args.retry_failed:
+                added += queue.retry_failed(args.split)
+            print(f"Queued {added} {args.split} episodes: {queue.counts(args.split)}")
+        elif args.command == "status":
+            for split in SPLITS:
+                counts = queue.counts(split)
+                if any(counts.values()):
+                    print(f"{split}: {counts}")
+        elif args.command == "merge":
+            merge(queue, args.split, args.output_dir, args.raw_names)
+        else:
+            dspy.configure(lm=dspy.LM("gpt-4.1-mini"), api_key=OPEN)
+            worker = args.worker_id or worker_id()
+            cache = ResponseCache(CACHE_PATH, max_entries=CACHE_MAX_ENTRIES, max_age=CACHE_MAX_AGE)
+            telemetry = Telemetry(stage="extraction", worker=worker)
+            try:
+                asyncio.run(run_worker(
+                    queue, OptimizedRelationExtractor(cache=cache, telemetry=telemetry, mode=args.mode), worker,
+                    split=args.split, telemetry=telemetry,
+                    max_concurrency=args.max_concurrency,
+                    requests_per_minute=REQUESTS_PER_MINUTE,
+                    tokens_per_minute=TOKENS_PER_MINUTE,
+                    max_retries=MAX_RETRIES,
+                    request_timeout=REQUEST_TIMEOUT,
+                    prompt_tokens=MODE_PROMPT_TOKENS[args.mode],
+                    completion_tokens=COMPLETION_TOKENS,
+                ))
+            finally:
+                telemetry.report()
+                cache.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,375 @@
+import argparse
+import asyncio
+import os
+import re
+import shutil
+import sys
+from collections import Counter, defaultdict
+from typing import NamedTuple, Optional, Tuple
+
+import dspy
+import numpy as np
+from dotenv import load_dotenv
+
+# Add parent folder to sys.path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from schema_extraction.models import (
+    ALL_ENTITY_TYPES, ALL_RELATION_TYPES, OPEN, PROJECT_ROOT, PredicateRelationSignature, TripletRecord,
+)
+from schema_extraction.triplet_store import TripletStoreWriter
+from graphdb.embedding_cache import EMBEDDING_MODEL, EmbeddingCache, open_embedder
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+TRIPLES_PATH = os.path.join(HERE, "extracted_triples_gpt4_1_batch.txt")
+MATCHING_TABLE = os.path.join(PROJECT_ROOT, "data", "matching_table.txt")
+EMBEDDING_CACHE_PATH = os.path.join(HERE, "cache", "embeddings.sqlite")
+# Decisions per distinct predicate; predicates already in it are not embedded or asked again
+MAPPING_PATH = os.path.join(HERE, "predicate_map.txt")
+OUTPUT_PATH = os.path.join(HERE, "normalized.txt")
+STORE_PATH = os.path.join(HERE, "normalized.triplets")
+
+NO_RELATION = "none"
+# Cosine thresholds: accept the best relation at ACCEPT or above when it leads the
+# runner-up by MARGIN, reject everything below REJECT, ask the LLM in between
+ACCEPT = 0.6
+REJECT = 0.35
+MARGIN = 0.04
+LLM_CANDIDATES = 3
+MAX_CONCURRENT_LLM = 8
+LLM_EXAMPLES = 3
+EMBED_BATCH_SIZE = 1000
+
+# Schemaless-style phrasings of each relation, read as "x <phrase> y"
+PROTOTYPES = {
+    "per:title": ["has the title", "holds the position of", "is titled"],
+    "per:alternate_names": ["is also called", "is also known as", "has the nickname", "goes by the name"],
+    "per:employee_of": ["works for", "works at", "is employed by", "is an employee of"],
+    "per:student_of": ["is a student of", "studies under", "is taught by"],
+    "per:member_of": ["is a member of", "belongs to the group", "plays for the team"],
+    "per:origin": ["is from", "comes from", "is originally from"],
+    "per:spouse": ["is married to", "is the husband of", "is the wife of"],
+    "per:children": ["is the father of", "is the mother of", "is the parent of"],
+    "per:parents": ["is the son of", "is the daughter of", "is the child of"],
+    "per:siblings": ["is the brother of", "is the sister of", "is the sibling of"],
+    "per:other_family": ["is the cousin of", "is the aunt of", "is the uncle of", "is the grandmother of", "is related to"],
+    "per:friends": ["is friends with", "is a friend of", "is the best friend of"],
+    "per:schools_attended": ["attended school at", "went to college at", "graduated from", "studied at"],
+    "per:places_lived": ["lives in", "lived in", "moved to", "resides in"],
+    "per:date_of_birth": ["was born on", "has a birthday on"],
+    "per:age": ["is years old", "has the age"],
+    "per:religion": ["practices the religion", "is a follower of the faith"],
+    "per:political_affiliation": ["supports the political party", "is a member of the party"],
+    "per:country_of_citizenship": ["is a citizen of", "has the nationality"],
+    "per:state_of_residence": ["lives in the state of"],
+    "per:city_of_residence": ["lives in the city of"],
+    "per:language": ["speaks the language", "speaks"],
+    "per:profession": ["works as a", "is by profession a", "has the occupation"],
+    "per:death_date": ["died on"],
+    "per:death_place": ["died in"],
+    "org:top_members/employees": ["employs", "is run by", "is managed by", "has the employee"],
+    "org:number_of_employees/members": ["has this many employees", "has this many members"],
+    "org:member_of": ["is part of the organization", "is a branch of"],
+    "org:subsidiaries": ["owns the company", "has the subsidiary"],
+    "org:parents": ["is a subsidiary of", "is owned by the company"],
+    "org:founded_by": ["was founded by", "was started by"],
+    "org:place_of_headquarters": ["is headquartered in", "is based in"],
+    "org:date_founded": ["was founded in", "was established in"],
+    "org:political/religious_affiliation": ["is affiliated with"],
+    "org:shareholders": ["has the shareholder", "is invested in by"],
+    # Dialogue events and attitudes, the bulk of schemaless predicates, carry no schema relation
+    NO_RELATION: [
+        "said", "says to", "asked", "told", "thinks", "believes", "claims", "greets", "called",
+        "wants", "suggests", "thanked", "invited", "kissed", "loves", "is talking to", "is angry at",
+        "owns", "had", "refers to", "advises", "met", "left", "received",
+    ],
+}
+
+SPEAKER = re.compile(r"\bSpeaker \d+\b")
+# Relations whose object is a person; other objects are stored as 'string' (or 'org' below)
+PERSON_OBJECTS = {
+    "per:alternate_names", "per:spouse", "per:children", "per:parents", "per:siblings",
+    "per:other_family", "per:friends", "per:student_of", "org:top_members/employees",
+    "org:founded_by", "org:shareholders",
+}
+ORG_OBJECTS = {"per:employee_of", "per:member_of", "per:schools_attended", "org:member_of", "org:subsidiaries", "org:parents"}
+
+
+class Decision(NamedTuple):
+    predicate: str
+    # A RelationType value, or None when the predicate maps to no relation
+    relation: Optional[str]
+    score: float
+    margin: float
+    # "embedding", "llm", "rejected" (too far from every relation) or "ambiguous" (no LLM to ask)
+    source: str
+    candidates: Tuple[str, ...] = ()
+
+
+def normalize_predicate(predicate):
+    return " ".join(predicate.lower().split())
+
+
+def read_triples(path=TRIPLES_PATH):
+    """(x, y, predicate) rows of a schemaless 'x||y||predicate' file"""
+    triples = []
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            parts = line.rstrip("\n").split("||")
+            if len(parts) == 3 and all(part.strip() for part in parts):
+                triples.append(tuple(part.strip() for part in parts))
+    return triples
+
+
+def matching_table_prototypes(path=MATCHING_TABLE):
+    """
+    Rows of the Fandom matching table whose target is a schema relation (or
+    'none'), as prototypes. The table maps attribute nouns, (x, father, y)
+    meaning y is x's father, so each noun reads as "x has <noun> y".
+    """
+    prototypes = []
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            parts = line.strip().split("||")
+            if len(parts) != 2 or (parts[1] not in ALL_RELATION_TYPES and parts[1] != NO_RELATION):
+                continue
+            prototypes.append((f"has {parts[0].replace('_', ' ').replace('/', ' or ')}", parts[1]))
+    return prototypes
+
+
+def build_prototypes(matching_table=MATCHING_TABLE):
+    prototypes = [(text, relation) for relation, texts in PROTOTYPES.items() for text in texts]
+    if matching_table:
+        prototypes += matching_table_prototypes(matching_table)
+    return prototypes
+
+
+def unit_rows(vectors):
+    matrix = np.asarray(vectors, dtype=np.float32)
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    return matrix / np.where(norms == 0, 1, norms)
+
+
+class PredicateNormalizer:
+    """
+    Maps free-form predicates onto RelationType. Distinct predicates are
+    embedded once (through the embedding cache) and scored against every
+    prototype in one matrix product; each relation scores as its best
+    prototype. Clear winners are accepted, predicates far from every relation
+    are rejected, and only the ambiguous rest goes to `resolver` (an LLM).
+    """
+
+    def __init__(
+        self, embedder, embedding_cache, prototypes=None, resolver=None,
+        accept=ACCEPT, reject=REJECT, margin=MARGIN, max_concurrent_llm=MAX_CONCURRENT_LLM,
+    ):
+        self.embedder = embedder
+        self.embedding_cache = embedding_cache
+        prototypes = build_prototypes() if prototypes is None else prototypes
+        # Prototypes grouped by relation, so np.maximum.reduceat takes each relation's best
+        prototypes = sorted(prototypes, key=lambda prototype: prototype[1])
+        self.prototype_texts = [text for text, _ in prototypes]
+        self.labels = sorted({relation for _, relation in prototypes})
+        relations = [relation for _, relation in prototypes]
+        self.starts = np.array([relations.index(label) for label in self.labels])
+        self.prototype_matrix = None
+        self.resolver = resolver
+        self.accept = accept
+        self.reject = reject
+        self.margin = margin
+        self.max_concurrent_llm = max_concurrent_llm
+
+    async def embed(self, texts):
+        vectors = []
+        for start in range(0, len(texts), EMBED_BATCH_SIZE):
+            batch = texts[start:start + EMBED_BATCH_SIZE]
+            if self.embedding_cache is not None:
+                vectors.extend(await self.embedding_cache.embed(self.embedder, batch))
+            else:
+                vectors.extend(await self.embedder.ingest_embed(batch))
+        return unit_rows(vectors)
+
+    async def scores(self, predicates):
+        """(predicates x relations) matrix of cosine similarities, in `self.labels` order"""
+        if self.prototype_matrix is None:
+            self.prototype_matrix = await self.embed(self.prototype_texts)
+        if not predicates:
+            return np.zeros((0, len(self.labels)), dtype=np.float32)
+        similarities = await self.embed(predicates) @ self.prototype_matrix.T
+        return np.maximum.reduceat(similarities, self.starts, axis=1)
+
+    def decide(self, predicates, scores):
+        """Threshold decisions; the 'ambiguous' ones are left for the resolver"""
+        order = np.argsort(-scores, axis=1)
+        rows = np.arange(len(predicates))
+        best = scores[rows, order[:, 0]]
+        second = scores[rows, order[:, 1]] if scores.shape[1] > 1 else np.full(len(predicates), -1.0)
+        decisions = []
+        for i, predicate in enumerate(predicates):
+            label = self.labels[order[i, 0]]
+            score, margin = float(best[i]), float(best[i] - second[i])
+            candidates = tuple(
+                self.labels[j] for j in order[i, :LLM_CANDIDATES + 1]
+                if self.labels[j] != NO_RELATION and scores[i, j] >= self.reject
+            )[:LLM_CANDIDATES]
+            if score >= self.accept and margin >= self.margin:
+                relation = None if label == NO_RELATION else label
+                decisions.append(Decision(predicate, relation, score, margin, "embedding", candidates))
+            elif score < self.reject or not candidates:
+                decisions.append(Decision(predicate, None, score, margin, "rejected"))
+            else:
+                decisions.append(Decision(predicate, None, score, margin, "ambiguous", candidates))
+        return decisions
+
+    async def resolve(self, decision, examples):
+        """Ask the resolver to pick among an ambiguous predicate's candidates"""
+        relation = await self.resolver.acall(decision.predicate, list(decision.candidates), examples)
+        if relation not in decision.candidates:
+            relation = None
+        return decision._replace(relation=relation, source="llm")
+
+    async def normalize(self, predicates, examples=None):
+        """{predicate: Decision} for distinct normalized predicates; `examples` maps a predicate to sample triples"""
+        predicates = sorted(set(predicates))
+        decisions = self.decide(predicates, await self.scores(predicates))
+        if self.resolver is not None:
+            slots = asyncio.Semaphore(self.max_concurrent_llm)
+
+            async def resolve(decision):
+                if decision.source != "ambiguous":
+                    return decision
+                async with slots:
+                    return await self.resolve(decision, (examples or {}).get(decision.predicate, []))
+
+            decisions = await asyncio.gather(*(resolve(decision) for decision in decisions))
+        return {decision.predicate: decision for decision in decisions}
+
+
+class PredicateResolver(dspy.Module):
+    """LLM fallback for predicates the embedding scores cannot settle"""
+
+    def __init__(self):
+        super().__init__()
+        self.predictor = dspy.Predict(PredicateRelationSignature)
+
+    def forward(self, predicate, candidates, examples):
+        return self.predictor(predicate=predicate, candidates=candidates, examples=examples).relation.strip()
+
+    async def aforward(self, predicate, candidates, examples):
+        result = await self.predictor.acall(predicate=predicate, candidates=candidates, examples=examples)
+        return result.relation.strip()
+
+
+def load_mapping(path=MAPPING_PATH):
+    """Earlier decisions, 'predicate||relation||score||margin||source' lines"""
+    mapping = {}
+    if not os.path.exists(path):
+        return mapping
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            parts = line.rstrip("\n").split("||")
+            if len(parts) == 5:
+                predicate, relation, score, margin, source = parts
+                relation = None if relation == NO_RELATION else relation
+                mapping[predicate] = Decision(predicate, relation, float(score), float(margin), source)
+    return mapping
+
+
+def save_mapping(mapping, path=MAPPING_PATH):
+    tmp = path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        for predicate in sorted(mapping):
+            d = mapping[predicate]
+            f.write(f"{predicate}||{d.relation or NO_RELATION}||{d.score:.4f}||{d.margin:.4f}||{d.source}\n")
+    os.replace(tmp, path)
+
+
+def entity_types(relation):
+    x_type = "org" if relation.startswith("org:") else "per"
+    y_type = "per" if relation in PERSON_OBJECTS else "org" if relation in ORG_OBJECTS else "string"
+    return x_type, y_type
+
+
+def apply_mapping(triples, mapping):
+    """Schema triplets for every triple whose predicate maps to a relation; speaker labels are dropped as in extraction"""
+    triplets = []
+    for x, y, predicate in triples:
+        decision = mapping.get(normalize_predicate(predicate))
+        if decision is None or decision.relation is None or x == y:
+            continue
+        if SPEAKER.search(x) or SPEAKER.search(y):
+            continue
+        triplets.append(TripletRecord(x, y, decision.relation, *entity_types(decision.relation)))
+    return list(dict.fromkeys(triplets))
+
+
+def write_outputs(triplets, output_path=OUTPUT_PATH, store_path=STORE_PATH):
+    """'x||y||r' lines for f1score.py --predictions, and a columnar store for graphdb/inject.py --triplets"""
+    with open(output_path, "w", encoding="utf-8") as f:
+        for t in triplets:
+            f.write(f"{t.x}||{t.y}||{t.r}\n")
+    if store_path:
+        if os.path.exists(store_path):
+            shutil.rmtree(store_path)
+        with TripletStoreWriter(store_path, ALL_RELATION_TYPES, ALL_ENTITY_TYPES) as writer:
+            writer.extend(triplets)
+
+
+async def run(args):
+    triples = read_triples(args.triples)
+    examples = defaultdict(list)
+    for x, y, predicate in triples:
+        key = normalize_predicate(predicate)
+        if len(examples[key]) < LLM_EXAMPLES:
+            examples[key].append(f"{x} || {y} || {predicate}")
+    mapping = {} if args.rebuild else load_mapping(args.mapping)
+    # Ambiguous predicates of a --no-llm run are tried again
+    new = [p for p in examples if p not in mapping or mapping[p].source == "ambiguous"]
+    print(f"{len(triples)} triples, {len(examples)} distinct predicates, {len(new)} not mapped yet")
+
+    embedding_cache = EmbeddingCache(EMBEDDING_CACHE_PATH, EMBEDDING_MODEL)
+    try:
+        normalizer = PredicateNormalizer(
+            open_embedder(), embedding_cache,
+            resolver=None if args.no_llm else PredicateResolver(),
+            accept=args.accept, reject=args.reject, margin=args.margin,
+        )
+        mapping.update(await normalizer.normalize(new, examples))
+        print(f"Embedding cache: {embedding_cache.stats()}")
+    finally:
+        embedding_cache.close()
+    save_mapping(mapping, args.mapping)
+
+    sources = Counter(mapping[p].source for p in examples)
+    print(f"📊 Predicates by decision: {dict(sources)}")
+    triplets = apply_mapping(triples, mapping)
+    write_outputs(triplets, args.output, args.store)
+    relations = Counter(t.r for t in triplets)
+    print(f"✅ {len(triplets)} schema triplets written to {args.output}")
+    for relation, count in relations.most_common():
+        print(f"   {relation}: {count}")
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Map schemaless predicates onto RelationType")
+    parser.add_argument("--triples", default=TRIPLES_PATH, help="schemaless 'x||y||predicate' file")
+    parser.add_argument("--mapping", default=MAPPING_PATH, help="per-predicate decisions, reused across runs")
+    parser.add_argument("--output", default=OUTPUT_PATH, help="normalized 'x||y||r' triples")
+    parser.add_argument("--store", default=STORE_PATH, help="normalized columnar triplet store ('' to skip)")
+    parser.add_argument("--accept", type=float, default=ACCEPT)
+    parser.add_argument("--reject", type=float, default=REJECT)
+    parser.add_argument("--margin", type=float, default=MARGIN)
+    parser.add_argument("--no-llm", action="store_true", help="leave ambiguous predicates unmapped instead of asking the LLM")
+    parser.add_argument("--rebuild", action="store_true", help="ignore earlier decisions in --mapping, e.g. after changing thresholds")
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    load_dotenv()
+    dspy.configure(lm=dspy.LM("gpt-4.1-mini"), api_key=OPEN)
+    asyncio.run(run(args))
+
+
+if __name__ == "__main__":
+    main()